@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+import server
+from server import read_cfg, write_batch
+from board_control import BoardControl
+from event_log import EventLog
+from instruction_source import InstructionSource, pack
+from sim_board import SimBoard, run_boards
+from native_encoder import build_encoders, call_native_batch
+from vector_table import build_vector_encoders, call_vector_batch
+from generate import (BASE_INSTRUCTIONS, VECTOR_INSTRUCTIONS, NODE_ENCODER, RUST_ASM_BIN, generate_stream,
+                      call_instruction, start_node_batch, call_instruction_batch,
+                      call_rust_asm_oneshot, start_rust_asm, call_rust_asm_batch)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# storage/riscv_gen.py, the standalone generator (appended, its config.py must not shadow anything)
+sys.path.append(os.path.join(ROOT, "storage"))
+import riscv_gen
+
+# Benchmark suite. Three groups, chosen with --suite:
+#   gen     words/s of every generation backend (Node, rvv-as, the in-process
+#           encoders, generate_stream end to end, storage/riscv_gen)
+#   send    the server send path (per-word packing vs the packed buffer)
+#   server  batches/s and p50/p99 batch latency of handle_client against
+#           simulated boards (sim_board.py), for every BATCH_SIZE x client count
+# Every result is also written to --json (with the commit and machine it ran
+# on); --compare OLD.json prints the speedup of each result over an earlier run.
+# A backend that is not installed here (node, rvv-as, numpy for riscv_gen)
+# is recorded as skipped with the reason instead of stopping the suite; any
+# other error stops it with a traceback and a non-zero exit, so a broken
+# backend is not mistaken for a missing one.
+# Usage: python3 benchmark.py --count 1000 --json bench.json [--compare baseline.json]
+
+SUITES = ("gen", "send", "server")
+
+class Unavailable(Exception):
+    # the backend a case measures is not installed here
+    pass
+
+def need_node():
+    if shutil.which("node") is None:
+        raise Unavailable("node not installed")
+    if not os.path.exists(NODE_ENCODER):
+        raise Unavailable(f"{NODE_ENCODER} not found")
+
+def need_rvv_as():
+    if not os.access(RUST_ASM_BIN, os.X_OK):
+        raise Unavailable(f"rvv-as not built at {RUST_ASM_BIN} (make rvv-as)")
+
+def bench_rvv_as_oneshot(asm_lines):
+    # one rvv-as process per instruction (old path)
+    need_rvv_as()
+    start = time.perf_counter()
+    for asm in asm_lines:
+        call_rust_asm_oneshot(asm)
+    return time.perf_counter() - start
+
+def bench_rvv_as_stream(asm_lines, batch_size):
+    # one long-lived rvv-as process, requests pipelined in batches
+    need_rvv_as()
+    start = time.perf_counter()
+    rust_proc = start_rust_asm()
+    for i in range(0, len(asm_lines), batch_size):
+        call_rust_asm_batch(asm_lines[i:i + batch_size], rust_proc)
+    rust_proc.stdin.close()
+    rust_proc.wait()
+    return time.perf_counter() - start
+
+def bench_node_line(mnemonics):
+    # one JSON request/response round trip per instruction (old path)
+    need_node()
+    start = time.perf_counter()
+    node_proc = subprocess.Popen(['node', NODE_ENCODER],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    for mne in mnemonics:
+        call_instruction(mne, node_proc)
+    node_proc.stdin.close()
+    node_proc.wait()
+    return time.perf_counter() - start
+
+def bench_node_batch(mnemonics, batch_size, depth):
+    # packed binary batches, several in flight
+    need_node()
+    start = time.perf_counter()
+    node_proc = start_node_batch()
+    call_instruction_batch(mnemonics, node_proc, batch_size, depth)
+    node_proc.stdin.close()
+    node_proc.wait()
+    return time.perf_counter() - start
+
+def bench_native(mnemonics, cfg):
+    # in-process encoder, no child process
+    start = time.perf_counter()
+    call_native_batch(mnemonics, build_encoders(cfg))
+    return time.perf_counter() - start
+
+def bench_vector_table(asm_lines, cfg):
+    # in-process vector encoder built from opcodes.rs
+    start = time.perf_counter()
+    call_vector_batch(asm_lines, build_vector_encoders(cfg))
+    return time.perf_counter() - start
+
+async def send_all(n_clients, batches, write):
+    # every client gets every batch (differential mode) over a local socket pair
+    # whose other end is drained; returns the seconds to send everything
+    async def drain(sock):
+        reader, writer = await asyncio.open_connection(sock=sock)
+        while await reader.read(1 << 20):
+            pass
+        writer.close()
+
+    pairs = [socket.socketpair() for _ in range(n_clients)]
+    drains = [asyncio.create_task(drain(b)) for _, b in pairs]
+    writers = [(await asyncio.open_connection(sock=a))[1] for a, _ in pairs]
+
+    async def send(writer):
+        for seq, batch in enumerate(batches):
+            write(writer, seq, batch)
+            await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(w) for w in writers))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*drains)
+    return elapsed
+
+def write_words(writer, batch_id, batch):
+    # per-word pack, join, then the header (old path)
+    payload = b"".join(struct.pack("!I", inst) for inst in batch)
+    writer.write(struct.pack("!II", batch_id, len(batch)) + payload)
+
+def bench_send_words(words, batch_size, n_clients):
+    batches = [words[i:i + batch_size] for i in range(0, len(words), batch_size)]
+    return asyncio.run(send_all(n_clients, batches, write_words))
+
+def bench_send_packed(words, batch_size, n_clients):
+    # one packed buffer, batches are memoryview slices (InstructionSource.wire)
+    packed = pack(words)
+    views = [[packed[i:i + 4 * batch_size]] for i in range(0, 4 * len(words), 4 * batch_size)]
+    return asyncio.run(send_all(n_clients, views, write_batch))
+
+def bench_stream(cfg, count):
+    # generate_stream end to end with the in-process encoders; returns (words, seconds)
+    cfg = dict(cfg, BASE_ENCODER="native", VECTOR_ENCODER="table", TOTAL_INSTRUCTIONS=count, CAMPAIGN_SECONDS=0)
+    start = time.perf_counter()
+    words = sum(len(chunk) for chunk in generate_stream(cfg, seed=0))
+    return words, time.perf_counter() - start
+
+def bench_riscv_gen(count, batch):
+    # storage/riscv_gen, one word at a time or numpy batched; returns (words, seconds)
+    if batch and riscv_gen.np is None:
+        raise Unavailable("numpy not installed")
+    flags = dict(xlen=64, enable_amo=True, enable_f=True, enable_vector=True, seed=0)
+    start = time.perf_counter()
+    words = riscv_gen.generate_batch(count, **flags) if batch else riscv_gen.generate(count, **flags)
+    return len(words), time.perf_counter() - start
+
+class TimedControl(BoardControl):
+    # records the round trip of every batch (see BoardControl.observe)
+    def __init__(self, cfg):
+        super().__init__(cfg["BATCH_SIZE"], factor=0)
+        self.samples = []
+
+    def observe(self, words, seconds):
+        super().observe(words, seconds)
+        self.samples.append(seconds)
+
+async def serve_sim(words, batch_size, n_clients, mode):
+    cfg = {"BATCH_SIZE": batch_size, "BATCH_WINDOW": 4, "WATCHDOG_FACTOR": 0}
+    source = InstructionSource.from_list(words, batch_size, 64, mode)
+    producer = asyncio.create_task(source.run())
+    boards = [SimBoard(f"sim{i}", latency=0, per_word=0, jitter=0) for i in range(n_clients)]
+    server.controls.clear()
+    server.controls.update((b.name, TimedControl(cfg)) for b in boards)
+    srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+    start = time.perf_counter()
+    await run_boards(boards, "127.0.0.1", srv.sockets[0].getsockname()[1])
+    elapsed = time.perf_counter() - start
+    srv.close()
+    await producer
+    return elapsed, sorted(t for c in server.controls.values() for t in c.samples)
+
+def bench_server(words, batch_size, n_clients, mode):
+    # returns (runs, seconds, batch statistics)
+    # the server logs through server.log; warnings and up only, and nothing to
+    # the terminal, so logging is not what gets measured
+    saved, server.log = server.log, EventLog(level="warning", console_level="error")
+    try:
+        elapsed, samples = asyncio.run(serve_sim(words, batch_size, n_clients, mode))
+    finally:
+        server.log.close()
+        server.log = saved
+    runs = len(words) * (n_clients if mode == "differential" else 1)
+    return runs, elapsed, dict(batch_size=batch_size, clients=n_clients, batches=len(samples),
+                               batches_per_s=len(samples) / elapsed,
+                               p50_s=percentile(samples, 0.5), p99_s=percentile(samples, 0.99))
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def report(label, count, elapsed):
+    print(f"{label:<32} {count:>8} instrs  {elapsed:8.3f} s  {count / elapsed:12.1f} instrs/s")
+
+class Suite:
+    def __init__(self):
+        self.results = []
+
+    def record(self, suite, name, count, elapsed, **extra):
+        report(name, count, elapsed)
+        if "batches_per_s" in extra:
+            print(f"{'':<32} {extra['batches_per_s']:10.1f} batches/s  p50 {extra['p50_s'] * 1e3:8.2f} ms"
+                  f"  p99 {extra['p99_s'] * 1e3:8.2f} ms")
+        self.results.append(dict(suite=suite, name=name, words=count, seconds=elapsed,
+                                 words_per_s=count / elapsed, **extra))
+
+    def run(self, suite, name, count, bench, *args):
+        # bench returns seconds, (words, seconds) if it does not make exactly `count`,
+        # or (words, seconds, extra fields); a case whose backend is not installed
+        # is reported as skipped and the suite goes on, anything else propagates
+        try:
+            out = bench(*args)
+        except (Unavailable, FileNotFoundError) as e:
+            print(f"{name:<32} skipped: {e}")
+            self.results.append(dict(suite=suite, name=name, error=str(e)))
+            return
+        extra = {}
+        if isinstance(out, tuple):
+            count, out, *rest = out
+            extra = rest[0] if rest else {}
+        self.record(suite, name, count, out, **extra)
+
+    def save(self, path, args):
+        data = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+            "results": self.results,
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        print(f"results written to {path}")
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def key(result):
+    return result["suite"], result["name"]
+
+def compare(old_path, results):
+    with open(old_path) as f:
+        old = {key(r): r for r in json.load(f)["results"] if "error" not in r}
+    print(f"compared with {old_path}:")
+    for r in results:
+        before = old.get(key(r))
+        if before is None or "error" in r:
+            continue
+        print(f"  {r['name']:<40} {before['words_per_s']:14.1f} -> {r['words_per_s']:14.1f} words/s"
+              f"  x{r['words_per_s'] / before['words_per_s']:.2f}")
+
+def int_list(text):
+    return [int(x) for x in text.split(",")]
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--suite", default=",".join(SUITES), help="comma-separated: " + ", ".join(SUITES))
+    p.add_argument("--count", type=int, default=1000)
+    p.add_argument("--batch-size", type=int, default=256)
+    p.add_argument("--depth", type=int, default=4)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--config", default=os.path.join(ROOT, "config.cfg"))
+    # server send path: words per batch and number of boards
+    p.add_argument("--send-batch-size", type=int, default=65536)
+    p.add_argument("--clients", type=int, default=4)
+    # server against simulated boards
+    p.add_argument("--server-words", type=int, default=65536)
+    p.add_argument("--server-batch-sizes", type=int_list, default=[16, 256, 4096])
+    p.add_argument("--server-clients", type=int_list, default=[1, 8, 64])
+    p.add_argument("--server-mode", default="shard", choices=["shard", "differential"])
+    p.add_argument("--json", default="benchmark_results.json", help="machine-readable results")
+    p.add_argument("--compare", help="earlier --json file to compare with")
+    args = p.parse_args()
+    suites = args.suite.split(",")
+    results = Suite()
+
+    if "send" in suites:
+        words = [random.getrandbits(32) for _ in range(max(args.count, args.send_batch_size))]
+        sent = len(words) * args.clients
+        results.run("send", f"send per word x{args.clients}", sent, bench_send_words, words, args.send_batch_size, args.clients)
+        results.run("send", f"send packed x{args.clients}", sent, bench_send_packed, words, args.send_batch_size, args.clients)
+
+    if "gen" in suites:
+        random.seed(args.seed)
+        asm_lines = [random.choice(VECTOR_INSTRUCTIONS) for _ in range(args.count)]
+        mnemonics = [random.choice(BASE_INSTRUCTIONS) for _ in range(args.count)]
+        cfg = read_cfg(args.config)
+
+        results.run("gen", "node line", args.count, bench_node_line, mnemonics)
+        results.run("gen", "node batch", args.count, bench_node_batch, mnemonics, args.batch_size, args.depth)
+        results.run("gen", "native", args.count, bench_native, mnemonics, cfg)
+        results.run("gen", "rvv-as one-shot", args.count, bench_rvv_as_oneshot, asm_lines)
+        results.run("gen", "rvv-as stream", args.count, bench_rvv_as_stream, asm_lines, args.batch_size)
+        results.run("gen", "vector table", args.count, bench_vector_table, asm_lines, cfg)
+        results.run("gen", "generate_stream native+table", args.count, bench_stream, cfg, args.count)
+        results.run("gen", "riscv_gen generate", args.count, bench_riscv_gen, args.count, False)
+        results.run("gen", "riscv_gen generate_batch", args.count, bench_riscv_gen, args.count, True)
+
+    if "server" in suites:
+        words = [random.getrandbits(32) for _ in range(args.server_words)]
+        for batch_size in args.server_batch_sizes:
+            for n_clients in args.server_clients:
+                name = f"server {args.server_mode} {batch_size}w x{n_clients}"
+                results.run("server", name, len(words), bench_server, words, batch_size, n_clients,
+                            args.server_mode)
+
+    if args.json:
+        results.save(args.json, args)
+    if args.compare:
+        compare(args.compare, results.results)
+
+if __name__ == "__main__":
+    main()
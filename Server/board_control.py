@@ -0,0 +1,85 @@
+# Per-board watchdog and batch sizing.
+# The server keeps one BoardControl per board name (across reconnects). It
+# times every batch from the moment the server starts waiting for it (the board
+# runs batches in order, so that is when the board gets to it) until both of
+# its results are back, and keeps a moving average of the seconds per word.
+#
+# Watchdog: a batch whose results do not come back within
+#   max(WATCHDOG_MIN_SECONDS, WATCHDOG_FACTOR * seconds per word * words)
+# (WATCHDOG_FIRST_SECONDS before the first batch has been timed) counts as a
+# hang; the server drops the connection and the batch is split up like any
+# other lost batch (crash bisection, see instruction_source.py).
+# WATCHDOG_FACTOR = 0 turns the watchdog off.
+#
+# Batch sizing: with TARGET_BATCH_SECONDS set, the server sends the board as
+# many source batches (BATCH_SIZE words each) at once as it can run in about
+# that time, at most MAX_BATCH_UNITS, growing at most twofold per batch. A
+# board that loses a batch drops to half its current size and may not grow
+# past that until RECOVER_BATCHES batches in a row came back; then the cap
+# doubles again. Fast boards end up with big batches, slow or flaky ones with
+# small batches.
+
+class BoardControl:
+    def __init__(self, unit, target=0.0, max_units=64, factor=4.0, min_seconds=5.0,
+                 first_seconds=120.0, smoothing=0.2, recover=16):
+        self.unit = unit                    # words per source batch
+        self.target = target                # seconds per batch, 0 = always one source batch
+        self.max_units = max_units
+        self.factor = factor
+        self.min_seconds = min_seconds
+        self.first_seconds = first_seconds
+        self.smoothing = smoothing
+        self.recover = recover
+        self.units = 1                      # source batches per batch sent
+        self.limit = max_units              # cap on units, lowered after a loss
+        self.per_word = None                # moving average, seconds per word
+        self.streak = 0                     # batches returned since the last loss
+        self.batches = 0
+        self.losses = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        return cls(cfg["BATCH_SIZE"],
+                   float(cfg.get("TARGET_BATCH_SECONDS", 0)),
+                   cfg.get("MAX_BATCH_UNITS", 64),
+                   float(cfg.get("WATCHDOG_FACTOR", 4.0)),
+                   float(cfg.get("WATCHDOG_MIN_SECONDS", 5.0)),
+                   float(cfg.get("WATCHDOG_FIRST_SECONDS", 120.0)),
+                   recover=cfg.get("RECOVER_BATCHES", 16))
+
+    def deadline(self, words):
+        # seconds to wait for a batch of `words` words, None = no limit
+        if not self.factor:
+            return None
+        if self.per_word is None:
+            return self.first_seconds
+        return max(self.min_seconds, self.factor * self.per_word * words)
+
+    def observe(self, words, seconds):
+        # a batch of `words` words came back after `seconds`
+        sample = seconds / max(words, 1)
+        if self.per_word is None:
+            self.per_word = sample
+        else:
+            self.per_word += self.smoothing * (sample - self.per_word)
+        self.batches += 1
+        self.streak += 1
+        if self.streak >= self.recover and self.limit < self.max_units:
+            self.limit = min(self.max_units, self.limit * 2)
+            self.streak = 0
+        if self.target:
+            want = int(self.target / max(self.per_word * self.unit, 1e-9))
+            self.units = max(1, min(want, self.limit, self.units * 2))
+
+    def lost(self, timed_out=False):
+        # the board went away (or hung) while running a batch
+        self.losses += 1
+        self.timeouts += timed_out
+        self.units = self.limit = max(1, self.units // 2)
+        self.streak = 0
+
+    def status(self):
+        per_word = "-" if self.per_word is None else f"{self.per_word * 1e3:.3f}ms"
+        return (f"batch={self.units * self.unit} words (cap {self.limit * self.unit}) per_word={per_word} "
+                f"batches={self.batches} losses={self.losses} timeouts={self.timeouts}")
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+from event_log import EventLog
+from generate import generate_stream
+
+# Campaign checkpoint and resume.
+# CAMPAIGN_CHECKPOINT holds everything needed to continue a random campaign
+# after the server restarts: the config and seed it was started with, the
+# generator position (random state and number of picks) at the last chunk
+# the instruction source has read, the elapsed campaign time, and the
+# source snapshot (batches not done by every board, per-board progress) and,
+# with COVERAGE_GUIDED, the coverage counts behind the selection weights.
+#
+# On restart the generator continues from that random state, so the in-process
+# encoders (BASE_ENCODER = native, VECTOR_ENCODER = table) produce the same
+# words the interrupted run would have; Node/rvv-as draw operands themselves,
+# so with them only the mnemonic sequence continues. Batches that were in
+# flight are sent again.
+#
+# The checkpoint is written every CHECKPOINT_SECONDS and on shutdown: JSON to a
+# temporary file, fsync, rename over the old one, fsync of the directory. Its
+# size is bounded by SOURCE_BUFFER_BATCHES batches. It is removed once the
+# campaign is finished.
+
+class Campaign:
+    def __init__(self, path, cfg):
+        self.path = path
+        self.cfg = cfg
+        self.seed = int(time.time())
+        self.elapsed_before = 0.0
+        self.started = time.monotonic()
+        self.resume = None          # (picked, random state, elapsed) to continue the generator from
+        self.snap = None            # InstructionSource snapshot to restore
+        self.coverage_snap = None   # Coverage snapshot to restore
+        self.positions = {}         # chunk number -> (picked, random state), written by the generator thread
+        self.chunks = 0
+
+    @classmethod
+    def load_or_new(cls, path, cfg, log=None):
+        # log: the server's EventLog (new/resumed campaign, changed config keys)
+        log = log if log is not None else EventLog()
+        campaign = cls(path, cfg)
+        if not os.path.exists(path):
+            # generate_stream seeds with campaign.seed, so this is the position after 0 chunks
+            campaign.positions[0] = (0, random.Random(campaign.seed).getstate())
+            log.info("campaign_new", seed=campaign.seed)
+            return campaign
+        with open(path) as f:
+            state = json.load(f)
+        changed = sorted(k for k in set(cfg) | set(state["cfg"]) if cfg.get(k) != state["cfg"].get(k))
+        if changed:
+            log.warning("campaign_config_changed", keys=changed)
+        campaign.seed = state["seed"]
+        campaign.elapsed_before = state["elapsed"]
+        rng = state["random_state"]
+        campaign.resume = (state["picked"], (rng[0], tuple(rng[1]), rng[2]), state["elapsed"])
+        campaign.snap = state["source"]
+        campaign.coverage_snap = state.get("coverage")
+        campaign.chunks = campaign.snap["chunks_read"]
+        campaign.positions[campaign.chunks] = campaign.resume[:2]
+        log.info("campaign_resumed", seed=campaign.seed, picked=state["picked"],
+                 batches_not_done=len(campaign.snap["batches"]))
+        return campaign
+
+    def on_chunk(self, picked, state):
+        # generator thread, just before chunk number self.chunks + 1 is yielded
+        self.chunks += 1
+        self.positions[self.chunks] = (picked, state)
+
+    def stream(self, seen=None, coverage=None):
+        return generate_stream(self.cfg, seen, coverage, self.seed, self.resume, self.on_chunk)
+
+    def restore(self, source, coverage=None):
+        if self.snap is not None:
+            source.restore(self.snap)
+        if coverage is not None and self.coverage_snap is not None:
+            coverage.restore(self.coverage_snap)
+
+    def elapsed(self):
+        return self.elapsed_before + time.monotonic() - self.started
+
+    def save(self, source, coverage=None):
+        # event loop: the source snapshot and the generator position after
+        # source.chunks_read chunks describe the same point of the campaign
+        if source.finished_all():
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        n = source.chunks_read
+        picked, state = self.positions[n]
+        for k in list(self.positions):
+            if k < n:
+                del self.positions[k]
+        data = {
+            "seed": self.seed,
+            "cfg": self.cfg,
+            "picked": picked,
+            "random_state": [state[0], list(state[1]), state[2]],
+            "elapsed": self.elapsed(),
+            "source": source.snapshot(),
+        }
+        if coverage is not None:
+            data["coverage"] = coverage.snapshot()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    async def checkpoint_loop(self, source, interval, coverage=None):
+        while True:
+            await asyncio.sleep(interval)
+            self.save(source, coverage)
@@ -0,0 +1,166 @@
+import math
+import random
+import threading
+
+from decode_index import load_decode_index
+from results import RECORD
+from result_store import case_rows
+
+# Coverage-guided mnemonic selection.
+# The server feeds every completed batch back through observe(). Each test case
+# is reduced to an outcome signature (outcome class, changed x/f register masks,
+# whether memory changed) and paired with the encoding class of its word (major
+# opcode and funct3). A (encoding class, signature) pair never seen before counts
+# as new coverage for the mnemonic that produced the word; nondeterministic cases
+# and cross-board divergences count as anomalies. Words the generator did not
+# report (bit-flipped/byte-swapped mutants, words evicted from `origins`) are
+# attributed by decoding them with decode_index. Selection weights are
+#   (1 + COVERAGE_NOVELTY * new coverage + COVERAGE_ANOMALY * anomalies) / sqrt(1 + tests)
+# plus COVERAGE_FLOOR, so mnemonics that are rarely run, or keep turning up new
+# behaviour, get more board time and none is starved.
+#
+# Weights are per mnemonic only. The encoding class (major opcode, funct3) is
+# part of what counts as new coverage, but operand fields are still drawn with
+# the fixed *_SPECIAL probabilities; field regions are not weighted.
+#
+# The counts and seen signatures are saved in the campaign checkpoint
+# (snapshot/restore), so a resumed campaign keeps its weights. `origins` is
+# not: words still out on the boards are attributed by decoding them.
+#
+# Draws go through an alias table (O(1) per draw). The table is rebuilt, O(n)
+# in the number of mnemonics, after every COVERAGE_REBUILD observed cases and
+# swapped in whole, so the generator thread never sees a half-built table.
+
+class AliasTable:
+    # Vose's alias method
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng=random):
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+def encoding_class(word):
+    return (word & 0x7f, word >> 12 & 0x7)
+
+def signature(row):
+    # outcome signature of a result_store.case_rows row
+    cls, detail = row[4], row[9]
+    if detail.startswith(b"==="):
+        # text log: register values are not split out, only class and memory changes
+        return (cls, b"CHG:" in detail)
+    _, _, _, _, _, n_diffs, xmask, fmask, _ = RECORD.unpack_from(detail)
+    return (cls, xmask, fmask, n_diffs > 0)
+
+class Coverage:
+    def __init__(self, mnemonics, novelty=4.0, anomaly=8.0, floor=0.05, rebuild=1024, max_origins=1 << 20):
+        self.mnemonics = list(mnemonics)
+        self.index = {m: i for i, m in enumerate(self.mnemonics)}
+        self.by_decoded = {m.lower(): i for i, m in enumerate(self.mnemonics)}
+        self.decoder = load_decode_index()
+        self.novelty, self.anomaly, self.floor = novelty, anomaly, floor
+        self.rebuild = rebuild
+        self.max_origins = max_origins
+        n = len(self.mnemonics)
+        self.tests = [0] * n
+        self.new = [0] * n
+        self.anomalies = [0] * n
+        self.seen = set()               # (encoding class, signature)
+        self.origins = {}               # word -> mnemonic index, for words still out on the boards
+        self.lock = threading.Lock()    # origins is shared with the generator thread
+        self.since_rebuild = 0
+        self.table = AliasTable([1.0] * n)
+
+    @classmethod
+    def from_cfg(cls, mnemonics, cfg):
+        return cls(mnemonics, cfg.get("COVERAGE_NOVELTY", 4.0), cfg.get("COVERAGE_ANOMALY", 8.0),
+                   cfg.get("COVERAGE_FLOOR", 0.05), cfg.get("COVERAGE_REBUILD", 1024))
+
+    # generator side
+    def sample(self, n, rng=random):
+        table = self.table
+        return [self.mnemonics[table.draw(rng)] for _ in range(n)]
+
+    def origin(self, word, mnemonic):
+        with self.lock:
+            self.origins[word] = self.index[mnemonic]
+            if len(self.origins) > self.max_origins:
+                del self.origins[next(iter(self.origins))]
+
+    # server side
+    def observe(self, board, batch, response, changed=()):
+        for row in case_rows(board, batch, response, changed):
+            i = self.mnemonic_of(row[3])
+            if i is None:
+                continue
+            self.tests[i] += 1
+            key = (encoding_class(row[3]), signature(row))
+            if key not in self.seen:
+                self.seen.add(key)
+                self.new[i] += 1
+            if row[8]:
+                self.anomalies[i] += 1
+            self.since_rebuild += 1
+        self.maybe_rebuild()
+
+    def divergences(self, rows):
+        # rows from diff_join.divergence()
+        for row in rows:
+            i = self.mnemonic_of(row[0])
+            if i is not None:
+                self.anomalies[i] += 1
+                self.since_rebuild += 1
+        self.maybe_rebuild()
+
+    def mnemonic_of(self, word):
+        with self.lock:
+            i = self.origins.get(word)
+        if i is None:
+            name = self.decoder.name(word)
+            i = self.by_decoded.get(name) if name is not None else None
+        return i
+
+    def weights(self):
+        return [(1 + self.novelty * self.new[i] + self.anomaly * self.anomalies[i]) / math.sqrt(1 + self.tests[i])
+                + self.floor for i in range(len(self.mnemonics))]
+
+    def maybe_rebuild(self):
+        if self.since_rebuild >= self.rebuild:
+            self.since_rebuild = 0
+            self.table = AliasTable(self.weights())
+
+    def snapshot(self):
+        # JSON-able counts, keyed by mnemonic so a changed mnemonic list still restores
+        return {
+            "counts": {m: [self.tests[i], self.new[i], self.anomalies[i]] for i, m in enumerate(self.mnemonics)},
+            "seen": [[list(cls), list(sig)] for cls, sig in self.seen],
+        }
+
+    def restore(self, snap):
+        for m, (tests, new, anomalies) in snap["counts"].items():
+            i = self.index.get(m)
+            if i is not None:
+                self.tests[i], self.new[i], self.anomalies[i] = tests, new, anomalies
+        self.seen = {(tuple(cls), tuple(sig)) for cls, sig in snap["seen"]}
+        self.since_rebuild = 0
+        self.table = AliasTable(self.weights())
+
+    def status(self, top=5):
+        w = self.weights()
+        best = sorted(range(len(w)), key=w.__getitem__, reverse=True)[:top]
+        return (f"signatures={len(self.seen)} tested={sum(self.tests)} anomalies={sum(self.anomalies)} top="
+                + ",".join(f"{self.mnemonics[i]}:{w[i]:.2f}" for i in best))
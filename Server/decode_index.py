@@ -0,0 +1,177 @@
+import os
+import re
+from array import array
+
+from vector_table import load_vector_table
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# In-process decoder for raw 32-bit instruction words (RV64GC without the
+# compressed set, plus RVV), so results can be labelled without Node.
+# Base instructions come from the ISA tables in Server/generator/Constants.js,
+# turned into MATCH/MASK pairs; vector instructions come from opcodes.rs through
+# vector_table.load_vector_table().
+#
+# Lookup is two levels: the major opcode and funct3 select one of 1024 buckets,
+# then the bits every mask in that bucket covers (funct7, funct6, funct12, ...)
+# select a short candidate list, most specific mask first. Most words are
+# decided by a single compare. decode_many() does the same on NumPy arrays.
+
+CONSTANTS_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generator", "Constants.js")
+
+# 32-bit ISA tables of Constants.js (ISA_C is 16-bit, ISA_RV128I is not a real target)
+BASE_TABLES = ["ISA_RV32I", "ISA_RV64I", "ISA_Zifencei", "ISA_Zicsr", "ISA_M", "ISA_A",
+               "ISA_F", "ISA_D", "ISA_Q", "ISA_Priv"]
+
+# Constants.js field name -> (bit position of the lsb, width)
+FIELD_BITS = {
+    "opcode": (0, 7), "funct3": (12, 3), "funct7": (25, 7), "funct5": (27, 5),
+    "fp_fmt": (25, 2), "rs2": (20, 5), "funct12": (20, 12),
+}
+
+_index = None
+
+def parse_constants(path=CONSTANTS_JS):
+    # {table name: {mnemonic: {field: value string}}} for BASE_TABLES, with
+    # OPCODE.X / FP_WIDTH.X / FP_FMT.X references resolved
+    with open(path) as f:
+        src = f.read()
+    objects = dict(re.findall(r"export const (\w+) = \{(.*?)\n\}", src, re.S))
+    refs = {}
+    for name in ("OPCODE", "FP_WIDTH", "FP_FMT"):
+        for key, value in re.findall(r"^\s*(\w+):\s*'([01]+)'", objects[name], re.M):
+            refs[f"{name}.{key}"] = value
+
+    tables = {}
+    for table in BASE_TABLES:
+        entries = {}
+        for mnemonic, body in re.findall(r"^\s*'?([\w.]+)'?:\s*\{(.*?)\}", objects[table], re.M):
+            fields = {}
+            for key, value in re.findall(r"(\w+):\s*('[^']*'|[\w.]+)", body):
+                fields[key] = value.strip("'") if value.startswith("'") else refs.get(value, value)
+            entries[mnemonic] = fields
+        tables[table] = entries
+    return tables
+
+def base_match_mask(fields):
+    # MATCH/MASK of one Constants.js entry for RV64
+    match = mask = 0
+    for key, (pos, width) in FIELD_BITS.items():
+        if key in fields:
+            match |= int(fields[key], 2) << pos
+            mask |= ((1 << width) - 1) << pos
+    if "shtyp" in fields:
+        # shift immediates: RV64 has a 6-bit shamt for OP-IMM, 5-bit for OP-IMM-32
+        width = 6 if fields["opcode"] == "0010011" else 7
+        match |= int(fields["shtyp"]) << 30
+        mask |= ((1 << width) - 1) << (32 - width)
+    return match, mask
+
+class DecodeIndex:
+    def __init__(self, names, isas, matches, masks):
+        self.names = names
+        self.isas = isas
+        self.matches = matches
+        self.masks = masks
+
+        # level 1: opcode | funct3 << 7, level 2: word & common[bucket]
+        order = sorted(range(len(names)), key=lambda i: -bin(masks[i]).count("1"))
+        buckets = [[] for _ in range(1024)]
+        for i in order:
+            m, k = matches[i], masks[i]
+            first = [b for b in range(1024) if (b & 0x7f | (b >> 7) << 12) & k == m & 0x707f]
+            for b in first:
+                buckets[b].append(i)
+        self.common = array("I", [0] * 1024)
+        self.sub = []
+        for b, ids in enumerate(buckets):
+            common = 0xffffffff
+            for i in ids:
+                common &= masks[i]
+            common = common & ~0x707f & 0xffffffff if ids else 0
+            self.common[b] = common
+            sub = {}
+            for i in ids:
+                sub.setdefault(matches[i] & common, []).append((masks[i], matches[i], i))
+            self.sub.append({key: tuple(c) for key, c in sub.items()})
+        self.np_tables = None
+
+    def decode(self, word):
+        # index into self.names, or -1
+        b = word & 0x7f | (word >> 5) & 0x380
+        for mask, match, i in self.sub[b].get(word & self.common[b], ()):
+            if word & mask == match:
+                return i
+        return -1
+
+    def name(self, word):
+        i = self.decode(word)
+        return self.names[i] if i >= 0 else None
+
+    def label(self, word):
+        # short text for listings
+        i = self.decode(word)
+        return self.names[i] if i >= 0 else "unknown"
+
+    def decode_many(self, words):
+        # int32 array of indexes (-1 = unknown) for a uint32 array
+        w = np.asarray(words, dtype=np.uint32)
+        keys, cand_mask, cand_match, cand_id, common = self.build_np()
+        b = (w & 0x7f) | ((w >> 5) & 0x380)
+        key = (b.astype(np.uint64) << 32) | (w & common[b])
+        slot = np.searchsorted(keys, key)
+        slot[slot >= len(keys)] = 0
+        found = keys[slot] == key
+        out = np.full(len(w), -1, dtype=np.int32)
+        for j in range(cand_mask.shape[1]):
+            undecided = found & (out < 0)
+            if not undecided.any():
+                break
+            s = slot[undecided]
+            hit = (w[undecided] & cand_mask[s, j]) == cand_match[s, j]
+            idx = np.flatnonzero(undecided)[hit]
+            out[idx] = cand_id[s[hit], j]
+        return out
+
+    def build_np(self):
+        # flattened level 2: sorted (bucket << 32 | sub key) with candidates padded
+        # to the longest list (padding never matches: mask 0, match 1)
+        if self.np_tables is None:
+            entries = sorted((b << 32 | key, c) for b, sub in enumerate(self.sub) for key, c in sub.items())
+            width = max(len(c) for _, c in entries)
+            cand_mask = np.zeros((len(entries), width), dtype=np.uint32)
+            cand_match = np.ones((len(entries), width), dtype=np.uint32)
+            cand_id = np.full((len(entries), width), -1, dtype=np.int32)
+            for s, (_, c) in enumerate(entries):
+                for j, (mask, match, i) in enumerate(c):
+                    cand_mask[s, j], cand_match[s, j], cand_id[s, j] = mask, match, i
+            keys = np.array([k for k, _ in entries], dtype=np.uint64)
+            common = np.array(self.common, dtype=np.uint32)
+            self.np_tables = (keys, cand_mask, cand_match, cand_id, common)
+        return self.np_tables
+
+def load_decode_index():
+    # built once per process
+    global _index
+    if _index is not None:
+        return _index
+    names, isas, matches, masks = [], [], array("I"), array("I")
+    for table, entries in parse_constants().items():
+        for mnemonic, fields in entries.items():
+            if fields.get("isa", "").startswith("RV128"):
+                continue
+            match, mask = base_match_mask(fields)
+            names.append(mnemonic)
+            isas.append(fields.get("isa", table[len("ISA_"):]))
+            matches.append(match)
+            masks.append(mask)
+    v_names, v_matches, v_masks = load_vector_table()[:3]
+    names.extend(v_names)
+    isas.extend(["V"] * len(v_names))
+    matches.extend(v_matches)
+    masks.extend(v_masks)
+    _index = DecodeIndex(names, isas, matches, masks)
+    return _index
@@ -0,0 +1,104 @@
+import struct
+from collections import deque
+
+from results import RECORD, MEMDIFF, popcount
+from result_store import case_rows
+
+# Streaming cross-board join of test case results, keyed by instruction word.
+# Completed batches of both boards are fed in as they arrive. A case waits in
+# `pending` only until the same word comes back from the other board; at that
+# point the pair is compared (see signature) and, if they differ, a divergence row
+# is returned from add() (the server stores it with ResultStore.append_divergences)
+# and nothing of the pair stays in memory. Words that repeat are paired in arrival order.
+#
+# `pending` holds the cases of whichever board is ahead. At most `window` cases
+# are kept; past that the oldest are dropped and counted as unpaired (they are
+# in the cases table already, they just have nothing to be compared with), so a
+# board that stops reporting cannot make the server grow without bound.
+
+SP = 2  # x2, the sandbox stack pointer: its value differs on every board
+
+class DiffJoin:
+    def __init__(self, boards, window=65536):
+        self.boards = set(boards)
+        self.window = window
+        self.pending = {}       # word -> deque of cases from the board that is ahead
+        self.order = deque()    # pending cases, oldest first (paired ones are skipped lazily)
+        self.n_pending = 0
+        self.pairs = 0
+        self.divergences = 0
+        self.unpaired = 0
+
+    def add(self, board, batch, response, changed=()):
+        # one completed batch (first run's response; `changed` = nondeterministic cases);
+        # returns the divergence rows it produced
+        if board not in self.boards:
+            return []
+        out = []
+        for row in case_rows(board, batch, response, changed):
+            self.add_case(row, out)
+        self.trim()
+        return out
+
+    def add_case(self, row, out):
+        word = row[3]
+        waiting = self.pending.get(word)
+        if waiting and waiting[0][0][0] != row[0]:
+            case = waiting.popleft()
+            if not waiting:
+                del self.pending[word]
+            case[1] = False  # paired, skipped when it reaches the front of self.order
+            self.n_pending -= 1
+            self.pairs += 1
+            if signature(case[0]) != signature(row):
+                self.divergences += 1
+                out.append(divergence(case[0], row))
+            return
+        case = [row, True]
+        self.pending.setdefault(word, deque()).append(case)
+        self.order.append(case)
+        self.n_pending += 1
+
+    def trim(self):
+        if len(self.order) > 2 * max(self.window, self.n_pending):
+            # mostly paired cases behind a long-pending one: compact
+            self.order = deque(case for case in self.order if case[1])
+        while self.order and (not self.order[0][1] or self.n_pending > self.window):
+            row, alive = self.order.popleft()
+            if not alive:
+                continue
+            waiting = self.pending[row[3]]
+            waiting.popleft()
+            if not waiting:
+                del self.pending[row[3]]
+            self.n_pending -= 1
+            self.unpaired += 1
+
+    def status(self):
+        return (f"pairs={self.pairs} divergences={self.divergences} "
+                f"pending={self.n_pending} unpaired={self.unpaired}")
+
+def signature(row):
+    # what has to match between boards: outcome class, trap cause (signo) and
+    # every changed register value and memory byte. Only what depends on where
+    # each board's sandbox lives is left out: the fault address, the value of
+    # sp (x2) and the addresses of changed memory bytes (their old and new
+    # values are still compared)
+    detail = row[9]
+    if detail.startswith(b"==="):
+        return detail.split(b"\n", 1)[1] if b"\n" in detail else b""
+    xmask, fmask = struct.unpack_from("<II", detail, 16)
+    p = RECORD.size
+    xvals = detail[p:p + 8 * popcount(xmask)]
+    if xmask >> SP & 1:
+        k = 8 * popcount(xmask & ((1 << SP) - 1))
+        xvals = xvals[:k] + xvals[k + 8:]
+    p += len(xvals) + 8 * (xmask >> SP & 1)
+    fvals = detail[p:p + 8 * popcount(fmask)]
+    p += len(fvals)
+    mem = b"".join(detail[i + 8:i + MEMDIFF.size] for i in range(p, len(detail), MEMDIFF.size))
+    return row[4], row[6], xmask, fmask, xvals, fvals, mem
+
+def divergence(a, b):
+    # row for the divergences table (see result_store.SCHEMA)
+    return (a[3], a[0], a[1], a[2], a[4], b[0], b[1], b[2], b[4], int(a[8] or b[8]), a[9], b[9])
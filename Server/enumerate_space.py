@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+
+# Exhaustive enumeration of an encoding subspace.
+# Every word w with w & ENUM_MASK == ENUM_MATCH is generated exactly once: the
+# free bits (0 in the mask) take the values 0, 1, 2, ... of a counter in order,
+# low counter bits in low word bits. The counter range is cut into shards of
+# ENUM_SHARD_SIZE words (rounded up to a multiple of BATCH_SIZE), and each shard
+# is one chunk for InstructionSource, so in shard mode the boards split the
+# sweep between them.
+#
+# A shard counts as done once InstructionSource reports all of its batches done
+# (on_done). Progress is kept in ENUM_CHECKPOINT as the number of leading shards
+# that are all done plus the done shards past that point; on restart only the
+# remaining shards are generated, shards that were in flight run again.
+#
+#   python3 enumerate_space.py /path/to/checkpoint.json    progress of a sweep
+
+def free_bit_tables(mask):
+    # tables[j][b] = counter byte j value b spread over the free bits it covers
+    free = [pos for pos in range(32) if not mask >> pos & 1]
+    tables = []
+    for j in range(0, len(free), 8):
+        group = free[j:j + 8]
+        tables.append([sum(1 << pos for k, pos in enumerate(group) if b >> k & 1) for b in range(256)])
+    return len(free), tables
+
+def parse_word(value):
+    # config values like 0x57 stay strings in read_cfg
+    return value if isinstance(value, int) else int(value, 0)
+
+class Enumeration:
+    def __init__(self, match, mask, shard_size, batch_size=1, checkpoint=None):
+        if match & ~mask & 0xffffffff:
+            raise ValueError(f"match 0x{match:08x} has bits outside mask 0x{mask:08x}")
+        self.match, self.mask = match, mask
+        self.n_free, self.tables = free_bit_tables(mask)
+        self.total = 1 << self.n_free
+        self.batch_size = batch_size
+        self.shard_size = -(-shard_size // batch_size) * batch_size
+        self.n_shards = -(-self.total // self.shard_size)
+        self.checkpoint = checkpoint
+        self.watermark = 0          # shards below this are all done
+        self.done = set()           # done shards at or above the watermark
+        self.emitted = []           # shard of each chunk handed out, in order
+        self.remaining = {}         # shard -> batches not done yet
+        if checkpoint and os.path.exists(checkpoint):
+            self.load()
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        return cls(parse_word(cfg["ENUM_MATCH"]), parse_word(cfg["ENUM_MASK"]),
+                   cfg.get("ENUM_SHARD_SIZE", 65536), cfg["BATCH_SIZE"], cfg.get("ENUM_CHECKPOINT"))
+
+    def word(self, i):
+        w = self.match
+        for table in self.tables:
+            w |= table[i & 0xff]
+            i >>= 8
+        return w
+
+    def shard_words(self, shard):
+        start = shard * self.shard_size
+        return [self.word(i) for i in range(start, min(start + self.shard_size, self.total))]
+
+    def stream(self):
+        # chunks (one per shard) for InstructionSource, skipping shards already done
+        for shard in range(self.watermark, self.n_shards):
+            if shard in self.done:
+                continue
+            words = self.shard_words(shard)
+            self.remaining[shard] = -(-len(words) // self.batch_size)
+            self.emitted.append(shard)
+            yield words
+
+    def batch_done(self, seq):
+        # InstructionSource on_done: batch seq is shard emitted[seq // batches per shard]
+        shard = self.emitted[seq // (self.shard_size // self.batch_size)]
+        self.remaining[shard] -= 1
+        if self.remaining[shard]:
+            return
+        del self.remaining[shard]
+        self.done.add(shard)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+        if self.checkpoint:
+            self.save()
+
+    def state(self):
+        return {"match": self.match, "mask": self.mask, "shard_size": self.shard_size,
+                "watermark": self.watermark, "done": sorted(self.done)}
+
+    def save(self):
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint)
+        # and the rename itself, so a crash cannot leave the old checkpoint behind
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.checkpoint)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def load(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if (state["match"], state["mask"], state["shard_size"]) != (self.match, self.mask, self.shard_size):
+            raise ValueError(f"{self.checkpoint} belongs to another sweep (match 0x{state['match']:08x} "
+                             f"mask 0x{state['mask']:08x} shard size {state['shard_size']})")
+        self.watermark = state["watermark"]
+        self.done = set(state["done"])
+
+    def progress(self):
+        n_done = self.watermark + len(self.done)
+        return (f"match=0x{self.match:08x} mask=0x{self.mask:08x} words={self.total} "
+                f"shards={n_done}/{self.n_shards} ({100 * n_done / self.n_shards:.1f}%)")
+
+def main():
+    p = argparse.ArgumentParser(description="Progress of an enumeration sweep")
+    p.add_argument("checkpoint")
+    args = p.parse_args()
+    with open(args.checkpoint) as f:
+        state = json.load(f)
+    enum = Enumeration(state["match"], state["mask"], state["shard_size"], checkpoint=args.checkpoint)
+    print(enum.progress())
+
+if __name__ == "__main__":
+    main()
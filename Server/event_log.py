@@ -0,0 +1,167 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Structured event log for the server.
+# log.info("connected", board=name) appends (time, level, event, fields) to an
+# in-memory ring buffer and returns; nothing is formatted or written on the
+# event loop. A background thread drains the buffer every LOG_FLUSH_SECONDS
+# and writes one JSON object per line to LOG_FILE, rotated at LOG_MAX_BYTES
+# (LOG_BACKUPS old files kept as LOG_FILE.1, .2, ...), and echoes records of
+# LOG_CONSOLE_LEVEL and up to the terminal.
+#
+# Field values that are callables are only called by the writer thread, so an
+# expensive dump (e.g. both responses of a nondeterministic batch) is built off
+# the event loop, and not at all if nothing keeps the record.
+#
+# LOG_LEVEL drops records below it right away. LOG_SAMPLE.<event> = r keeps
+# one in 1/r records of that event (e.g. LOG_SAMPLE.batch_done = 0.01). If the
+# writer falls behind by LOG_BUFFER records, the oldest are dropped and counted
+# instead of blocking the server.
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+NAMES = {n: name for name, n in LEVELS.items()}
+
+class EventLog:
+    def __init__(self, path=None, level="info", console_level="info", capacity=65536,
+                 flush_seconds=0.5, max_bytes=64 << 20, backups=5, sample=None):
+        self.path = path
+        self.level = LEVELS[level]
+        self.console_level = LEVELS[console_level]
+        self.ring = deque(maxlen=capacity)
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.periods = {}           # event -> keep every n-th record
+        self.seen = {}              # event -> records of it so far (sampled events only)
+        for event, rate in (sample or {}).items():
+            self.periods[event] = max(1, round(1 / rate)) if rate > 0 else 0
+        self.dropped = 0
+        self.lock = threading.Lock()  # ring and dropped, shared with the writer thread
+        self.file = None
+        self.thread = None
+        self.wake = threading.Event()
+        self.stopping = False
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        sample = {k.split(".", 1)[1]: float(v) for k, v in cfg.items() if k.startswith("LOG_SAMPLE.")}
+        return cls(cfg.get("LOG_FILE") or None,
+                   str(cfg.get("LOG_LEVEL", "info")).lower(),
+                   str(cfg.get("LOG_CONSOLE_LEVEL", "info")).lower(),
+                   cfg.get("LOG_BUFFER", 65536),
+                   float(cfg.get("LOG_FLUSH_SECONDS", 0.5)),
+                   cfg.get("LOG_MAX_BYTES", 64 << 20),
+                   cfg.get("LOG_BACKUPS", 5),
+                   sample)
+
+    def emit(self, level, event, fields):
+        if level < self.level:
+            return
+        period = self.periods.get(event)
+        if period is not None:
+            n = self.seen.get(event, 0)
+            self.seen[event] = n + 1
+            if not period or n % period:
+                return
+        record = (time.time(), level, event, fields)
+        with self.lock:
+            if len(self.ring) == self.ring.maxlen:
+                self.dropped += 1
+            self.ring.append(record)
+        if level >= LEVELS["error"]:
+            self.wake.set()
+
+    def debug(self, event, **fields):
+        self.emit(10, event, fields)
+
+    def info(self, event, **fields):
+        self.emit(20, event, fields)
+
+    def warning(self, event, **fields):
+        self.emit(30, event, fields)
+
+    def error(self, event, **fields):
+        self.emit(40, event, fields)
+
+    # writer side
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="event-log", daemon=True)
+            self.thread.start()
+
+    def close(self):
+        # flushes what is buffered
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        else:
+            self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        lines = []
+        console = []
+        records = []
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+            taken = list(self.ring)
+            self.ring.clear()
+        if dropped:
+            records.append((time.time(), LEVELS["warning"], "log_dropped", {"records": dropped}))
+        records.extend(taken)
+        for t, level, event, fields in records:
+            fields = {k: v() if callable(v) else v for k, v in fields.items()}
+            if self.path is not None:
+                lines.append(json.dumps({"t": round(t, 6), "level": NAMES[level], "event": event, **fields},
+                                        default=str))
+            if level >= self.console_level:
+                console.append(format_console(t, level, event, fields))
+        if console:
+            sys.stdout.write("\n".join(console) + "\n")
+            sys.stdout.flush()
+        if lines:
+            self.write("\n".join(lines) + "\n")
+
+    def write(self, text):
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(text)
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+def format_console(t, level, event, fields):
+    # one line per record; multi-line values (dumps) go underneath
+    short = " ".join(f"{k}={v}" for k, v in fields.items() if "\n" not in str(v))
+    text = f"{time.strftime('%H:%M:%S', time.localtime(t))} {NAMES[level]:<7} [{event}] {short}"
+    for k, v in fields.items():
+        if "\n" in str(v):
+            text += f"\n{v}"
+    return text
@@ -1,6 +1,10 @@
 import subprocess
 import json
+import struct
 import random, time
+from collections import deque
+from native_encoder import build_encoders, call_native_batch
+from vector_table import build_vector_encoders, call_vector_batch
 
 def call_instruction(input_str, node_proc):
     # Send instruction to Node.js
@@ -16,13 +20,66 @@ def call_instruction(input_str, node_proc):
     
     return data
 
-def call_rust_asm(asm_line: str) -> str:
-    # Replace with the path to your compiled Rust binary
-    rust_bin = "/home/szekang/Documents/RISCVuzz/Server/rvv-as"
-    
+NODE_ENCODER = "/home/szekang/Documents/RISCVuzz/Server/generator/main.mjs"
+
+def start_node_batch():
+    # Start main.mjs in batch mode (binary pipes): one line of mnemonics in,
+    # one packed array of u32 encodings out
+    return subprocess.Popen(
+        ['node', NODE_ENCODER, '--batch'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE
+    )
+
+def send_node_batch(mnemonics, node_proc):
+    node_proc.stdin.write((" ".join(mnemonics) + "\n").encode())
+    node_proc.stdin.flush()
+
+def recv_node_batch(node_proc):
+    header = node_proc.stdout.read(4)
+    if len(header) != 4:
+        raise RuntimeError("node encoder exited unexpectedly")
+    (count,) = struct.unpack("<I", header)
+    payload = node_proc.stdout.read(4 * count)
+    if len(payload) != 4 * count:
+        raise RuntimeError("node encoder exited unexpectedly")
+    return struct.unpack(f"<{count}I", payload)
+
+def call_instruction_batch(mnemonics, node_proc, batch_size=256, depth=4):
+    # Encode many base mnemonics through the batch-mode Node encoder.
+    # Up to `depth` batches are written before the oldest answer is read, so Node
+    # always has queued work. Keep depth * batch_size * 4 bytes well below the
+    # 64 KiB pipe buffer or both processes can block on each other.
+    # Returns one int per mnemonic, or a RuntimeError for those that failed.
+    results = []
+    in_flight = deque()
+
+    def collect():
+        batch = in_flight.popleft()
+        for mne, word in zip(batch, recv_node_batch(node_proc)):
+            # 0 marks an encoding error (message printed on Node's stderr)
+            results.append(word if word != 0 else RuntimeError(f"failed to encode {mne}"))
+
+    for i in range(0, len(mnemonics), batch_size):
+        batch = mnemonics[i:i + batch_size]
+        send_node_batch(batch, node_proc)
+        in_flight.append(batch)
+        if len(in_flight) >= depth:
+            collect()
+    while in_flight:
+        collect()
+
+    return results
+
+RUST_ASM_BIN = "/home/szekang/Documents/RISCVuzz/Server/rvv-as"
+
+def call_rust_asm_oneshot(asm_line: str) -> str:
+    # Spawns one rvv-as process per instruction.
+    # Kept for comparison against the streaming path (see benchmark.py)
+
     # Call the Rust program with the instruction as an argument
     result = subprocess.run(
-        [rust_bin, asm_line],
+        [RUST_ASM_BIN, asm_line],
         capture_output=True,  # Capture stdout and stderr
         text=True             # Return output as string instead of bytes
     )
@@ -33,6 +90,37 @@ def call_rust_asm(asm_line: str) -> str:
     
     return result.stdout
 
+def start_rust_asm():
+    # Start rvv-as once in streaming mode: one line in, one line out
+    return subprocess.Popen(
+        [RUST_ASM_BIN, "--stream"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True
+    )
+
+def call_rust_asm(asm_line: str, rust_proc) -> str:
+    return call_rust_asm_batch([asm_line], rust_proc)[0]
+
+def call_rust_asm_batch(asm_lines, rust_proc):
+    # Pipeline a batch of instructions through the long-lived rvv-as process:
+    # all lines are written at once, then the answers are read back in order.
+    # Keep batches moderate (a few hundred lines) so neither pipe fills up.
+    rust_proc.stdin.write("".join(line + "\n" for line in asm_lines))
+    rust_proc.stdin.flush()
+
+    results = []
+    for _ in asm_lines:
+        output = rust_proc.stdout.readline()
+        if not output:
+            raise RuntimeError("rvv-as exited unexpectedly")
+        output = output.strip()
+        if output.startswith("error:"):
+            results.append(RuntimeError(output[len("error:"):].strip()))
+        else:
+            results.append(output)
+    return results
+
 def flip_bits(inst_word, cfg):
     # With flip_prob chance, flip some bits
     if random.random() >= cfg["FLIP_PROBABILITY"]:
@@ -126,45 +214,126 @@ VECTOR_INSTRUCTIONS = [
     "vwsub.wx", "vwsubu.vv", "vwsubu.vx", "vwsubu.wv", "vwsubu.wx", "vxor.vi", "vxor.vv", "vxor.vx", "vzext.vf2", "vzext.vf4", "vzext.vf8",
 ]
 
-def generate_instructions(cfg):
-    instructions = []
-    
-    # Start Node.js process once
-    node_proc = subprocess.Popen(
-        ['node', '/home/szekang/Documents/RISCVuzz/Server/generator/main.mjs'],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        text=True
-    )
+VECTOR_SET = frozenset(VECTOR_INSTRUCTIONS)
+
+def generate_stream(cfg, seen=None, coverage=None, seed=None, resume=None, on_chunk=None):
+    # Yields lists of encoded instructions, GEN_CHUNK_SIZE picks at a time, until
+    # TOTAL_INSTRUCTIONS have been picked (0 = no limit) or CAMPAIGN_SECONDS have
+    # passed (0 = no limit). The encoder processes stay open between chunks.
+    # seen: optional SeenCache (seen_cache.py); words it has already seen are dropped.
+    # coverage: optional Coverage (coverage_weights.py); mnemonics are drawn by its weights
+    # instead of uniformly, and it is told which mnemonic each word came from.
+    # seed: random seed (default: current time). resume: (picked, random state,
+    # elapsed seconds) from a campaign checkpoint to continue from instead.
+    # on_chunk(picked, random state) is called before each chunk is yielded.
+
+    # BASE_ENCODER selects how base instructions are encoded:
+    # "node" -> Server/generator/main.mjs, "native" -> native_encoder.py (in-process)
+    use_native = cfg.get("BASE_ENCODER", "node") == "native"
+
+    # Start Node.js process once (batch mode)
+    node_proc = None if use_native else start_node_batch()
+    # VECTOR_ENCODER selects how vector instructions are encoded:
+    # "table" -> vector_table.py (in-process, from opcodes.rs), "rvv-as" -> rvv-as --stream
+    use_table = cfg.get("VECTOR_ENCODER", "table") == "table"
+
+    # Start rvv-as once as well
+    rust_proc = None if use_table else start_rust_asm()
+
+    vector_encoders = build_vector_encoders(cfg) if use_table else None
+    base_encoders = build_encoders(cfg) if use_native else None
+
     # generate random seed
-    seed = int(time.time())
-    random.seed(seed)   
+    if seed is None:
+        seed = int(time.time())
+    random.seed(seed)
+    picked, elapsed = 0, 0
+    if resume is not None:
+        picked, state, elapsed = resume
+        random.setstate(state)
 
     # Combine VECTOR and BASE instructions
     all_instructions = VECTOR_INSTRUCTIONS + BASE_INSTRUCTIONS
 
-    for _ in range(cfg["TOTAL_INSTRUCTIONS"]):
-        # Randomly select one instruction
-        asm_input = random.choice(all_instructions)
-        # print("Selected Input:", asm_input)
-        try:
-            # Determine which function to call
-            if asm_input in VECTOR_INSTRUCTIONS:
-                result = int(call_rust_asm(asm_input), 16)
+    total = cfg["TOTAL_INSTRUCTIONS"]
+    chunk_size = cfg.get("GEN_CHUNK_SIZE", 1024)
+    deadline = time.monotonic() + cfg["CAMPAIGN_SECONDS"] - elapsed if cfg.get("CAMPAIGN_SECONDS", 0) else None
+
+    try:
+        while (not total or picked < total) and (deadline is None or time.monotonic() < deadline):
+            # Randomly select a chunk of instructions up front so they can be pipelined to the encoders
+            n = min(chunk_size, total - picked) if total else chunk_size
+            if coverage is not None:
+                picks = coverage.sample(n)
+            else:
+                picks = [random.choice(all_instructions) for _ in range(n)]
+            picked += n
+
+            vector_picks = [asm for asm in picks if asm in VECTOR_SET]
+            base_picks = [asm for asm in picks if asm not in VECTOR_SET]
+
+            vector_results = []
+            if use_table:
+                vector_results = call_vector_batch(vector_picks, vector_encoders)
             else:
-                result = int((call_instruction(asm_input, node_proc))["hex"], 16)
+                rust_batch = cfg.get("RVV_AS_BATCH_SIZE", 256)
+                for i in range(0, len(vector_picks), rust_batch):
+                    vector_results.extend(call_rust_asm_batch(vector_picks[i:i + rust_batch], rust_proc))
+            vector_results = iter(vector_results)
 
-            # formatted_result = "0x{:08x}".format(result & 0xffffffff)
-            # instructions.append(formatted_result)
-            # print("output:", formatted_result)
-            final_result = result & 0xffffffff
-            instructions.append(final_result)
+            if use_native:
+                base_results = iter(call_native_batch(base_picks, base_encoders))
+            else:
+                base_results = iter(call_instruction_batch(
+                    base_picks, node_proc,
+                    batch_size=cfg.get("NODE_BATCH_SIZE", 256),
+                    depth=cfg.get("NODE_PIPELINE_DEPTH", 4)))
 
-            # check_flip(instructions, result, cfg)
+            instructions = []
+            for asm_input in picks:
+                # print("Selected Input:", asm_input)
+                try:
+                    # Take the next result from the matching encoder
+                    if asm_input in VECTOR_SET:
+                        output = next(vector_results)
+                        if isinstance(output, RuntimeError):
+                            raise output
+                        result = output if use_table else int(output, 16)
+                    else:
+                        result = next(base_results)
+                        if isinstance(result, RuntimeError):
+                            raise result
 
-        except RuntimeError as e:
-            print("Input:", asm_input, " -> Error:", e)
+                    # formatted_result = "0x{:08x}".format(result & 0xffffffff)
+                    # instructions.append(formatted_result)
+                    # print("output:", formatted_result)
+                    final_result = result & 0xffffffff
+                    instructions.append(final_result)
+                    if coverage is not None:
+                        coverage.origin(final_result, asm_input)
 
+                    # check_flip(instructions, result, cfg)
+
+                except RuntimeError as e:
+                    print("Input:", asm_input, " -> Error:", e)
+
+            if seen is not None:
+                instructions = seen.filter(instructions)
+            if on_chunk is not None:
+                on_chunk(picked, random.getstate())
+            yield instructions
+    finally:
+        for proc in (node_proc, rust_proc):
+            if proc is None:
+                continue
+            proc.stdin.close()
+            proc.wait()
+
+def generate_instructions(cfg):
+    # Whole campaign as one list (TOTAL_INSTRUCTIONS must be set)
+    instructions = []
+    for chunk in generate_stream(cfg):
+        instructions.extend(chunk)
     return instructions
 
     # print("-----------------------------------")
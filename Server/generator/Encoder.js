@@ -1029,7 +1029,8 @@ function to_bin(num, bits) {
 if (num < 0) {
     num = (1 << bits) + num; // two's complement for negatives
   }
-  return num.toString(2).padStart(bits, '0');
+  // truncate to the field width (special values can be wider than the field)
+  return num.toString(2).padStart(bits, '0').slice(-bits);
 }
 
 // Random signed immediate generator
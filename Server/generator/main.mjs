@@ -2,13 +2,42 @@
 import readline from 'readline';
 import { Instruction } from './Instruction.js';
 
+// --batch: each input line holds many space-separated mnemonics and is answered
+// with one packed binary response instead of one JSON line per instruction:
+//   u32 count (little endian) | count x u32 encoding (little endian)
+// An encoding of 0 marks a mnemonic that failed to encode (no valid 32-bit
+// encoding has opcode bits [1:0] == 00); its error message goes to stderr.
+const batchMode = process.argv.includes('--batch');
+
 const rl = readline.createInterface({
     input: process.stdin,
     output: process.stdout,
     terminal: false
 });
 
+function encodeBatch(line) {
+    const mnemonics = line.trim().split(/\s+/).filter(m => m.length > 0);
+    const out = Buffer.alloc(4 + 4 * mnemonics.length);
+    out.writeUInt32LE(mnemonics.length, 0);
+    mnemonics.forEach((mne, i) => {
+        try {
+            // lower-case first: upper-case mnemonics made of hex digits
+            // (e.g. "ADD") would otherwise be parsed as hex values
+            const inst = new Instruction(mne.toLowerCase());
+            out.writeUInt32LE(parseInt(inst.hex, 16) >>> 0, 4 + 4 * i);
+        } catch (err) {
+            console.error(`${mne}: ${err.message || String(err)}`);
+            out.writeUInt32LE(0, 4 + 4 * i);
+        }
+    });
+    process.stdout.write(out);
+}
+
 rl.on('line', (line) => {
+    if (batchMode) {
+        encodeBatch(line);
+        return;
+    }
     try {
         const inst = new Instruction(line.trim());
         // console.log(JSON.stringify({ asm: inst.asm, hex: inst.hex }));
@@ -0,0 +1,398 @@
+import asyncio
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from event_log import EventLog
+
+# Streaming instruction source for the server.
+# A producer task pulls chunks from a (blocking) instruction iterator such as
+# generate.generate_stream() in its own worker thread, cuts them into BATCH_SIZE batches
+# and keeps at most SOURCE_BUFFER_BATCHES of them buffered, so memory stays constant
+# however long the campaign runs and the first batch is ready almost immediately.
+#
+# SCHEDULE_MODE decides who runs which batch:
+#   differential  every board reads every batch through its own cursor (cross-board
+#                 comparison); a batch is dropped once all boards have completed it
+#   shard         one shared queue; each batch is leased to whichever board asks next
+#                 and dropped once that board completes it. Leases held by a board
+#                 that disconnects go back to the front of the queue.
+#
+# Crash bisection: when a board disconnects, the batch it was running (the oldest
+# one in flight, passed to unsubscribe as `lost`; several if they were sent as
+# one, see get_many) is suspected of having killed or hung the client. Instead
+# of running it again whole it is split in halves,
+# which are handed out before anything else (to the same board in differential
+# mode, to any board in shard mode) under batch ids from SPLIT_BASE up. A half
+# that is lost again is split again; a single word that is lost is quarantined
+# (on_quarantine(word, name)) and not run again. The original batch counts as
+# completed once all its parts are.
+#
+# A board that goes away with batches under bisection keeps its place (the
+# batches it has not completed stay buffered) so it can pick up where it left
+# off. If the buffer fills up while such a board is still away, its place is
+# dropped instead of stalling the boards that are connected (evict_departed);
+# should it come back later it starts at the oldest batch still buffered.
+#
+# on_done(seq), if given, is called once a batch has been dropped because every
+# board that had to run it did (used to checkpoint enumeration progress).
+# Requeues, bisections and quarantined words go to `log` (the server's EventLog;
+# a fresh one that nobody writes out by default).
+#
+# Every batch is also kept packed in network order (`wire`, one buffer per chunk,
+# batches are memoryview slices of it), so the server sends it as is to every
+# board that runs it, without a Python object per word.
+#
+# stop(producer) cancels the producer and returns once the worker thread is out
+# of the iterator, so what the iterator uses (seen cache, coverage) can be closed.
+#
+# snapshot()/restore() carry everything not done yet across a server restart
+# (see campaign.py): buffered batches, the words of a partly cut chunk, how
+# many chunks were read and how far each board got. After a restore, batches
+# that were in flight are handed out again. Bisections in progress are not
+# kept; their batches run whole again and are split anew if they crash.
+
+MODES = ("differential", "shard")
+
+SPLIT_BASE = 1 << 31  # batch ids of split parts, regular batches count up from 0
+
+def pack(words):
+    # big-endian 32-bit words as a byte memoryview; slices of it are zero-copy
+    buf = array("I", words)
+    if sys.byteorder == "little":
+        buf.byteswap()
+    return memoryview(buf).cast("B")
+
+class InstructionSource:
+    def __init__(self, chunks, batch_size, max_batches=64, mode="differential", on_done=None, on_quarantine=None,
+                 log=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown SCHEDULE_MODE: {mode}")
+        self.chunks = chunks          # iterator of instruction lists
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.mode = mode
+        self.on_done = on_done
+        self.on_quarantine = on_quarantine
+        self.log = log if log is not None else EventLog()
+        self.batches = {}             # seq -> list of instructions
+        self.wire = {}                # seq or split id -> the same words packed (see pack)
+        self.next_seq = 0             # seq of the next batch produced
+        self.pending = []             # words of the last chunk not yet cut into a batch
+        self.chunks_read = 0
+        self.gen_seconds = 0.0        # time spent waiting on the instruction iterator
+        self.done = False
+        self.changed = asyncio.Condition()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="generator")
+
+        # differential mode
+        self.cursors = {}             # client name -> seq of the next batch it reads
+        self.advanced = {}            # client name -> seq after the last batch it completed
+        self.finished = {}            # client name -> seq of the oldest batch it has not completed
+        self.departed = set()         # boards not connected that still have a place in `finished`
+        # shard mode
+        self.queue = deque()          # seqs waiting for a board
+        self.leases = {}              # seq -> client name (split parts in differential mode too)
+
+        # crash bisection
+        self.parts = {}               # split id -> words
+        self.part_parent = {}         # split id -> (board or None in shard mode, seq of the original batch)
+        self.open_parts = {}          # (board or None, seq) -> parts not completed yet
+        self.part_queues = {}         # board (None in shard mode) -> deque of split ids to run first
+        self.next_part = SPLIT_BASE
+        self.quarantined = []         # (word, board, seq of the original batch)
+
+        self.completed = {}           # client name -> number of batches completed
+
+    @classmethod
+    def from_list(cls, instructions, batch_size, max_batches=64, mode="differential"):
+        return cls(iter([list(instructions)]), batch_size, max_batches, mode)
+
+    async def run(self):
+        # producer: runs until the instruction iterator is exhausted
+        loop = asyncio.get_running_loop()
+        while True:
+            start = time.perf_counter()
+            chunk = await loop.run_in_executor(self.executor, next, self.chunks, None)
+            self.gen_seconds += time.perf_counter() - start
+            if chunk is None:
+                break
+            self.chunks_read += 1
+            self.pending.extend(chunk)
+            # all whole batches of the chunk packed at once
+            full = len(self.pending) // self.batch_size * self.batch_size
+            packed = pack(self.pending[:full])
+            for i in range(0, 4 * full, 4 * self.batch_size):
+                await self.put(self.pending[:self.batch_size], packed[i:i + 4 * self.batch_size])
+                del self.pending[:self.batch_size]
+        if self.pending:
+            await self.put(self.pending)
+            self.pending = []
+
+        async with self.changed:
+            self.done = True
+            self.changed.notify_all()
+
+    async def stop(self, producer):
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        # one worker: this runs after a next() already handed to it has returned
+        await asyncio.get_running_loop().run_in_executor(self.executor, lambda: None)
+        self.executor.shutdown(wait=False)
+
+    async def put(self, batch, wire=None):
+        async with self.changed:
+            while len(self.batches) >= self.max_batches and not self.evict_departed():
+                await self.changed.wait()
+            self.batches[self.next_seq] = batch
+            self.wire[self.next_seq] = pack(batch) if wire is None else wire
+            if self.mode == "shard":
+                self.queue.append(self.next_seq)
+            self.next_seq += 1
+            self.changed.notify_all()
+
+    def subscribe(self, name):
+        # in differential mode a board that connects late starts at the oldest batch still buffered,
+        # a board known from a restored snapshot or a lost batch where it left off
+        self.departed.discard(name)
+        start = self.finished.get(name, min(self.batches, default=self.next_seq))
+        self.advanced.setdefault(name, start)
+        # batches of this board under bisection are not read again
+        cursor = self.advanced[name]
+        while (name, cursor) in self.open_parts:
+            cursor += 1
+        self.cursors[name] = cursor
+        self.update_finished(name)
+        self.completed.setdefault(name, 0)
+
+    async def unsubscribe(self, name, lost=()):
+        # lost: [(seq, batch), ...] the board was running when it went away, if any
+        async with self.changed:
+            for seq, batch in lost:
+                self.split(name, seq, batch)
+            self.cursors.pop(name, None)
+            if not lost and not any(owner == name for owner, _ in self.open_parts):
+                # a board that went away cleanly no longer holds batches back
+                self.finished.pop(name, None)
+                self.advanced.pop(name, None)
+            elif self.mode != "shard":
+                self.departed.add(name)
+            # give back whatever this board had leased (split parts are leased in both modes)
+            lost_leases = sorted((seq for seq, owner in self.leases.items() if owner == name), reverse=True)
+            for seq in lost_leases:
+                del self.leases[seq]
+                if seq >= SPLIT_BASE:
+                    self.part_queues.setdefault(None if self.mode == "shard" else name, deque()).appendleft(seq)
+                else:
+                    self.queue.appendleft(seq)
+            if lost_leases:
+                self.log.info("leases_requeued", board=name, batches=len(lost_leases))
+            self.trim()
+            self.changed.notify_all()
+
+    def split(self, name, seq, batch):
+        owner = None if self.mode == "shard" else name
+        if seq >= SPLIT_BASE:
+            if seq not in self.parts:
+                return
+            key = self.part_parent.pop(seq)
+            self.drop_part(seq)
+            self.open_parts[key] -= 1
+        else:
+            key = (owner, seq)
+            self.open_parts[key] = 0
+            self.update_finished(name)
+        self.leases.pop(seq, None)
+
+        if len(batch) <= 1:
+            for word in batch:
+                self.quarantined.append((word, name, key[1]))
+                self.log.warning("quarantined", board=name, word=f"0x{word:08x}", batch=key[1])
+                if self.on_quarantine is not None:
+                    self.on_quarantine(word, name)
+            if not self.open_parts[key]:
+                self.parent_done(name, key)
+            return
+
+        mid = len(batch) // 2
+        queue = self.part_queues.setdefault(owner, deque())
+        for part in (batch[mid:], batch[:mid]):
+            part_id = self.next_part
+            self.next_part += 1
+            self.parts[part_id] = part
+            self.wire[part_id] = pack(part)
+            self.part_parent[part_id] = key
+            self.open_parts[key] += 1
+            queue.appendleft(part_id)
+        self.log.warning("bisecting", board=name, batch=seq, words=len(batch))
+
+    def parent_done(self, name, key):
+        # all parts of a lost batch are completed or quarantined
+        del self.open_parts[key]
+        owner, seq = key
+        if self.mode == "shard":
+            if self.drop(seq) is not None and self.on_done is not None:
+                self.on_done(seq)
+        else:
+            self.advanced[owner] = max(self.advanced.get(owner, 0), seq + 1)
+            self.update_finished(owner)
+            self.trim()
+
+    def evict_departed(self):
+        # differential: the buffer is full; forget the places of boards that are
+        # away, with their bisections, so they no longer hold batches back.
+        # True if there was anything to forget
+        if not self.departed:
+            return False
+        for name in sorted(self.departed):
+            self.finished.pop(name, None)
+            self.advanced.pop(name, None)
+            for part_id in self.part_queues.pop(name, ()):
+                del self.part_parent[part_id]
+                self.drop_part(part_id)
+            for key in [key for key in self.open_parts if key[0] == name]:
+                del self.open_parts[key]
+            self.log.warning("place_dropped", board=name, reason="away with the buffer full")
+        self.departed.clear()
+        self.trim()
+        return True
+
+    def update_finished(self, name):
+        # differential: oldest batch the board has not completed, lost batches
+        # under bisection included
+        if self.mode == "shard" or name not in self.advanced:
+            return
+        open_seqs = [seq for owner, seq in self.open_parts if owner == name]
+        self.finished[name] = min([self.advanced[name]] + open_seqs)
+
+    async def get(self, name):
+        # (seq, batch) to run next on this board, or None once the campaign is over
+        async with self.changed:
+            if self.mode == "shard":
+                parts = self.part_queues.setdefault(None, deque())
+                # a board still running the last leases may disconnect and hand them back
+                await self.changed.wait_for(lambda: parts or self.queue or (self.done and not self.leases))
+                seq = parts.popleft() if parts else self.queue.popleft() if self.queue else None
+                if seq is None:
+                    return None
+                self.leases[seq] = name
+                return seq, self.parts[seq] if seq >= SPLIT_BASE else self.batches[seq]
+
+            parts = self.part_queues.setdefault(name, deque())
+            await self.changed.wait_for(lambda: parts or self.cursors[name] < self.next_seq or self.done)
+            if parts:
+                seq = parts.popleft()
+                self.leases[seq] = name
+                return seq, self.parts[seq]
+            seq = self.cursors[name]
+            if seq >= self.next_seq:
+                return None
+            self.cursors[name] = seq + 1
+            return seq, self.batches[seq]
+
+    async def get_many(self, name, limit):
+        # like get(), plus up to limit - 1 more regular batches that are ready
+        # right now (sent to the board as one); split parts always go alone.
+        # [] once the campaign is over
+        leased = await self.get(name)
+        if leased is None:
+            return []
+        taken = [leased]
+        if leased[0] >= SPLIT_BASE:
+            return taken
+        async with self.changed:
+            while len(taken) < limit:
+                if self.mode == "shard":
+                    if not self.queue or self.part_queues.get(None):
+                        break
+                    seq = self.queue.popleft()
+                    self.leases[seq] = name
+                else:
+                    seq = self.cursors[name]
+                    if seq >= self.next_seq or self.part_queues.get(name):
+                        break
+                    self.cursors[name] = seq + 1
+                taken.append((seq, self.batches[seq]))
+        return taken
+
+    async def complete(self, name, seq):
+        # board `name` has sent back the results for batch `seq`
+        async with self.changed:
+            self.completed[name] = self.completed.get(name, 0) + 1
+            if seq >= SPLIT_BASE:
+                self.leases.pop(seq, None)
+                if seq in self.parts:
+                    self.drop_part(seq)
+                    key = self.part_parent.pop(seq)
+                    self.open_parts[key] -= 1
+                    if not self.open_parts[key]:
+                        self.parent_done(name, key)
+            elif self.mode == "shard":
+                self.leases.pop(seq, None)
+                if self.drop(seq) is not None and self.on_done is not None:
+                    self.on_done(seq)
+            else:
+                self.advanced[name] = seq + 1
+                self.update_finished(name)
+                self.trim()
+            self.changed.notify_all()
+
+    def trim(self):
+        # differential: drop batches every connected board has completed
+        # (keep all while nobody is connected)
+        if self.mode == "shard" or not self.finished:
+            return
+        low = min(self.finished.values())
+        for seq in sorted(seq for seq in self.batches if seq < low):
+            self.drop(seq)
+            if self.on_done is not None:
+                self.on_done(seq)
+
+    def drop(self, seq):
+        # batch `seq` is done; returns its words, None if it was dropped already
+        self.wire.pop(seq, None)
+        return self.batches.pop(seq, None)
+
+    def drop_part(self, part_id):
+        del self.parts[part_id]
+        del self.wire[part_id]
+
+    def finished_all(self):
+        return self.done and not self.batches
+
+    def snapshot(self):
+        # JSON-able state; call from the event loop (consistent between awaits)
+        return {
+            "mode": self.mode,
+            "next_seq": self.next_seq,
+            "chunks_read": self.chunks_read,
+            "batches": {str(seq): batch for seq, batch in self.batches.items()},
+            "pending": list(self.pending),
+            "finished": dict(self.finished),
+            "completed": dict(self.completed),
+        }
+
+    def restore(self, snap):
+        # before run(): the chunk iterator continues after snap["chunks_read"] chunks
+        self.next_seq = snap["next_seq"]
+        self.chunks_read = snap["chunks_read"]
+        self.batches = {int(seq): batch for seq, batch in snap["batches"].items()}
+        self.wire = {seq: pack(batch) for seq, batch in self.batches.items()}
+        self.pending = list(snap["pending"])
+        self.completed = dict(snap["completed"])
+        if self.mode == "shard":
+            self.queue = deque(sorted(self.batches))
+        else:
+            # boards of the interrupted run keep their place until they reconnect,
+            # or until it would stall the others (see evict_departed)
+            low = min(self.batches, default=self.next_seq)
+            self.finished = {name: max(seq, low) for name, seq in snap["finished"].items()}
+            self.advanced = dict(self.finished)
+            self.departed = set(self.finished)
+
+    def status(self):
+        return (f"mode={self.mode} produced={self.next_seq} buffered={len(self.batches)} "
+                f"leased={len(self.leases)} splitting={len(self.open_parts)} "
+                f"quarantined={len(self.quarantined)} completed={self.completed}")
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Live server metrics.
+# handle_client updates plain counters and fixed-bucket histograms (one bisect
+# and two additions per observation), so keeping them costs next to nothing
+# per batch. Rates, cumulative buckets and the source's queue depth are only
+# worked out when somebody reads them:
+#   METRICS_PORT   local HTTP endpoint: /metrics (Prometheus text), /metrics.json
+#   METRICS_FILE   Prometheus text file rewritten every METRICS_SECONDS (for
+#                  node_exporter's textfile collector, or just `cat`)
+#
+# Per board: words and batches completed (and words per second over the last
+# RATE_SECONDS, from per-second counts kept as batches complete, so reading the
+# metrics never changes them), result bytes, connects, batches in flight and
+# the batch round trip (send of the batch until both results are
+# back) as a histogram. Per stage, where the time goes: generation (the
+# producer waiting on the instruction iterator), send (write + drain), board
+# (round trip) and compare (digest compare, store, seen, join, coverage).
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+STAGES = ("send", "board", "compare")
+PREFIX = "riscvuzz_"
+RATE_SECONDS = 60
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, observations <= bound) as Prometheus wants them
+        total = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            yield bound, total
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+        return float("inf")
+
+class BoardStats:
+    def __init__(self):
+        self.words = 0
+        self.batches = 0
+        self.result_bytes = 0
+        self.connects = 0
+        self.connected = False
+        self.inflight = 0
+        self.rtt = Histogram()
+        self.created = time.monotonic()
+        self.recent = deque(maxlen=RATE_SECONDS)  # [whole second, words completed in it]
+
+    def completed(self, words):
+        self.words += words
+        second = int(time.monotonic())
+        if self.recent and self.recent[-1][0] == second:
+            self.recent[-1][1] += words
+        else:
+            self.recent.append([second, words])
+
+    def rate(self, now):
+        # words per second over the last RATE_SECONDS (less right after the board appeared)
+        since = now - RATE_SECONDS
+        span = min(RATE_SECONDS, now - self.created)
+        return sum(words for second, words in self.recent if second >= since) / max(span, 1e-9)
+
+class Metrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.boards = {}
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.source = None  # InstructionSource, for generation time and queue depth
+
+    def board(self, name):
+        stats = self.boards.get(name)
+        if stats is None:
+            stats = self.boards[name] = BoardStats()
+        return stats
+
+    def snapshot(self):
+        now = time.monotonic()
+        boards = {}
+        for name, b in self.boards.items():
+            boards[name] = {
+                "connected": b.connected, "connects": b.connects, "words": b.words, "batches": b.batches,
+                "result_bytes": b.result_bytes, "inflight": b.inflight,
+                "words_per_s": b.rate(now),
+                "rtt_p50_s": b.rtt.quantile(0.5), "rtt_p99_s": b.rtt.quantile(0.99),
+            }
+        stages = {stage: h.sum for stage, h in self.stages.items()}
+        queue = {}
+        s = self.source
+        if s is not None:
+            stages["generation"] = s.gen_seconds
+            queue = {"produced": s.next_seq, "buffered": len(s.batches), "leased": len(s.leases),
+                     "splitting": len(s.open_parts), "quarantined": len(s.quarantined), "done": s.done}
+        return {"uptime_s": now - self.started, "boards": boards, "stage_seconds": stages, "queue": queue}
+
+    def prometheus(self):
+        lines = []
+
+        def metric(name, kind, samples):
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{PREFIX}{name}{labels} {value}")
+
+        def histogram(name, label, hists):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for key, h in hists:
+                for bound, total in h.cumulative():
+                    le = "+Inf" if bound == float("inf") else bound
+                    lines.append(f'{PREFIX}{name}_bucket{{{label}="{key}",le="{le}"}} {total}')
+                lines.append(f'{PREFIX}{name}_sum{{{label}="{key}"}} {h.sum}')
+                lines.append(f'{PREFIX}{name}_count{{{label}="{key}"}} {h.count}')
+
+        boards = sorted(self.boards.items())
+        metric("words_total", "counter", [(f'{{board="{n}"}}', b.words) for n, b in boards])
+        metric("batches_total", "counter", [(f'{{board="{n}"}}', b.batches) for n, b in boards])
+        metric("result_bytes_total", "counter", [(f'{{board="{n}"}}', b.result_bytes) for n, b in boards])
+        metric("connects_total", "counter", [(f'{{board="{n}"}}', b.connects) for n, b in boards])
+        metric("connected", "gauge", [(f'{{board="{n}"}}', int(b.connected)) for n, b in boards])
+        metric("inflight_batches", "gauge", [(f'{{board="{n}"}}', b.inflight) for n, b in boards])
+        histogram("batch_rtt_seconds", "board", [(n, b.rtt) for n, b in boards])
+        histogram("stage_seconds", "stage", list(self.stages.items()))
+        s = self.source
+        if s is not None:
+            metric("generation_seconds_total", "counter", [("", s.gen_seconds)])
+            metric("produced_batches_total", "counter", [("", s.next_seq)])
+            metric("buffered_batches", "gauge", [("", len(s.batches))])
+            metric("leased_batches", "gauge", [("", len(s.leases))])
+            metric("splitting_batches", "gauge", [("", len(s.open_parts))])
+            metric("quarantined_words", "gauge", [("", len(s.quarantined))])
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    async def file_loop(self, path, interval):
+        while True:
+            self.write_file(path)
+            await asyncio.sleep(interval)
+
+    async def handle_http(self, reader, writer):
+        # minimal HTTP/1.0: GET /metrics or GET /metrics.json
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass  # headers
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        path = request.split()[1].decode(errors="replace") if len(request.split()) > 1 else "/"
+        if path.endswith(".json"):
+            body, kind = json.dumps(self.snapshot(), indent=1).encode(), "application/json"
+        else:
+            body, kind = self.prometheus().encode(), "text/plain; version=0.0.4"
+        writer.write(f"HTTP/1.0 200 OK\r\nContent-Type: {kind}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        except ConnectionResetError:
+            pass
+        writer.close()
+
+    async def serve(self, port):
+        return await asyncio.start_server(self.handle_http, "127.0.0.1", port)
@@ -0,0 +1,97 @@
+import os
+import sys
+import random
+
+# In-process encoder for BASE_INSTRUCTIONS.
+# Builds on the template tables in storage/config.py and the encode_* helpers in
+# storage/riscv_gen.py, and mirrors the operand choices of Server/generator/Encoder.js
+# (registers and immediates biased by config.cfg), so no Node process is needed.
+# testing/test_native_encoder.py checks the field layouts against Encoder.js.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "storage"))
+from config import RV32I_TEMPLATES, AMO_TEMPLATES, FLOATING_TEMPLATES, FP_ROUNDING_MODES
+from riscv_gen import encode_r, encode_i, encode_s, encode_b, encode_u, encode_j
+
+TEMPLATES = {name: (instr_type, fields)
+             for name, instr_type, fields in RV32I_TEMPLATES + AMO_TEMPLATES + FLOATING_TEMPLATES}
+
+def build_encoders(cfg):
+    # Returns {mnemonic: fn() -> 32-bit encoding} for every template.
+    # Config lists are captured once here so each call is only a few random draws.
+    gprs, special_gprs, gpr_special = cfg["GPRs"], cfg["SPECIAL_GPRS"], cfg["GPR_SPECIAL"]
+    fregs, special_fprs, fpr_special = cfg["FREGs"], cfg["SPECIAL_FPRS"], cfg["FPR_SPECIAL"]
+    special_simms, special_uimms, imm_special = cfg["SPECIAL_SIMMS"], cfg["SPECIAL_UIMMS"], cfg["IMM_SPECIAL"]
+    rand, choice, randint = random.random, random.choice, random.randint
+
+    def pick_gpr():
+        return choice(special_gprs) if rand() < gpr_special else choice(gprs)
+
+    def pick_fpr():
+        return choice(special_fprs) if rand() < fpr_special else choice(fregs)
+
+    # immediates are truncated to `bits` like Encoder.js does
+    def rand_simm(bits):
+        if rand() < imm_special:
+            return choice(special_simms) & ((1 << bits) - 1)
+        return randint(-(1 << (bits - 1)), (1 << (bits - 1)) - 1) & ((1 << bits) - 1)
+
+    def rand_uimm(bits):
+        if rand() < imm_special:
+            return choice(special_uimms) & ((1 << bits) - 1)
+        return randint(0, (1 << bits) - 1)
+
+    def make(instr_type, fields):
+        opcode = fields["opcode"]
+        f3 = fields.get("funct3", 0)
+
+        if instr_type == "R":
+            f7 = fields["funct7"]
+            return lambda: encode_r(f7, pick_gpr(), pick_gpr(), f3, pick_gpr(), opcode)
+        if instr_type in ("I", "JALR"):
+            return lambda: encode_i(rand_simm(12), pick_gpr(), f3, pick_gpr(), opcode)
+        if instr_type == "SHIFT":
+            # Encoder.js always draws a 7-bit shamt, under the shift type bit (imm[10])
+            shtyp = fields["funct7"] << 5
+            return lambda: encode_i(shtyp | rand_uimm(7), pick_gpr(), f3, pick_gpr(), opcode)
+        if instr_type == "S":
+            return lambda: encode_s(rand_simm(12), pick_gpr(), pick_gpr(), f3, opcode)
+        if instr_type == "B":
+            return lambda: encode_b(rand_simm(13), pick_gpr(), pick_gpr(), f3, opcode)
+        if instr_type == "U":
+            return lambda: encode_u(rand_simm(20), pick_gpr(), opcode)
+        if instr_type == "JAL":
+            return lambda: encode_j(rand_simm(21), pick_gpr(), opcode)
+        if instr_type == "FENCE":
+            # pred/succ: random iorw sets with at least one bit set
+            return lambda: encode_i((randint(1, 0xF) << 4) | randint(1, 0xF), 0, f3, 0, opcode)
+        if instr_type == "SYS":
+            word = encode_i(fields["imm"], 0, 0, 0, opcode)
+            return lambda: word
+        if instr_type == "AMO":
+            # funct5 | aq=0 | rl=0, same as Encoder.js
+            f7 = (fields.get("funct7", fields.get("funct5")) & 0x1F) << 2
+            return lambda: encode_r(f7, pick_gpr(), pick_gpr(), f3, pick_gpr(), opcode)
+        if instr_type == "F":
+            f7 = fields["funct7"]
+            fixed_rs2 = fields.get("rs2")
+            fixed_f3 = fields.get("funct3")
+            def emit_fp():
+                rs2 = pick_fpr() if fixed_rs2 is None else fixed_rs2
+                funct3 = choice(FP_ROUNDING_MODES) if fixed_f3 is None else fixed_f3
+                return encode_r(f7, rs2, pick_fpr(), funct3, pick_fpr(), opcode)
+            return emit_fp
+        if instr_type == "FLOAD":
+            return lambda: encode_i(rand_simm(12), pick_gpr(), f3, pick_fpr(), opcode)
+        if instr_type == "FSTORE":
+            return lambda: encode_s(rand_simm(12), pick_fpr(), pick_gpr(), f3, opcode)
+        raise ValueError(f"Unsupported template type: {instr_type}")
+
+    return {name: make(instr_type, fields) for name, (instr_type, fields) in TEMPLATES.items()}
+
+def call_native_batch(mnemonics, encoders):
+    # Same result shape as call_instruction_batch: an int, or a RuntimeError per mnemonic
+    results = []
+    for mne in mnemonics:
+        encode = encoders.get(mne)
+        results.append(encode() & 0xffffffff if encode else RuntimeError(f"Invalid mnemonic: {mne}"))
+    return results
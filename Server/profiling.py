@@ -0,0 +1,178 @@
+import cProfile
+import importlib
+import inspect
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+# Stage profiling for generate.py and server.py.
+# Turned on with `python3 server.py --profile [cprofile|tracemalloc]` or
+# PROFILE = 1 in config.cfg (PROFILE_GENERATION = cprofile or tracemalloc for
+# the extras). Profiler.install() replaces each function listed in STAGES with
+# a wrapper that times it, so every call adds to its stage's count, total and
+# max. Nothing is replaced while profiling is off, so the hooks cost nothing
+# then. A module-level function is also replaced in every loaded module that
+# imported it by name (`from generate import call_native_batch`, as
+# benchmark.py does), so direct calls from there are timed as well.
+#
+# Not timed:
+#   - names imported under another name (`from x import f as g`), or imported
+#     by a module loaded only after install()
+#   - read_cfg when profiling is turned on by PROFILE = 1 (install() runs once
+#     the config has been read)
+#   - when server.py runs as __main__, code that imports `server` gets a second
+#     copy of the module whose functions are not replaced; the running server
+#     itself is covered (install() is given __main__ as "server")
+#
+# Profiler.chunks() wraps the instruction iterator the server reads; each chunk
+# is timed as "generate chunk" and, if asked for, run under cProfile (all
+# generation calls, whatever thread the server reads them in) or tracemalloc
+# (peak traced memory per chunk, and the largest allocation sites at the end).
+# write() prints or saves the breakdown when the server stops.
+
+STAGES = [
+    # (module, function, stage)
+    ("server", "read_cfg", "read_cfg"),
+    ("generate", "start_node_batch", "node spawn"),
+    ("generate", "call_instruction_batch", "node ipc"),
+    ("generate", "start_rust_asm", "rvv-as spawn"),
+    ("generate", "call_rust_asm_batch", "rvv-as ipc"),
+    ("generate", "call_rust_asm_oneshot", "rvv-as one-shot"),
+    ("generate", "call_native_batch", "native encode"),
+    ("generate", "call_vector_batch", "vector table encode"),
+    ("seen_cache", "SeenCache.filter", "dedup filter"),
+    ("server", "read_both", "socket wait"),
+    ("server", "write_batch", "send"),
+    ("server", "changed_cases", "compare"),
+    ("server", "format_changed", "format mismatch"),
+    ("result_store", "ResultStore.append", "store"),
+    ("seen_cache", "SeenCache.mark", "dedup mark"),
+    ("diff_join", "DiffJoin.add", "join"),
+    ("coverage_weights", "Coverage.observe", "coverage"),
+]
+
+class Profiler:
+    def __init__(self, generation=None):
+        if generation not in (None, "cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown PROFILE_GENERATION: {generation}")
+        self.generation = generation
+        self.stats = {}             # stage -> [count, total seconds, max seconds]
+        self.lock = threading.Lock()  # stages run on the event loop and in executor threads
+        self.wrapped = []           # (owner, name, original) to undo install()
+        self.profile = cProfile.Profile() if generation == "cprofile" else None
+        self.peaks = []             # traced memory peak per chunk (tracemalloc)
+        self.started = time.perf_counter()
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        generation = str(cfg.get("PROFILE_GENERATION", "none")).lower()
+        return cls(None if generation == "none" else generation)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            s = self.stats.get(stage)
+            if s is None:
+                s = self.stats[stage] = [0, 0.0, 0.0]
+            s[0] += 1
+            s[1] += seconds
+            if seconds > s[2]:
+                s[2] = seconds
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+        record = self.record
+
+        if inspect.iscoroutinefunction(original):
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                finally:
+                    record(stage, time.perf_counter() - start)
+        else:
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    record(stage, time.perf_counter() - start)
+
+        timed.__wrapped__ = original
+        owners = [owner]
+        if inspect.ismodule(owner):
+            owners += [m for m in list(sys.modules.values())
+                       if m is not owner and getattr(m, "__dict__", {}).get(name) is original]
+        for owner in owners:
+            setattr(owner, name, timed)
+            self.wrapped.append((owner, name, original))
+
+    def install(self, modules=None, stages=STAGES):
+        # modules: name -> module object, for modules that are not importable by
+        # name (server.py runs as __main__)
+        for module, path, stage in stages:
+            owner = (modules or {}).get(module) or importlib.import_module(module)
+            *outer, name = path.split(".")
+            for part in outer:
+                owner = getattr(owner, part)
+            if hasattr(owner, name):
+                self.wrap(owner, name, stage)
+        return self
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.wrapped):
+            setattr(owner, name, original)
+        self.wrapped = []
+
+    def chunks(self, chunks):
+        # the instruction iterator, timed (and profiled) chunk by chunk
+        if self.generation == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start(16)
+        while True:
+            start = time.perf_counter()
+            if self.profile is not None:
+                self.profile.enable()
+            elif self.generation == "tracemalloc":
+                tracemalloc.reset_peak()
+            try:
+                chunk = next(chunks, None)
+            finally:
+                if self.profile is not None:
+                    self.profile.disable()
+                elif self.generation == "tracemalloc":
+                    self.peaks.append(tracemalloc.get_traced_memory()[1])
+                self.record("generate chunk", time.perf_counter() - start)
+            if chunk is None:
+                return
+            yield chunk
+
+    def report(self):
+        out = io.StringIO()
+        out.write(f"profile over {time.perf_counter() - self.started:.1f} s\n")
+        out.write(f"{'stage':<22} {'count':>10} {'total s':>11} {'mean ms':>11} {'max ms':>11}\n")
+        with self.lock:
+            stats = {stage: list(s) for stage, s in self.stats.items()}
+        for stage, (count, total, longest) in sorted(stats.items(), key=lambda kv: -kv[1][1]):
+            out.write(f"{stage:<22} {count:>10} {total:>11.3f} {total / count * 1e3:>11.3f} {longest * 1e3:>11.3f}\n")
+        if self.profile is not None:
+            out.write("\ncProfile of generation (top 30 by cumulative time):\n")
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(30)
+        if self.peaks:
+            out.write(f"\ntraced memory peak per chunk: max {max(self.peaks) / 2**20:.2f} MiB, "
+                      f"mean {sum(self.peaks) / len(self.peaks) / 2**20:.2f} MiB over {len(self.peaks)} chunks\n")
+        if tracemalloc.is_tracing():
+            out.write("largest live allocation sites:\n")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:10]:
+                out.write(f"  {stat}\n")
+        return out.getvalue()
+
+    def write(self, path=None):
+        text = self.report()
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+            print(f"[profile] written to {path}")
+        else:
+            print(text)
@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import glob
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+from decode_index import load_decode_index
+from results import is_binary, iter_records, decode_record, format_results
+
+# Append-only result store for campaign output.
+# Every completed test case becomes one row in a segment: a SQLite file under
+# RESULT_STORE_DIR holding up to RESULT_SEGMENT_CASES rows. Rows are only ever
+# inserted; when a segment is full the next one is started and the old one is
+# never written again. Each segment is indexed by instruction word, by board
+# and outcome class, so queries never scan whole campaigns.
+#
+# The server hands batches to ResultStore.append(); a background thread does
+# the inserts so handle_client never waits on disk. If that thread falls more
+# than max_pending items behind (slow disk, WAL checkpoint), append() waits for
+# room in a worker thread: the event loop keeps running, but the board's batch
+# credit is held until its results are queued, so boards slow down to what the
+# disk takes and no result is ever dropped.
+#
+# Cross-board divergences found by diff_join.DiffJoin go to the divergences
+# table of the current segment through append_divergences(); cases the other
+# board never reported are only counted (DiffJoin.unpaired).
+#
+# Query CLI, e.g. words that SIGSEGV'd on beagle but not on lichee:
+#   python3 result_store.py /path/to/results query --board beagle --class sigsegv --not-board lichee
+#   python3 result_store.py /path/to/results divergences --detail
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    board      TEXT NOT NULL,
+    batch      INTEGER NOT NULL,
+    idx        INTEGER NOT NULL,
+    word       INTEGER NOT NULL,
+    class      TEXT NOT NULL,
+    outcome    INTEGER,
+    signo      INTEGER,
+    fault_addr INTEGER,
+    nondet     INTEGER NOT NULL,
+    detail     BLOB
+);
+CREATE INDEX IF NOT EXISTS cases_word ON cases(word);
+CREATE INDEX IF NOT EXISTS cases_board_class ON cases(board, class, word);
+CREATE TABLE IF NOT EXISTS divergences (
+    word       INTEGER NOT NULL,
+    board_a    TEXT NOT NULL,
+    batch_a    INTEGER NOT NULL,
+    idx_a      INTEGER NOT NULL,
+    class_a    TEXT NOT NULL,
+    board_b    TEXT,
+    batch_b    INTEGER,
+    idx_b      INTEGER,
+    class_b    TEXT,
+    nondet     INTEGER NOT NULL,
+    detail_a   BLOB,
+    detail_b   BLOB
+);
+CREATE INDEX IF NOT EXISTS divergences_word ON divergences(word);
+"""
+
+SIGNAL_NAMES = {4: "sigill", 5: "sigtrap", 7: "sigbus", 8: "sigfpe", 11: "sigsegv", 14: "timeout"}
+
+FUZZ_HEADER = re.compile(r"^=== Running fuzz (\d+): 0x([0-9a-fA-F]{8}) ===$", re.M)
+
+def outcome_class(outcome, signo):
+    # coarse class used by the index: ok, timeout or the signal name
+    if outcome == 5:
+        return "timeout"
+    if signo:
+        return SIGNAL_NAMES.get(signo, f"sig{signo}")
+    return "ok" if outcome == 0 else f"rc{outcome}"
+
+def to_signed64(x):
+    # SQLite integers are signed 64-bit
+    return x - (1 << 64) if x >= 1 << 63 else x
+
+def to_unsigned64(x):
+    return x + (1 << 64) if x is not None and x < 0 else x
+
+def segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "segment-*.sqlite")))
+
+def open_segment(path):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, only the last commits can be lost on power loss
+    db.executescript(SCHEMA)
+    return db
+
+def case_rows(board, batch, response, changed=()):
+    # rows for one completed batch (first run's response; `changed` = nondeterministic cases)
+    changed = set(changed)
+    if isinstance(response, bytes) and is_binary(response):
+        for index, instruction, outcome, signo, fault_addr, raw in iter_records(response):
+            yield (board, batch, index, instruction, outcome_class(outcome, signo), outcome, signo,
+                   to_signed64(fault_addr), int(index in changed), raw)
+        return
+
+    # text log: one row per "=== Running fuzz" section, detail = the section text
+    text = response if isinstance(response, str) else response.decode(errors="replace")
+    headers = list(FUZZ_HEADER.finditer(text))
+    for k, m in enumerate(headers):
+        end = headers[k + 1].start() if k + 1 < len(headers) else len(text)
+        section = text[m.start():end]
+        cls = "sigsegv" if "SIGSEGV" in section else "sigill" if "SIGILL" in section else "ok"
+        yield (board, batch, int(m.group(1)), int(m.group(2), 16), cls, None, None, None,
+               int(int(m.group(1)) in changed), section.encode())
+
+class ResultStore:
+    def __init__(self, directory, segment_cases=1000000, max_pending=1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_cases = segment_cases
+        self.pending = queue.Queue(max_pending)
+        self.waits = 0  # appends that had to wait for the writer
+        self.writer = threading.Thread(target=self.write_loop, name="result-store", daemon=True)
+        self.writer.start()
+
+    async def append(self, board, batch, response, changed=()):
+        # called by the server when a batch completes
+        await self.put(("cases", (board, batch, response, tuple(changed))))
+
+    async def append_divergences(self, rows):
+        # rows from diff_join.divergence()
+        await self.put(("divergences", rows))
+
+    async def put(self, item):
+        # waits while the writer is max_pending items behind, without blocking the event loop
+        try:
+            self.pending.put_nowait(item)
+        except queue.Full:
+            self.waits += 1
+            await asyncio.get_running_loop().run_in_executor(None, self.pending.put, item)
+
+    def status(self):
+        return f"queued={self.pending.qsize()} waits={self.waits}"
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+
+    def write_loop(self):
+        # runs in its own thread: SQLite connections stay on this thread
+        paths = segment_paths(self.directory)
+        number = len(paths) - 1 if paths else 0
+        db = open_segment(self.segment_path(number))
+        rows = db.execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            kind, args = item
+            if kind == "divergences":
+                db.executemany("INSERT INTO divergences VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", args)
+                if self.pending.empty():
+                    db.commit()
+                continue
+            new_rows = list(case_rows(*args))
+            if rows >= self.segment_cases:
+                db.commit()
+                db.close()
+                number += 1
+                db = open_segment(self.segment_path(number))
+                rows = 0
+            db.executemany("INSERT INTO cases VALUES (?,?,?,?,?,?,?,?,?,?)", new_rows)
+            rows += len(new_rows)
+            # commit when the queue is drained, so bursts share one transaction
+            if self.pending.empty():
+                db.commit()
+        db.commit()
+        db.close()
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, f"segment-{number:05d}.sqlite")
+
+# ---------------------------------------------------------------------------
+# queries
+
+def query_words(directory, board=None, cls=None, word=None, nondet=False):
+    # distinct words matching the filters, segment by segment (a word can repeat
+    # across segments); rows come straight from the board/class or word index
+    where, args = [], []
+    if board:
+        where.append("board = ?"); args.append(board)
+    if cls:
+        where.append("class = ?"); args.append(cls)
+    if word is not None:
+        where.append("word = ?"); args.append(word)
+    if nondet:
+        where.append("nondet = 1")
+    sql = "SELECT DISTINCT word FROM cases" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY word"
+    for path in segment_paths(directory):
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (w,) in db.execute(sql, args):
+                yield w
+        finally:
+            db.close()
+
+def word_exists(dbs, board, cls, word):
+    sql = "SELECT 1 FROM cases WHERE board = ? AND word = ?" + (" AND class = ?" if cls else "") + " LIMIT 1"
+    args = (board, word, cls) if cls else (board, word)
+    return any(db.execute(sql, args).fetchone() for db in dbs)
+
+def query(directory, board=None, cls=None, word=None, nondet=False, not_board=None, not_class=None):
+    # words matching (board, cls) and, if not_board is given, with no case
+    # matching (not_board, not_class) in any segment
+    paths = segment_paths(directory)
+    dbs = [sqlite3.connect(f"file:{p}?mode=ro", uri=True) for p in paths] if not_board else []
+    # words repeat across segments; only then remember what was already printed
+    seen = set() if len(paths) > 1 else None
+    try:
+        for w in query_words(directory, board, cls, word, nondet):
+            if seen is not None:
+                if w in seen:
+                    continue
+                seen.add(w)
+            if not_board and word_exists(dbs, not_board, not_class, w):
+                continue
+            yield w
+    finally:
+        for db in dbs:
+            db.close()
+
+def cases_for_word(directory, word, board=None):
+    sql = "SELECT board, batch, idx, class, fault_addr, nondet, detail FROM cases WHERE word = ?"
+    args = [word]
+    if board:
+        sql += " AND board = ?"
+        args.append(board)
+    for path in segment_paths(directory):
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            yield from db.execute(sql, args)
+        finally:
+            db.close()
+
+def divergences(directory, word=None):
+    sql = "SELECT * FROM divergences" + (" WHERE word = ?" if word is not None else "")
+    args = [word] if word is not None else []
+    for path in segment_paths(directory):
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            yield from db.execute(sql, args)
+        finally:
+            db.close()
+
+def format_detail(detail):
+    text = detail.decode(errors="replace") if detail.startswith(b"===") else \
+        format_results([decode_record(detail)])
+    return "      " + text.rstrip("\n").replace("\n", "\n      ")
+
+def stats(directory):
+    totals = {}
+    for path in segment_paths(directory):
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for board, cls, n in db.execute("SELECT board, class, COUNT(*) FROM cases GROUP BY board, class"):
+                totals[(board, cls)] = totals.get((board, cls), 0) + n
+        finally:
+            db.close()
+    return totals
+
+def main():
+    p = argparse.ArgumentParser(description="Query the campaign result store")
+    p.add_argument("directory")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("query", help="instruction words matching the filters")
+    q.add_argument("--board")
+    q.add_argument("--class", dest="cls", help="ok, sigsegv, sigill, sigbus, sigfpe, sigtrap, timeout, ...")
+    q.add_argument("--word", type=lambda x: int(x, 0))
+    q.add_argument("--nondet", action="store_true", help="only cases that differed between the two runs")
+    q.add_argument("--not-board", help="drop words with a matching case on this board")
+    q.add_argument("--not-class", help="class for --not-board (default: same as --class)")
+    q.add_argument("--limit", type=int, default=0)
+    q.add_argument("--count", action="store_true", help="print only the number of words")
+    q.add_argument("--detail", action="store_true", help="print the stored cases of each word")
+
+    d = sub.add_parser("divergences", help="cases whose results differ between boards")
+    d.add_argument("--word", type=lambda x: int(x, 0))
+    d.add_argument("--limit", type=int, default=0)
+    d.add_argument("--detail", action="store_true", help="print both results")
+
+    sub.add_parser("stats", help="cases per board and class")
+    args = p.parse_args()
+
+    decoder = load_decode_index()
+
+    if args.command == "divergences":
+        for n, row in enumerate(divergences(args.directory, args.word), 1):
+            word, board_a, batch_a, idx_a, class_a, board_b, batch_b, idx_b, class_b, nondet, detail_a, detail_b = row
+            other = f"{board_b} batch {batch_b} case {idx_b}: {class_b}" if board_b else "never reported by the other board"
+            print(f"0x{word:08x} {decoder.label(word):<14} {board_a} batch {batch_a} case {idx_a}: {class_a}  |  {other}"
+                  + (" nondet" if nondet else ""))
+            if args.detail:
+                for detail in (detail_a, detail_b):
+                    if detail is not None:
+                        print(format_detail(detail))
+            if args.limit and n >= args.limit:
+                break
+        return
+
+    if args.command == "stats":
+        for (board, cls), n in sorted(stats(args.directory).items()):
+            print(f"{board:<12} {cls:<10} {n:>12}")
+        return
+
+    not_class = args.not_class or args.cls
+    n = 0
+    for w in query(args.directory, args.board, args.cls, args.word, args.nondet, args.not_board, not_class):
+        n += 1
+        if not args.count:
+            print(f"0x{w:08x} {decoder.label(w)}")
+            if args.detail:
+                for board, batch, idx, cls, fault_addr, nondet, detail in cases_for_word(args.directory, w):
+                    addr = to_unsigned64(fault_addr)
+                    print(f"    {board} batch {batch} case {idx}: {cls}"
+                          + (f" addr=0x{addr:x}" if addr is not None else "") + (" nondet" if nondet else ""))
+                    print(format_detail(detail))
+        if args.limit and n >= args.limit:
+            break
+    if args.count:
+        print(n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+# Decoder for the binary result messages built by client/results.c.
+# Layout (little endian, see client/results.h):
+#   header   magic "RVZR", u16 version, u16 record size, u32 record count, u32 case count
+#   digests  case count x u64, one per test case run
+#   record   u32 length, u32 index, u32 instruction, u8 outcome, u8 signo,
+#            u16 n_mem_diffs, u32 xreg_mask, u32 freg_mask, u64 fault_addr
+#            then the changed x registers, the changed f registers (u64 each,
+#            ascending register number) and n_mem_diffs x (u64 addr, u8 old, u8 new)
+# Records are decoded into column arrays so fields can be indexed without
+# building a Python object per test case. The second run of a batch only
+# carries the records whose digest differs from the first run, so determinism
+# is checked by comparing the digests and only those cases are decoded.
+
+MAGIC = b"RVZR"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHII")
+RECORD = struct.Struct("<IIIBBHIIQ")
+MEMDIFF = struct.Struct("<QBB")
+
+# outcome = jump_rc of the first sandbox run (see client/client.c)
+OUTCOMES = {
+    0: "ok",
+    1: "signal",        # non SIGSEGV fault
+    2: "segv",          # SIGSEGV outside the sandbox, memory mapped and retried
+    3: "segv-limit",    # too many faults in one run
+    4: "segv-abort",    # SIGSEGV in sandbox/kernel memory or PC escaped
+    5: "timeout",
+}
+
+Record = namedtuple("Record", "index instruction outcome signo fault_addr xregs fregs mem_diffs")
+
+def is_binary(payload):
+    return payload[:4] == MAGIC
+
+def popcount(x):
+    return bin(x).count("1")
+
+class Results:
+    # One entry per record in index, instruction, outcome, signo, fault_addr,
+    # xreg_mask and freg_mask. Register values and memory diffs are flattened;
+    # record i owns x_values[x_start[i]:x_start[i + 1]] (same for f and diff).
+    def __init__(self):
+        self.digests = array("Q")    # one per test case run, not per record
+        self.index = array("I")
+        self.instruction = array("I")
+        self.outcome = array("B")
+        self.signo = array("B")
+        self.fault_addr = array("Q")
+        self.xreg_mask = array("I")
+        self.freg_mask = array("I")
+        self.x_start, self.x_values = array("I", [0]), array("Q")
+        self.f_start, self.f_values = array("I", [0]), array("Q")
+        self.diff_start = array("I", [0])
+        self.diff_addr, self.diff_old, self.diff_new = array("Q"), array("B"), array("B")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return (self.record(i) for i in range(len(self)))
+
+    def record(self, i):
+        xregs = [r for r in range(32) if self.xreg_mask[i] >> r & 1]
+        fregs = [r for r in range(32) if self.freg_mask[i] >> r & 1]
+        a, b = self.diff_start[i], self.diff_start[i + 1]
+        return Record(
+            self.index[i], self.instruction[i], self.outcome[i], self.signo[i], self.fault_addr[i],
+            dict(zip(xregs, self.x_values[self.x_start[i]:self.x_start[i + 1]])),
+            dict(zip(fregs, self.f_values[self.f_start[i]:self.f_start[i + 1]])),
+            list(zip(self.diff_addr[a:b], self.diff_old[a:b], self.diff_new[a:b])))
+
+def read_header(mv):
+    if len(mv) < HEADER.size:
+        raise ValueError("result message too short")
+    magic, version, record_size, count, n_cases = HEADER.unpack_from(mv, 0)
+    if magic != MAGIC:
+        raise ValueError("not a binary result message")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"unsupported result format version {version} (record size {record_size})")
+    if len(mv) < HEADER.size + 8 * n_cases:
+        raise ValueError("truncated digest list")
+    return count, n_cases
+
+def unpack_record(mv, off):
+    # fixed part of the record at `off`, checked against the end of the message
+    if off + RECORD.size > len(mv):
+        raise ValueError(f"truncated result record at offset {off}")
+    fields = RECORD.unpack_from(mv, off)
+    if fields[0] < RECORD.size or off + fields[0] > len(mv):
+        raise ValueError(f"truncated result record at offset {off}")
+    return fields
+
+def read_digests(payload):
+    # per test case digests only, records are not touched
+    mv = memoryview(payload)
+    _, n_cases = read_header(mv)
+    digests = array("Q")
+    digests.frombytes(mv[HEADER.size:HEADER.size + 8 * n_cases])
+    if sys.byteorder == "big":
+        digests.byteswap()
+    return digests
+
+def changed_cases(payload1, payload2):
+    # indexes of the test cases whose digests differ between two runs
+    d1, d2 = read_digests(payload1), read_digests(payload2)
+    changed = [i for i, (a, b) in enumerate(zip(d1, d2)) if a != b]
+    # a run that stopped early counts as different for the missing cases
+    changed.extend(range(min(len(d1), len(d2)), max(len(d1), len(d2))))
+    return changed
+
+def decode_results(payload):
+    mv = memoryview(payload)
+    count, n_cases = read_header(mv)
+
+    res = Results()
+    res.digests = read_digests(payload)
+    off = HEADER.size + 8 * n_cases
+    for _ in range(count):
+        length, index, instruction, outcome, signo, n_diffs, xmask, fmask, fault_addr = unpack_record(mv, off)
+        nx, nf = popcount(xmask), popcount(fmask)
+        if RECORD.size + 8 * (nx + nf) + MEMDIFF.size * n_diffs > length:
+            raise ValueError(f"result record at offset {off} shorter than its registers and memory diffs")
+        res.index.append(index)
+        res.instruction.append(instruction)
+        res.outcome.append(outcome)
+        res.signo.append(signo)
+        res.fault_addr.append(fault_addr)
+        res.xreg_mask.append(xmask)
+        res.freg_mask.append(fmask)
+
+        p = off + RECORD.size
+        res.x_values.frombytes(mv[p:p + 8 * nx])
+        p += 8 * nx
+        res.f_values.frombytes(mv[p:p + 8 * nf])
+        p += 8 * nf
+        for addr, old, new in MEMDIFF.iter_unpack(mv[p:p + MEMDIFF.size * n_diffs]):
+            res.diff_addr.append(addr)
+            res.diff_old.append(old)
+            res.diff_new.append(new)
+        res.x_start.append(len(res.x_values))
+        res.f_start.append(len(res.f_values))
+        res.diff_start.append(len(res.diff_addr))
+        off += length
+
+    if sys.byteorder == "big":
+        for values in (res.x_values, res.f_values):
+            values.byteswap()
+    return res
+
+def iter_records(payload):
+    # (index, instruction, outcome, signo, fault_addr, raw record bytes) per record,
+    # reading only the fixed part of each record
+    mv = memoryview(payload)
+    count, n_cases = read_header(mv)
+    off = HEADER.size + 8 * n_cases
+    for _ in range(count):
+        length, index, instruction, outcome, signo, _, _, _, fault_addr = unpack_record(mv, off)
+        yield index, instruction, outcome, signo, fault_addr, bytes(mv[off:off + length])
+        off += length
+
+def decode_record(raw):
+    # a single raw record (from iter_records) back to a Record
+    payload = HEADER.pack(MAGIC, VERSION, RECORD.size, 1, 0) + raw
+    return decode_results(payload).record(0)
+
+def result_count(payload):
+    # number of test cases run, without decoding anything
+    return HEADER.unpack_from(payload, 0)[4]
+
+def format_results(records):
+    # human readable form, close to the old text log (a Results or a list of Records)
+    lines = []
+    for rec in records:
+        lines.append(f"=== Running fuzz {rec.index}: 0x{rec.instruction:08x} === "
+                     f"{OUTCOMES.get(rec.outcome, rec.outcome)} signo={rec.signo} addr=0x{rec.fault_addr:x}")
+        for reg, value in rec.xregs.items():
+            lines.append(f"x{reg:<3} changed: -> 0x{value:016x}")
+        for reg, value in rec.fregs.items():
+            lines.append(f"f{reg:<3} changed: -> 0x{value:016x}")
+        for addr, old, new in rec.mem_diffs:
+            lines.append(f"CHG: addr=0x{addr:x} old=0x{old:02x} new=0x{new:02x}")
+    return "\n".join(lines)
+
+def format_changed(payload1, payload2, cases):
+    # both runs of each case in `cases`, for reporting non-determinism
+    runs = [{rec.index: rec for rec in decode_results(p)} for p in (payload1, payload2)]
+    lines = []
+    for i in cases:
+        for run, records in enumerate(runs, 1):
+            rec = records.get(i)
+            if rec is None:
+                lines.append(f"case {i} run {run}: no record")
+                continue
+            lines.append(f"case {i} run {run}:")
+            lines.append(format_results([rec]))
+    return "\n".join(lines)
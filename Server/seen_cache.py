@@ -0,0 +1,146 @@
+import hashlib
+import mmap
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Persistent "already tested" set of instruction words.
+# One bitmap per (board, config hash) covers the whole 2^32 word space with one
+# bit per word: a 512 MiB sparse file under SEEN_CACHE_DIR, mmap'ed, so only the
+# pages that hold seen words take disk space or memory. The server marks the
+# words of every batch a board completes; the generator drops words that were
+# already tested (by every board in differential mode, by any board in shard
+# mode) and words it already queued earlier in the same run.
+#
+# The config hash covers the config.cfg keys listed in DEDUP_CONFIG_KEYS; change
+# one of them (e.g. bump CLIENT_VERSION after a client change) to start afresh.
+
+BITMAP_BYTES = 1 << 29  # 2^32 bits
+
+def config_hash(cfg):
+    keys = cfg.get("DEDUP_CONFIG_KEYS", [])
+    if isinstance(keys, str):
+        keys = [keys]
+    blob = repr(sorted((k, cfg.get(k)) for k in keys))
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+class Bitmap:
+    # file-backed if path is given, anonymous (this process only) otherwise
+    def __init__(self, path=None):
+        self.file = None
+        if path is None:
+            self.mm = mmap.mmap(-1, BITMAP_BYTES)
+            return
+        self.file = open(path, "a+b")
+        if os.path.getsize(path) < BITMAP_BYTES:
+            self.file.truncate(BITMAP_BYTES)  # sparse
+        self.mm = mmap.mmap(self.file.fileno(), BITMAP_BYTES)
+
+    def __contains__(self, word):
+        return self.mm[word >> 3] >> (word & 7) & 1
+
+    def add(self, word):
+        i = word >> 3
+        self.mm[i] = self.mm[i] | (1 << (word & 7))
+
+    # numpy versions for whole chunks (uint32 arrays)
+    def view(self):
+        if not hasattr(self, "bytes"):
+            self.bytes = np.frombuffer(self.mm, dtype=np.uint8)
+        return self.bytes
+
+    def contains_many(self, words):
+        return (self.view()[words >> 3] >> (words & 7).astype(np.uint8)) & 1 == 1
+
+    def add_many(self, words):
+        np.bitwise_or.at(self.view(), words >> 3, np.left_shift(1, words & 7).astype(np.uint8))
+
+    def close(self):
+        self.__dict__.pop("bytes", None)  # the mmap cannot close while a view exists
+        if self.file is not None:
+            self.mm.flush()
+            self.mm.close()
+            self.file.close()
+        else:
+            self.mm.close()
+
+class SeenCache:
+    def __init__(self, directory, boards, cfg_hash, mode="differential"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.cfg_hash = cfg_hash
+        self.mode = mode
+        # fixed for the whole run: the generator thread reads these while boards mark them
+        self.bitmaps = {board: Bitmap(os.path.join(directory, f"{board}-{cfg_hash}.bitmap")) for board in boards}
+        self.session = Bitmap()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_cfg(cls, cfg):
+        boards = cfg.get("DEDUP_BOARDS", [])
+        if isinstance(boards, str):
+            boards = [boards]
+        return cls(cfg["SEEN_CACHE_DIR"], boards, config_hash(cfg), cfg.get("SCHEDULE_MODE", "differential"))
+
+    def tested(self, word):
+        # differential: every board has run it, shard: some board has
+        if not self.bitmaps:
+            return False
+        check = any if self.mode == "shard" else all
+        return check(word in bm for bm in self.bitmaps.values())
+
+    def filter(self, words):
+        # words not tested before and not already queued in this run
+        if np is not None and len(words) > 64:
+            return self.filter_np(words)
+        fresh = []
+        for w in words:
+            if w in self.session or self.tested(w):
+                self.hits += 1
+                continue
+            self.misses += 1
+            self.session.add(w)
+            fresh.append(w)
+        return fresh
+
+    def filter_np(self, words):
+        w = np.asarray(words, dtype=np.uint32)
+        keep = ~self.session.contains_many(w)
+        if self.bitmaps:
+            tested = [bm.contains_many(w) for bm in self.bitmaps.values()]
+            keep &= ~(np.logical_or.reduce(tested) if self.mode == "shard" else np.logical_and.reduce(tested))
+        # repeats inside the chunk: only the first one is kept
+        first = np.zeros(len(w), dtype=bool)
+        first[np.unique(w, return_index=True)[1]] = True
+        keep &= first
+        fresh = w[keep]
+        self.session.add_many(fresh)
+        self.misses += len(fresh)
+        self.hits += len(w) - len(fresh)
+        return fresh.tolist()
+
+    def mark(self, board, words):
+        # called when `board` has completed a batch of `words`; boards not in
+        # DEDUP_BOARDS do not count towards "tested"
+        bm = self.bitmaps.get(board)
+        if bm is None:
+            return
+        if np is not None and len(words) > 64:
+            bm.add_many(np.asarray(words, dtype=np.uint32))
+            return
+        for w in words:
+            bm.add(w)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"hits={self.hits} misses={self.misses} hit_rate={rate:.3f}"
+
+    def close(self):
+        for bm in self.bitmaps.values():
+            bm.close()
+        self.session.close()
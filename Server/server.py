@@ -1,6 +1,21 @@
+import argparse
 import struct
 import asyncio
-from generate import generate_instructions
+import sys
+import time
+from generate import generate_stream, VECTOR_INSTRUCTIONS, BASE_INSTRUCTIONS
+from instruction_source import InstructionSource
+from result_store import ResultStore
+from seen_cache import SeenCache
+from diff_join import DiffJoin
+from coverage_weights import Coverage
+from enumerate_space import Enumeration
+from campaign import Campaign
+from board_control import BoardControl
+from metrics import Metrics
+from event_log import EventLog
+from profiling import Profiler
+from results import is_binary, decode_results, format_results, result_count, changed_cases, format_changed
 
 TESTING = False
 
@@ -21,6 +36,9 @@ instructions = [
 ]
 
 clients = {}  # name -> writer
+controls = {}  # name -> BoardControl, kept across reconnects
+metrics = Metrics()  # counters and latency histograms, see metrics.py
+log = EventLog()  # structured events, written off the event loop (see event_log.py); set up in main()
 
 # Function to read your cfg file
 def read_cfg(filename):
@@ -70,111 +88,328 @@ def write_msg(writer, payload: bytes):
     header = struct.pack("!I", len(payload))
     writer.write(header + payload)
 
-def handle_beagle_results(message):
-    # Read results
-
-    # print(f"[beagle] Got {len(results)} results")
-    # print(results[:10], "...")
-    return
-
-def handle_lichee_results(message):
-    return
-
 # reads data from client and handles it 
+# returns (batch id, message), or None if the client disconnected
 async def read_results(reader, name):
     try:
-        # Step 1: read 4-byte length
-        length_data = await reader.readexactly(4)
-        (msg_len,) = struct.unpack("!I", length_data)
+        # Step 1: read 4-byte batch id and 4-byte length
+        header = await reader.readexactly(8)
+        batch_id, msg_len = struct.unpack("!II", header)
         # Step 2: read message bytes
         data = await reader.readexactly(msg_len)
         # Step 3: decode and print
-        message = data.decode(errors="replace")  # safe decode
+        # binary result records (client/results.h) are kept as bytes and compared as-is
+        message = data if is_binary(data) else data.decode(errors="replace")  # safe decode
         # print(f"{message}")
-
-        # Handle results differently based on client name
-        if name == "beagle":
-            handle_beagle_results(message)
-        elif name == "lichee":
-            handle_lichee_results(message)
-        return message
+        return batch_id, message
 
     except asyncio.IncompleteReadError:
         return  # client disconnected
 
-async def handle_client(reader, writer, instructions, cfg):
+# both results of the oldest batch, None if the client disconnected
+async def read_both(reader, name):
+    result1 = await read_results(reader, name)
+    result2 = await read_results(reader, name)
+    if result1 is None or result2 is None:
+        return None
+    return result1, result2
+
+def describe_results(message):
+    if isinstance(message, bytes):
+        return format_results(decode_results(message))
+    return message
+
+def write_batch(writer, batch_id, views):
+    # [batch id][count][count x instruction], all network order;
+    # views: packed source batches (InstructionSource.wire), sent as they are
+    count = sum(len(view) for view in views) // 4
+    writer.writelines([struct.pack("!II", batch_id, count), *views])
+
+async def handle_client(reader, writer, source, cfg, store=None, seen=None, join=None, coverage=None, enum=None):
     # reader --> used to receive from client
     # writer --> used to send to client
 
     # Handshake: read client name
-    name_len_data = await reader.readexactly(4)
-    (name_len,) = struct.unpack("!I", name_len_data)
-    name = (await reader.readexactly(name_len)).decode()
+    try:
+        name_len_data = await asyncio.wait_for(reader.readexactly(4), cfg.get("WATCHDOG_MIN_SECONDS", 5))
+        (name_len,) = struct.unpack("!I", name_len_data)
+        name = (await asyncio.wait_for(reader.readexactly(name_len), cfg.get("WATCHDOG_MIN_SECONDS", 5))).decode()
+    except (ConnectionError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        log.warning("handshake_dropped")
+        writer.close()
+        return
 
     clients[name] = writer  # store writer by name
-    print(f"Client connected: {name}")
+    log.info("connected", board=name)
+
+    # differential: each client runs every batch, shard: batches are shared out
+    source.subscribe(name)
+    # per-board watchdog deadline and batch size (see board_control.py)
+    control = controls.setdefault(name, BoardControl.from_cfg(cfg))
+    stats = metrics.board(name)
+    stats.connects += 1
+    stats.connected = True
+
+    # Up to BATCH_WINDOW batches are in flight: the sender waits for a credit before
+    # each batch and a credit is returned when both results for a batch come back.
+    # The board runs batches in order, so the next one is already queued in its
+    # socket while it works on the current one.
+    credits = asyncio.Semaphore(cfg.get("BATCH_WINDOW", 4))
+    inflight = {}  # batch id -> ([(seq, batch), ...] sent as one, instructions)
+    sending_done = False
+    inflight_changed = asyncio.Condition()
 
-    # Each client independently runs the whole list
-    instr_index = 0
+    async def send_batches():
+        nonlocal sending_done
+        # counts on from a resumed campaign
+        instr_index = source.completed.get(name, 0) * source.batch_size
+        try:
+            while True:
+                await credits.acquire()
+                # Next N instructions, waits if the generator has not produced them yet;
+                # as many source batches as the board's controller asks for go out as one,
+                # under the id of the first
+                leased = await source.get_many(name, control.units)
+                if not leased:
+                    break
+                seq = leased[0][0]
+                batch = [word for _, part in leased for word in part]
+                instr_index += len(batch)
+                log.debug("batch_sent", board=name, batch=seq, words=len(batch), index=instr_index)
+                async with inflight_changed:
+                    inflight[seq] = (leased, batch)
+                    stats.inflight = len(inflight)
+                    inflight_changed.notify_all()
+                # Send batch
+                sent = time.monotonic()
+                write_batch(writer, seq, [source.wire[part_seq] for part_seq, _ in leased])
+                await writer.drain()
+                metrics.stages["send"].observe(time.monotonic() - sent)
+        finally:
+            async with inflight_changed:
+                sending_done = True
+                inflight_changed.notify_all()
+
+    sender = asyncio.create_task(send_batches())
+    lost = []  # [(seq, batch), ...] suspected of killing the client, split up by the source
+    timed_out = False
     try:
-        while instr_index < len(instructions):
-            # Slice next N instructions
-            batch = instructions[instr_index:instr_index + cfg["BATCH_SIZE"]]
-            instr_index += len(batch)
-            print(f"instr_index: {instr_index}")
-            # Send batch
-            header = struct.pack("!I", len(batch))
-            payload = b"".join(struct.pack("!I", inst) for inst in batch)
-            writer.write(header + payload)
-            await writer.drain()
-
-            # Wait for results before sending next batch
-            # await read_results(reader, name)
-            response1 = await read_results(reader, name)
-            response2 = await read_results(reader, name)
-
-            # Compare responses
-            if response1 != response2:
-                print(f"[ERROR] Responses differ for client {name} on batch starting at index {instr_index - len(batch)}")
-                print(f"Instruction set 1:")
-                print(response1)
-                print(f"Instruction set 2:")
-                print(response2)
+        while True:
+            # only wait for results while something is in flight
+            async with inflight_changed:
+                await inflight_changed.wait_for(lambda: inflight or sending_done)
+                if not inflight:
+                    break
+                oldest = next(iter(inflight))
+                words = len(inflight[oldest][1])
+
+            # Wait for both results of the oldest batch, at most until the watchdog deadline
+            started = time.monotonic()
+            timeout = control.deadline(words)
+            try:
+                results = await asyncio.wait_for(read_both(reader, name), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                log.warning("watchdog_timeout", board=name, batch=oldest, words=words, timeout=round(timeout, 3))
+                raise
+            if results is None:
+                # client went away before sending its results; the batch stays unfinished
+                raise asyncio.IncompleteReadError(b"", None)
+            (seq, response1), (seq2, response2) = results
+            if seq != seq2 or seq not in inflight:
+                log.error("unexpected_batch_ids", board=name, batch=seq, batch2=seq2)
+                raise asyncio.IncompleteReadError(b"", None)
+            parts, inflight_batch = inflight.pop(seq)
+            stats.inflight = len(inflight)
+            compared = time.monotonic()
+            control.observe(len(inflight_batch), compared - started)
+            stats.rtt.observe(compared - started)
+            metrics.stages["board"].observe(compared - started)
+
+            # Compare responses: binary results per test case by digest, text as a whole
+            if isinstance(response1, bytes) and isinstance(response2, bytes):
+                changed = changed_cases(response1, response2)
+                if changed:
+                    # the dump is formatted by the log writer, not here
+                    log.error("responses_differ", board=name, batch=seq, cases=changed,
+                              detail=lambda r1=response1, r2=response2, c=changed: format_changed(r1, r2, c))
+                else:
+                    log.debug("batch_done", board=name, batch=seq, results=result_count(response1))
+            elif response1 != response2:
+                # text logs cannot tell which case differed
+                changed = range(len(inflight_batch))
+                log.error("responses_differ", board=name, batch=seq, words=len(inflight_batch),
+                          detail=lambda r1=response1, r2=response2:
+                          f"Instruction set 1:\n{describe_results(r1)}\nInstruction set 2:\n{describe_results(r2)}")
             else:
-                # print(f"{name}: responses are the same")
-                print(response1)
+                changed = []
+                log.debug("batch_done", board=name, batch=seq, log=response1)
 
-        print(f"All instructions sent to {name}")
+            if seen is not None:
+                seen.mark(name, inflight_batch)
+            # cross-board comparison, case by case as the boards report; divergences
+            # count as anomalies for coverage
+            diverged = join.add(name, seq, response1, changed) if join is not None else []
+            if coverage is not None:
+                coverage.observe(name, seq, response1, changed)
+                if diverged:
+                    coverage.divergences(diverged)
+            metrics.stages["compare"].observe(time.monotonic() - compared)
+            # waits (holding this board's credit) if the store's writer has fallen behind
+            if store is not None:
+                await store.append(name, seq, response1, changed)
+                if diverged:
+                    await store.append_divergences(diverged)
+            stats.completed(len(inflight_batch))
+            stats.batches += 1
+            stats.result_bytes += len(response1) + len(response2)
+            for part_seq, _ in parts:
+                await source.complete(name, part_seq)
+            credits.release()
 
-    except asyncio.IncompleteReadError:
-        print(f"Client {name} disconnected unexpectedly")
+        # surfaces errors from the sender (e.g. connection reset while writing)
+        await sender
+        status = {"sched": source.status(), "control": control.status()}
+        if store is not None:
+            status["store"] = store.status()
+        if seen is not None:
+            status["dedup"] = seen.stats()
+        if join is not None:
+            status["join"] = join.status()
+        if coverage is not None:
+            status["coverage"] = coverage.status()
+        if enum is not None:
+            status["enum"] = enum.progress()
+        log.info("all_sent", board=name, **status)
+
+    except (ConnectionError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        # reset, broken pipe or any other socket error, EOF or the watchdog;
+        # the board runs batches in order: the oldest one in flight is what it was running
+        if inflight:
+            seq = next(iter(inflight))
+            lost = inflight[seq][0]
+            control.lost(timed_out)
+            log.warning("lost", board=name, batch=seq, control=control.status())
+        else:
+            log.warning("lost", board=name)
+    finally:
+        sender.cancel()
+        stats.connected = False
+        stats.inflight = 0
+        await source.unsubscribe(name, lost)
 
     writer.close()
-    await writer.wait_closed()
-    print(f"Client {name} disconnected")
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    log.info("disconnected", board=name)
 
-async def main():
+async def main(profile=None):
+    global log
+    # stage profiling (see profiling.py), from the command line or PROFILE = 1;
+    # installed before read_cfg so the config read is timed too
+    profiler = None
+    if profile is not None:
+        profiler = Profiler(None if profile == "timers" else profile).install({"server": sys.modules[__name__]})
     # open config file
     cfg = read_cfg("/home/szekang/Documents/RISCVuzz/config.cfg")
+    if profiler is None and cfg.get("PROFILE"):
+        profiler = Profiler.from_cfg(cfg).install({"server": sys.modules[__name__]})
+    log = EventLog.from_cfg(cfg)
+    log.start()
 
+    # instructions are generated in the background while the server runs;
+    # at most SOURCE_BUFFER_BATCHES batches are kept in memory
+    max_batches = cfg.get("SOURCE_BUFFER_BATCHES", 64)
+    mode = cfg.get("SCHEDULE_MODE", "differential")
+    # words already tested in earlier campaigns are skipped, if SEEN_CACHE_DIR is set
+    seen = SeenCache.from_cfg(cfg) if cfg.get("SEEN_CACHE_DIR") else None
+    # mnemonics are weighted by the outcomes the boards report, if COVERAGE_GUIDED = 1
+    coverage = Coverage.from_cfg(VECTOR_INSTRUCTIONS + BASE_INSTRUCTIONS, cfg) if cfg.get("COVERAGE_GUIDED") else None
+    enum = None
+    campaign = None
     if TESTING:
-        global instructions
+        source = InstructionSource.from_list(instructions, cfg["BATCH_SIZE"], max_batches, mode)
+    elif cfg.get("GENERATION_MODE", "random") == "enumerate":
+        # every word matching ENUM_MATCH/ENUM_MASK once, resumable from ENUM_CHECKPOINT
+        enum = Enumeration.from_cfg(cfg)
+        log.info("enum_progress", progress=enum.progress())
+        source = InstructionSource(enum.stream(), cfg["BATCH_SIZE"], max_batches, mode, enum.batch_done)
+    elif cfg.get("CAMPAIGN_CHECKPOINT"):
+        # continues the campaign of the last run if it did not finish
+        campaign = Campaign.load_or_new(cfg["CAMPAIGN_CHECKPOINT"], cfg, log)
+        source = InstructionSource(campaign.stream(seen, coverage), cfg["BATCH_SIZE"], max_batches, mode)
+        campaign.restore(source, coverage)
     else:
-        instructions = generate_instructions(cfg)
-        print([f"0x{inst:08x}" for inst in instructions])
+        source = InstructionSource(generate_stream(cfg, seen, coverage), cfg["BATCH_SIZE"], max_batches, mode)
+
+    # words that took a board down on their own (crash bisection, see instruction_source.py)
+    # are appended to QUARANTINE_FILE and, with the seen cache, not generated again
+    def quarantine(word, name):
+        if cfg.get("QUARANTINE_FILE"):
+            with open(cfg["QUARANTINE_FILE"], "a") as f:
+                f.write(f"0x{word:08x} {name}\n")
+        if seen is not None:
+            for board in list(seen.bitmaps):
+                seen.mark(board, [word])
+    source.on_quarantine = quarantine
+    source.log = log
+    if profiler is not None:
+        source.chunks = profiler.chunks(source.chunks)
+    producer = asyncio.create_task(source.run())
+    # live metrics: HTTP on 127.0.0.1:METRICS_PORT and/or a Prometheus text file
+    metrics.source = source
+    if cfg.get("METRICS_PORT"):
+        metrics_server = await metrics.serve(cfg["METRICS_PORT"])
+        print(f"Metrics on http://127.0.0.1:{cfg['METRICS_PORT']}/metrics (and /metrics.json)")
+    if cfg.get("METRICS_FILE"):
+        metrics_writer = asyncio.create_task(metrics.file_loop(cfg["METRICS_FILE"], cfg.get("METRICS_SECONDS", 10)))
+    if campaign is not None:
+        checkpointer = asyncio.create_task(campaign.checkpoint_loop(source, cfg.get("CHECKPOINT_SECONDS", 30), coverage))
 
     # creates a listening socket (TCP server)
     # handle_client: callback function
+    # completed batches are written to the result store, if RESULT_STORE_DIR is set
+    store = None
+    if cfg.get("RESULT_STORE_DIR"):
+        store = ResultStore(cfg["RESULT_STORE_DIR"], cfg.get("RESULT_SEGMENT_CASES", 1000000))
+
+    # differential mode: results of DIFF_BOARDS are joined by instruction word and
+    # divergences go to the result store (only counted without one)
+    join = None
+    if mode == "differential" and cfg.get("DIFF_BOARDS"):
+        join = DiffJoin(cfg["DIFF_BOARDS"], cfg.get("JOIN_WINDOW", 65536))
+
     async def client_handler(reader, writer):
-        await handle_client(reader, writer, instructions, cfg)
+        await handle_client(reader, writer, source, cfg, store, seen, join, coverage, enum)
 
     server = await asyncio.start_server(client_handler, "0.0.0.0", 9000)
     addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
     print(f"Server listening on {addrs}")
 
     # runs server forever
-    async with server:
-        await server.serve_forever()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        # the generator thread may be inside seen.filter or coverage.sample
+        await source.stop(producer)
+        if campaign is not None:
+            campaign.save(source, coverage)
+        if store is not None:
+            store.close()
+        if seen is not None:
+            log.info("dedup", stats=seen.stats())
+            seen.close()
+        log.close()
+        if profiler is not None:
+            profiler.write(cfg.get("PROFILE_OUTPUT") or None)
 
-# spawns handle_client() per connection
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--profile", nargs="?", const="timers", choices=["timers", "cprofile", "tracemalloc"],
+                   help="time each stage (see profiling.py), optionally with cProfile or tracemalloc around generation")
+    args = p.parse_args()
+    # spawns handle_client() per connection
+    asyncio.run(main(args.profile))
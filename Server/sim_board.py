@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+from array import array
+
+from results import HEADER, RECORD, MAGIC, VERSION
+
+# Stand-in boards for load-testing the server without hardware.
+# Each SimBoard speaks the client protocol of main.c: name handshake, then
+# [batch id][count][count x instruction] batches in network order, answered
+# with two result messages ([batch id][length][payload]) in the binary format
+# of client/results.h: every case with a record the first time, only the cases
+# that changed the second time.
+#
+# Results are made up from a hash of the word, so every board reports the same
+# outcome for the same word; `nondet` is the chance that a case comes back
+# different the second time. A share `crash` of all words makes the board drop
+# the connection and a share `hang` makes it stop answering (until the server
+# gives up on it), always the same words for the same seed, so crash bisection
+# and the watchdog can find them. The board reconnects `reboot` seconds later.
+# Running a batch takes latency + per_word x count seconds (+- jitter).
+#
+# Hundreds of boards run as tasks of one event loop:
+#   python3 sim_board.py --boards 200 --per-word 0.0001 --crash 0.0001
+#   python3 sim_board.py --names beagle,lichee   (differential mode, joined results)
+
+SIGNO = {0: 0, 1: 4, 2: 11, 3: 11, 4: 11, 5: 14}  # per outcome, see results.OUTCOMES
+
+def mix(word, seed):
+    # 32-bit hash of a word, used to pick outcomes and the words that crash or hang
+    x = (word ^ seed) * 0x9E3779B1 & 0xffffffff
+    x ^= x >> 15
+    x = x * 0x85EBCA6B & 0xffffffff
+    return x ^ x >> 13
+
+class SimBoard:
+    def __init__(self, name, latency=0.01, per_word=0.0005, jitter=0.1, regs=2, nondet=0.0,
+                 crash=0.0, hang=0.0, reboot=1.0, seed=0):
+        self.name = name
+        self.latency = latency
+        self.per_word = per_word
+        self.jitter = jitter
+        self.regs = min(regs, 31)       # changed x registers per record (payload size)
+        self.nondet = nondet
+        self.crash = crash
+        self.hang = hang
+        self.reboot = reboot
+        self.seed = seed
+        self.rng = random.Random(f"{seed}:{name}")
+        self.stats = {"connects": 0, "batches": 0, "words": 0, "crashes": 0, "hangs": 0}
+
+    def fate(self, word):
+        # "crash", "hang" or None; the same for a word every time
+        h = mix(word, self.seed) / 2**32
+        if h < self.crash:
+            return "crash"
+        if h < self.crash + self.hang:
+            return "hang"
+        return None
+
+    def case(self, index, word):
+        # (digest, record) of one test case
+        h = mix(word, self.seed ^ 0x5bd1e995)
+        outcome = h % 6 if h >> 8 & 3 == 0 else 0  # about a quarter fault
+        fault_addr = h << 12 if outcome else 0
+        xmask = ((1 << self.regs) - 1) << 1
+        tail = struct.pack(f"<{self.regs}Q", *(h + r for r in range(self.regs)))
+        record = RECORD.pack(RECORD.size + len(tail), index, word, outcome, SIGNO[outcome],
+                             0, xmask, 0, fault_addr) + tail
+        return h << 32 | word, record
+
+    def message(self, batch, second=False):
+        digests = array("Q")
+        records = []
+        for index, word in enumerate(batch):
+            digest, record = self.case(index, word)
+            if not second:
+                records.append(record)
+            elif self.nondet and self.rng.random() < self.nondet:
+                digest ^= 1
+                records.append(record)
+            digests.append(digest)
+        if sys.byteorder == "big":
+            digests.byteswap()
+        return HEADER.pack(MAGIC, VERSION, RECORD.size, len(records), len(batch)) + digests.tobytes() + b"".join(records)
+
+    async def run(self, host, port):
+        # until the server runs out of batches, reconnecting after crashes and hangs
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                await asyncio.sleep(self.reboot)
+                continue
+            self.stats["connects"] += 1
+            try:
+                finished = await self.session(reader, writer)
+            except (asyncio.IncompleteReadError, ConnectionResetError):
+                finished = True  # the server closed the connection
+            writer.close()
+            if finished:
+                return
+            await asyncio.sleep(self.reboot)
+
+    async def session(self, reader, writer):
+        # True once the server is done with this board, False after a crash or hang
+        name = self.name.encode()
+        writer.write(struct.pack("!I", len(name)) + name)
+        while True:
+            batch_id, count = struct.unpack("!II", await reader.readexactly(8))
+            if count == 0:
+                return True
+            batch = array("I", await reader.readexactly(4 * count))
+            if sys.byteorder == "little":
+                batch.byteswap()
+            fates = {self.fate(word) for word in batch}
+            await asyncio.sleep((self.latency + self.per_word * count) * (1 + self.jitter * self.rng.uniform(-1, 1)))
+            if "crash" in fates:
+                self.stats["crashes"] += 1
+                return False
+            if "hang" in fates:
+                self.stats["hangs"] += 1
+                while await reader.read(1 << 16):
+                    pass
+                return False
+            for second in (False, True):
+                payload = self.message(batch, second)
+                writer.write(struct.pack("!II", batch_id, len(payload)) + payload)
+            await writer.drain()
+            self.stats["batches"] += 1
+            self.stats["words"] += count
+
+async def run_boards(boards, host, port):
+    await asyncio.gather(*(board.run(host, port) for board in boards))
+
+def main():
+    p = argparse.ArgumentParser(description="Simulated boards for load-testing the server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=9000)
+    p.add_argument("--boards", type=int, default=100, help="number of boards, named <prefix><i>")
+    p.add_argument("--prefix", default="sim")
+    p.add_argument("--names", help="comma-separated board names instead of --boards/--prefix")
+    p.add_argument("--latency", type=float, default=0.01, help="seconds per batch")
+    p.add_argument("--per-word", type=float, default=0.0005, help="seconds per instruction")
+    p.add_argument("--jitter", type=float, default=0.1, help="relative spread of the run time")
+    p.add_argument("--regs", type=int, default=2, help="changed registers per record (payload size)")
+    p.add_argument("--nondet", type=float, default=0.0, help="chance a case differs on the second run")
+    p.add_argument("--crash", type=float, default=0.0, help="share of words that crash the board")
+    p.add_argument("--hang", type=float, default=0.0, help="share of words that hang the board")
+    p.add_argument("--reboot", type=float, default=1.0, help="seconds before a board reconnects")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    names = args.names.split(",") if args.names else [f"{args.prefix}{i}" for i in range(args.boards)]
+    boards = [SimBoard(name, args.latency, args.per_word, args.jitter, args.regs, args.nondet,
+                       args.crash, args.hang, args.reboot, args.seed) for name in names]
+    start = time.perf_counter()
+    try:
+        asyncio.run(run_boards(boards, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.perf_counter() - start
+    totals = {k: sum(b.stats[k] for b in boards) for k in boards[0].stats}
+    print(f"{len(boards)} boards, {elapsed:.1f} s: " + " ".join(f"{k}={v}" for k, v in totals.items())
+          + f" ({totals['words'] / elapsed:.0f} words/s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 use clap::{AppSettings, Parser};
+use std::io::{self, BufRead, BufReader, BufWriter, Write};
 
 #[derive(Parser)]
 #[clap(author, version, about)]
@@ -7,12 +8,21 @@ use clap::{AppSettings, Parser};
 
 struct Cli {
     /// Instruction string directly from CLI
-    asm: String,
+    #[clap(required_unless_present = "stream")]
+    asm: Option<String>,
+
+    /// Keep running and encode one instruction per stdin line,
+    /// answering with one line per instruction on stdout
+    #[clap(long)]
+    stream: bool,
 }
 
 fn main() -> Result<(), Box<dyn std::error::Error>> {
     let cli = Cli::parse();
-    let line = cli.asm;
+    if cli.stream {
+        return run_stream();
+    }
+    let line = cli.asm.unwrap_or_default();
     if let Ok(Some(code)) = rvv_encode::encode(line.as_str()) {
         let indent = line.chars().take_while(|c| *c == ' ').collect::<String>();
         // let [b0, b1, b2, b3] = code.to_le_bytes();
@@ -34,6 +44,39 @@ fn main() -> Result<(), Box<dyn std::error::Error>> {
 
     Ok(())
 }
+
+// Long-lived mode used by generate.py: one process serves the whole campaign.
+// Every input line gets exactly one output line, either "0x%08x" or "error: ...",
+// so the caller can write many lines at once and read the answers back in order.
+fn run_stream() -> Result<(), Box<dyn std::error::Error>> {
+    // read the config once instead of once per instruction
+    let config = rvv_encode::load_config();
+
+    let mut reader = BufReader::new(io::stdin());
+    let mut out = BufWriter::new(io::stdout());
+    let mut line = String::new();
+
+    loop {
+        line.clear();
+        if reader.read_line(&mut line)? == 0 {
+            break; // stdin closed
+        }
+        let asm = line.trim();
+        match rvv_encode::encode_with_config(asm, &config) {
+            Ok(Some(code)) => writeln!(out, "0x{:08x}", code)?,
+            Ok(None) => writeln!(out, "error: not a vector instruction: {}", asm)?,
+            // keep parser errors on a single line so responses stay aligned
+            Err(err) => writeln!(out, "error: {}", err.to_string().replace('\n', " "))?,
+        }
+        // only flush once every pipelined request already received has been answered
+        if reader.buffer().is_empty() {
+            out.flush()?;
+        }
+    }
+    out.flush()?;
+
+    Ok(())
+}
 //     let origin_asm_file = File::open(cli.asm_file)?;
 //     for result_line in BufReader::new(origin_asm_file).lines() {
 //         let line = result_line?;
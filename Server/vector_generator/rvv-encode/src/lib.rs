@@ -158,8 +158,19 @@ impl Config {
 // / ```
 pub fn encode(inst: &str) -> Result<Option<u32>, Error> {
     // get config variables from config file
-    let config = Config::from_cfg_file("/home/szekang/Documents/RISCVuzz/config.cfg");
+    let config = load_config();
+    encode_with_config(inst, &config)
+}
+
+// Reads the fuzzer config file used for operand biasing
+pub fn load_config() -> Config {
+    Config::from_cfg_file("/home/szekang/Documents/RISCVuzz/config.cfg")
+}
 
+// Same as `encode`, but reuses an already loaded config.
+// Used by the streaming mode of rvv-as so the config file is read once per session
+// instead of once per instruction.
+pub fn encode_with_config(inst: &str, config: &Config) -> Result<Option<u32>, Error> {
     let pairs = if let Ok(result) = AsmParser::parse(Rule::inst, inst.trim()) {
         result
     } else {
@@ -198,7 +209,7 @@ pub fn encode(inst: &str) -> Result<Option<u32>, Error> {
     opcodes::INSTRUCTIONS
         .iter()
         .find(|(inst_name, _, _)| *inst_name == name)
-        .map(|(_, base, args_cfg)| gen_inst_code(&config, name, *base, args_cfg))
+        .map(|(_, base, args_cfg)| gen_inst_code(config, name, *base, args_cfg))
         .transpose()
     
 // name = parsed instruction name (a &str, e.g. "vwmacc.vv")
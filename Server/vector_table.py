@@ -0,0 +1,149 @@
+import os
+import re
+import random
+from array import array
+
+# Table-driven vector encoder.
+# Loads the MATCH/MASK/ARGS constants from rvv-encode/src/opcodes.rs once into flat
+# arrays and fills each operand field the same way rvv-encode's gen_inst_code does,
+# so vector instructions can be generated in-process instead of through rvv-as.
+
+OPCODES_RS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "vector_generator", "rvv-encode", "src", "opcodes.rs")
+
+# operand field widths, keyed by the argument names used in opcodes.rs
+ARG_WIDTHS = {
+    "rd": 5, "rs1": 5, "rs2": 5,
+    "vd": 5, "vs1": 5, "vs2": 5, "vs3": 5,
+    "simm5": 5, "zimm": 5, "zimm10": 10, "zimm11": 11,
+    "vm": 1, "nf": 3,
+}
+ARG_NAMES = list(ARG_WIDTHS)
+
+# VLMUL encodings for the VLMUL_PROBABILITIES.* config keys
+VLMUL_CODES = {"Mf8": 0b101, "Mf4": 0b110, "Mf2": 0b111, "M1": 0b000, "M2": 0b001, "M4": 0b010, "M8": 0b011}
+
+_table = None
+
+def load_vector_table(path=OPCODES_RS):
+    # Parses opcodes.rs (only once per process) into:
+    #   names     list of mnemonics, in INSTRUCTIONS order
+    #   matches   array('I') of MATCH_* values
+    #   masks     array('I') of MASK_* values
+    #   arg_start array('H'), arg_start[i]:arg_start[i+1] indexes instruction i's operands
+    #   arg_kind  array('B') of indexes into ARG_NAMES
+    #   arg_pos   array('B') of field bit positions
+    global _table
+    if _table is not None and path == OPCODES_RS:
+        return _table
+
+    with open(path) as f:
+        src = f.read()
+
+    consts = {name: int(value, 16) for name, value in
+              re.findall(r"const (\w+): u32 = (0x[0-9a-fA-F]+);", src)}
+    args = {name: re.findall(r'\("(\w+)", (\d+)\)', body) for name, body in
+            re.findall(r"const (ARGS_\w+): &\[\(&str, usize\); \d+\] =\s*&\[(.*?)\];", src, re.S)}
+
+    names = []
+    matches, masks = array("I"), array("I")
+    arg_start, arg_kind, arg_pos = array("H", [0]), array("B"), array("B")
+    for name, match_name, args_name in re.findall(r'\(\s*"([\w.]+)",\s*(MATCH_\w+),\s*(ARGS_\w+),?\s*\)', src):
+        mask_name = "MASK_" + match_name[len("MATCH_"):]
+        names.append(name)
+        matches.append(consts[match_name])
+        masks.append(consts[mask_name])
+        for arg, pos in args[args_name]:
+            arg_kind.append(ARG_NAMES.index(arg))
+            arg_pos.append(int(pos))
+        arg_start.append(len(arg_kind))
+
+        # the operand fields must cover exactly the bits MASK leaves free
+        used = 0
+        for k in range(arg_start[-2], arg_start[-1]):
+            used |= ((1 << ARG_WIDTHS[ARG_NAMES[arg_kind[k]]]) - 1) << arg_pos[k]
+        if used != ~consts[mask_name] & 0xffffffff:
+            raise ValueError(f"{name}: operand fields 0x{used:08x} do not match free bits of {mask_name}")
+
+    table = (names, matches, masks, arg_start, arg_kind, arg_pos)
+    if path == OPCODES_RS:
+        _table = table
+    return table
+
+def build_vector_encoders(cfg):
+    # Returns {mnemonic: fn() -> 32-bit encoding} for every instruction in opcodes.rs.
+    # Operands follow the same biases as rvv-encode (config.cfg).
+    names, matches, masks, arg_start, arg_kind, arg_pos = load_vector_table()
+
+    gprs, special_gprs, gpr_special = cfg["GPRs"], cfg["SPECIAL_GPRS"], cfg["GPR_SPECIAL"]
+    vregs, special_vregs, vreg_special = cfg["VREGs"], cfg["SPECIAL_VREGS"], cfg["VREG_SPECIAL"]
+    special_simms, special_uimms, imm_special = cfg["SPECIAL_SIMMS"], cfg["SPECIAL_UIMMS"], cfg["IMM_SPECIAL"]
+    zimm10_bias = cfg["ZIMM10_BIAS"]
+    vlmul_cumulative = []
+    total = 0.0
+    for key, code in VLMUL_CODES.items():
+        total += cfg.get(f"VLMUL_PROBABILITIES.{key}", 0.0)
+        vlmul_cumulative.append((total, code))
+    rand, choice, randint = random.random, random.choice, random.randint
+
+    def pick_x_reg():
+        return choice(special_gprs) if rand() < gpr_special else choice(gprs)
+
+    def pick_v_reg():
+        return choice(special_vregs) if rand() < vreg_special else choice(vregs)
+
+    def rand_simm5():
+        if rand() < imm_special:
+            return choice(special_simms) & 0x1f
+        return randint(-16, 15) & 0x1f
+
+    def rand_uimm5():
+        if rand() < imm_special:
+            return choice(special_uimms) & 0x1f
+        return randint(0, 31)
+
+    def rand_vtype():
+        # [ma ta vsew vlmul], vsew skewed by ZIMM10_BIAS, vlmul from VLMUL_PROBABILITIES
+        vsew = min(int((rand() ** zimm10_bias) * 8), 7)
+        roll = rand()
+        vlmul = VLMUL_CODES["M1"]  # fallback if rounding errors
+        for cumulative, code in vlmul_cumulative:
+            if roll < cumulative:
+                vlmul = code
+                break
+        value = vlmul | (vsew << 3)
+        if rand() < 0.5:
+            value |= 1 << 6  # ta
+        if rand() < 0.5:
+            value |= 1 << 7  # ma
+        return value
+
+    fillers = {
+        "rd": pick_x_reg, "rs1": pick_x_reg, "rs2": pick_x_reg,
+        "vd": pick_v_reg, "vs1": pick_v_reg, "vs2": pick_v_reg, "vs3": pick_v_reg,
+        "simm5": rand_simm5, "zimm": rand_uimm5,
+        "zimm10": rand_vtype, "zimm11": rand_vtype,
+        "vm": lambda: randint(0, 1),
+        "nf": lambda: randint(0, 7),
+    }
+
+    def make(i):
+        match = matches[i]
+        fields = tuple((fillers[ARG_NAMES[arg_kind[k]]], arg_pos[k])
+                       for k in range(arg_start[i], arg_start[i + 1]))
+        def encode():
+            word = match
+            for fill, pos in fields:
+                word |= fill() << pos
+            return word
+        return encode
+
+    return {name: make(i) for i, name in enumerate(names)}
+
+def call_vector_batch(mnemonics, encoders):
+    # Same result shape as call_rust_asm_batch, but already decoded to ints
+    results = []
+    for mne in mnemonics:
+        encode = encoders.get(mne)
+        results.append(encode() if encode else RuntimeError(f"not a vector instruction: {mne}"))
+    return results
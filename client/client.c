@@ -13,6 +13,7 @@ ease of futher expansion.
 #include <sys/time.h>
 
 #include "../main.h"
+#include "results.h"
 #include "sandbox.h"
 
 // extern functions
@@ -36,6 +37,8 @@ void free_sandbox_stack(void *stack_top, size_t stack_size);
 void arm_timeout_timer(void);
 void disarm_timeout_timer(void);
 int run_client(uint32_t *instructions, size_t n_instructions);
+static void record_result(uint32_t index, uint32_t instruction,
+                          int outcome);
 
 // extern variables
 extern sigjmp_buf jump_buffer;
@@ -55,6 +58,8 @@ uint8_t *sandbox_ptr;
 
 volatile sig_atomic_t g_faults_this_run = 0;
 volatile atomic_uintptr_t g_fault_addr = 0;
+volatile sig_atomic_t g_last_signo = 0;
+volatile atomic_uintptr_t g_last_fault_addr = 0;
 mapped_region_t *g_regions = NULL;
 size_t g_regions_len = 0;  // global counter variable (number of valid entries
                            // currently stored in the g_regions array)
@@ -93,12 +98,16 @@ int run_client(uint32_t *instructions, size_t n_instructions) {
 
     // unmap using munmap
     unmap_all_regions();  // unmap g_regions
+    g_diffs_len = 0;
+    g_last_signo = 0;
+    g_last_fault_addr = 0;
 
     int jump_rc = sigsetjmp(jump_buffer, 1);
     if (jump_rc == 0) {
       arm_timeout_timer();
       run_sandbox(sandbox_ptr);
       disarm_timeout_timer();
+      record_result(i, instructions[i], 0);
       continue;  // no faults raised
     } else {
       disarm_timeout_timer();
@@ -107,6 +116,7 @@ int run_client(uint32_t *instructions, size_t n_instructions) {
         // 1. non SIGSEGV fault raised
         // 4. SIGSEGV fault in sandbox memory
         // 5. timer timeout: sandbox stuck
+        record_result(i, instructions[i], jump_rc);
         continue;
       }
     }
@@ -141,12 +151,21 @@ int run_client(uint32_t *instructions, size_t n_instructions) {
 
     print_xreg_changes();
     print_freg_changes();
+    record_result(i, instructions[i], jump_rc);
 
     free_sandbox_stack(sandbox_sp, SANDBOX_STACK_SIZE);
   }
   return 0;
 }
 
+// appends the binary result record for one test case (see results.h);
+// memory diffs of both fill passes (0x00 and 0xFF) are included
+static void record_result(uint32_t index, uint32_t instruction,
+                          int outcome) {
+  results_add(index, instruction, (uint8_t)outcome, (uint8_t)g_last_signo,
+              (uint64_t)g_last_fault_addr, g_diffs, g_diffs_len);
+}
+
 static void run_until_quiet(int8_t fill_byte) {
   g_fault_addr = 0;
   int retries = 0;
@@ -245,7 +264,7 @@ static void diffs_push(void *addr, uint8_t oldv, uint8_t newv) {
 }
 
 static void report_diffs(uint8_t expected) {
-  g_diffs_len = 0;
+  // g_diffs_len is reset per test case, so diffs of both passes are kept
 
   /* sanity checks */
   if (g_regions == NULL) {
@@ -0,0 +1,152 @@
+// Builds the binary result messages described in results.h.
+// Records of one sandbox run are appended to a growable buffer together with a
+// digest per test case; results_data() assembles the message main.c sends.
+
+#include "results.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+// extern variables
+extern uint64_t xreg_init_data[];
+extern uint64_t xreg_output_data[];
+extern uint64_t freg_init_data[];
+extern uint64_t freg_output_data[];
+
+// growable byte/u64 buffers
+typedef struct {
+  uint8_t *data;
+  size_t len;
+  size_t cap;
+} buf_t;
+
+// private variables
+static buf_t g_records;       // records of the current run, back to back
+static buf_t g_offsets;       // size_t offset of each record in g_records
+static buf_t g_digests;       // u64 digest of each record
+static buf_t g_ref_digests;   // digests of the first run of the batch
+static buf_t g_msg;           // assembled message
+
+static void *buf_reserve(buf_t *b, size_t n) {
+  if (b->len + n > b->cap) {
+    size_t ncap = b->cap ? b->cap : 4096;
+    while (ncap < b->len + n) ncap *= 2;
+    uint8_t *tmp = realloc(b->data, ncap);
+    if (!tmp) {
+      perror("realloc");
+      exit(1);
+    }
+    b->data = tmp;
+    b->cap = ncap;
+  }
+  void *p = b->data + b->len;
+  b->len += n;
+  return p;
+}
+
+static void buf_put(buf_t *b, const void *src, size_t n) {
+  memcpy(buf_reserve(b, n), src, n);
+}
+
+// FNV-1a, 64 bit
+static uint64_t digest(const uint8_t *p, size_t n) {
+  uint64_t h = 0xcbf29ce484222325ULL;
+  for (size_t i = 0; i < n; i++) {
+    h ^= p[i];
+    h *= 0x100000001b3ULL;
+  }
+  return h;
+}
+
+// starts a new sandbox run (keeps the buffers allocated)
+void results_reset(void) {
+  g_records.len = 0;
+  g_offsets.len = 0;
+  g_digests.len = 0;
+}
+
+void results_add(uint32_t index, uint32_t instruction, uint8_t outcome,
+                 uint8_t signo, uint64_t fault_addr, const memdiff_t *diffs,
+                 size_t n_diffs) {
+  if (n_diffs > UINT16_MAX) n_diffs = UINT16_MAX;
+
+  uint32_t xmask = 0, fmask = 0;
+  for (int i = 0; i < 32; i++) {
+    // skip x9 as it is used for storing the return jump pointer out of sandbox
+    if (i != 9 && xreg_init_data[i] != xreg_output_data[i]) xmask |= 1u << i;
+    if (freg_init_data[i] != freg_output_data[i]) fmask |= 1u << i;
+  }
+
+  size_t start = g_records.len;
+  results_record_t rec = {
+      .index = index,
+      .instruction = instruction,
+      .outcome = outcome,
+      .signo = signo,
+      .n_mem_diffs = (uint16_t)n_diffs,
+      .xreg_mask = xmask,
+      .freg_mask = fmask,
+      .fault_addr = fault_addr,
+  };
+  buf_put(&g_records, &rec, sizeof(rec));
+
+  for (int i = 0; i < 32; i++)
+    if (xmask & (1u << i))
+      buf_put(&g_records, &xreg_output_data[i], sizeof(uint64_t));
+  for (int i = 0; i < 32; i++)
+    if (fmask & (1u << i))
+      buf_put(&g_records, &freg_output_data[i], sizeof(uint64_t));
+  for (size_t k = 0; k < n_diffs; k++) {
+    results_memdiff_t d = {(uint64_t)(uintptr_t)diffs[k].addr,
+                           diffs[k].old_val, diffs[k].new_val};
+    buf_put(&g_records, &d, sizeof(d));
+  }
+
+  // buffer may have moved while growing: patch length through the offset
+  uint32_t length = (uint32_t)(g_records.len - start);
+  memcpy(g_records.data + start + offsetof(results_record_t, length), &length,
+         sizeof(length));
+
+  uint64_t h = digest(g_records.data + start, length);
+  buf_put(&g_offsets, &start, sizeof(start));
+  buf_put(&g_digests, &h, sizeof(h));
+}
+
+// remembers the digests of this run; the next results_data(true) only
+// carries records whose digest differs from these
+void results_keep_reference(void) {
+  g_ref_digests.len = 0;
+  buf_put(&g_ref_digests, g_digests.data, g_digests.len);
+}
+
+// returns the message for the current run; valid until the next results_* call
+const uint8_t *results_data(bool only_changed, size_t *len) {
+  size_t n_cases = g_digests.len / sizeof(uint64_t);
+  size_t n_ref = g_ref_digests.len / sizeof(uint64_t);
+  const uint64_t *digests = (const uint64_t *)g_digests.data;
+  const uint64_t *ref = (const uint64_t *)g_ref_digests.data;
+  const size_t *offsets = (const size_t *)g_offsets.data;
+
+  g_msg.len = 0;
+  results_header_t *hdr = buf_reserve(&g_msg, sizeof(*hdr));
+  memcpy(hdr->magic, RESULTS_MAGIC, 4);
+  hdr->version = RESULTS_VERSION;
+  hdr->record_size = sizeof(results_record_t);
+  hdr->n_cases = (uint32_t)n_cases;
+  buf_put(&g_msg, digests, g_digests.len);
+
+  uint32_t count = 0;
+  for (size_t i = 0; i < n_cases; i++) {
+    if (only_changed && i < n_ref && digests[i] == ref[i]) continue;
+    size_t end = i + 1 < n_cases ? offsets[i + 1] : g_records.len;
+    buf_put(&g_msg, g_records.data + offsets[i], end - offsets[i]);
+    count++;
+  }
+  // header may have moved while growing
+  memcpy(g_msg.data + offsetof(results_header_t, count), &count,
+         sizeof(count));
+
+  *len = g_msg.len;
+  return g_msg.data;
+}
@@ -0,0 +1,58 @@
+#ifndef RESULTS_H
+#define RESULTS_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+#include "sandbox.h"
+
+// Binary result format (decoded by Server/results.py). All fields little endian.
+//   results_header_t
+//   n_cases x u64                        digest of every test case's record
+//   count x (results_record_t
+//            popcount(xreg_mask) x u64   changed x registers, ascending
+//            popcount(freg_mask) x u64   changed f registers, ascending
+//            n_mem_diffs x results_memdiff_t)
+// The digest (FNV-1a 64 over the record bytes) lets the server check run-to-run
+// determinism per test case; the second run of a batch only carries the records
+// whose digest differs from the first run.
+// Bump RESULTS_VERSION whenever the layout changes.
+
+#define RESULTS_MAGIC "RVZR"
+#define RESULTS_VERSION 2
+
+typedef struct __attribute__((packed)) {
+  char magic[4];
+  uint16_t version;
+  uint16_t record_size;  // sizeof(results_record_t)
+  uint32_t count;        // number of records in this message
+  uint32_t n_cases;      // number of digests (test cases run)
+} results_header_t;
+
+typedef struct __attribute__((packed)) {
+  uint32_t length;       // whole record in bytes, including the values after it
+  uint32_t index;        // test case index within the batch
+  uint32_t instruction;
+  uint8_t outcome;       // jump_rc of the first run, 0 = ran to completion
+  uint8_t signo;         // last signal caught, 0 if none
+  uint16_t n_mem_diffs;
+  uint32_t xreg_mask;    // bit i set: x_i changed
+  uint32_t freg_mask;    // bit i set: f_i changed
+  uint64_t fault_addr;   // si_addr of the last signal caught
+} results_record_t;
+
+typedef struct __attribute__((packed)) {
+  uint64_t addr;
+  uint8_t old_val;
+  uint8_t new_val;
+} results_memdiff_t;
+
+void results_reset(void);
+void results_add(uint32_t index, uint32_t instruction, uint8_t outcome,
+                 uint8_t signo, uint64_t fault_addr, const memdiff_t *diffs,
+                 size_t n_diffs);
+void results_keep_reference(void);
+const uint8_t *results_data(bool only_changed, size_t *len);
+
+#endif
@@ -38,6 +38,8 @@ extern uint8_t *sandbox_ptr;
 
 extern volatile atomic_uintptr_t g_fault_addr;
 extern volatile sig_atomic_t g_faults_this_run;
+extern volatile sig_atomic_t g_last_signo;
+extern volatile atomic_uintptr_t g_last_fault_addr;
 
 // private definitions
 #define MAX_FAULTS_PER_RUN 10
@@ -69,6 +71,10 @@ void signal_handler(int signo, siginfo_t *info, void *context) {
   ucontext_t *uc = (ucontext_t *)context;
   void *fault_addr = info->si_addr;
   uintptr_t pc = uc->uc_mcontext.__gregs[REG_PC];
+  // kept for the binary result record
+  g_last_signo = signo;
+  atomic_store_explicit(&g_last_fault_addr, (uintptr_t)fault_addr,
+                        memory_order_relaxed);
   // === Save general-purpose registers (x0-x31) ===
   for (int i = 0; i < 32; i++) {
     xreg_output_data[i] = uc->uc_mcontext.__gregs[i];
@@ -1,3 +1,6 @@
+#ifndef SANDBOX_H
+#define SANDBOX_H
+
 #include <stdint.h>
 #include <stdio.h>
 
@@ -20,4 +23,6 @@ uint8_t *allocate_executable_buffer();
 void free_executable_buffer(uint8_t *sandbox);
 void prepare_sandbox(uint8_t *sandbox_ptr);
 void inject_instructions(uint8_t *sandbox_ptr, const uint32_t *instrs, size_t num_instrs);
-void unmap_vdso_vvar();
\ No newline at end of file
+void unmap_vdso_vvar();
+
+#endif
@@ -5,6 +5,7 @@
 #include <unistd.h>
 
 #include "client.h"
+#include "results.h"
 #include "sandbox.h"
 
 extern uint8_t *sandbox_ptr;
@@ -16,7 +17,8 @@ extern size_t g_regions_len;
 ssize_t read_n(int fd, void *buf, size_t n);
 ssize_t write_n(int fd, const void *buf, size_t n);
 void log_append(const char *fmt, ...);
-int send_log();
+int send_log(uint32_t batch_id);
+int send_results(uint32_t batch_id, bool only_changed);
 void set_up_tcp();
 
 #define SERVER_IP "192.168.10.1"
@@ -25,6 +27,8 @@ void set_up_tcp();
 
 #define TESTING
 #define DEBUG_MODE
+// send binary result records (client/results.h) instead of the text log
+#define BINARY_RESULTS
 
 int sock;
 char log_buffer[LOG_BUF_SIZE];
@@ -63,17 +67,19 @@ int main() {
   write_n(sock, name, strlen(name));  // send name
 
   // loop: receive instructions, send back results
+  // each batch starts with [batch id][batch size]; the id is echoed back with
+  // both result logs so the server can keep several batches in flight
   while (1) {
-    uint32_t batch_size_net;
+    uint32_t header_net[2];
     // closes client if server closed connection
-    if (read_n(sock, &batch_size_net, sizeof(batch_size_net)) !=
-        sizeof(batch_size_net)) {
+    if (read_n(sock, header_net, sizeof(header_net)) != sizeof(header_net)) {
       printf("Server closed connection\n");
       break;
     }
 
     // alternative way to close client: send batch size of 0
-    uint32_t batch_size = ntohl(batch_size_net);
+    uint32_t batch_id = ntohl(header_net[0]);
+    uint32_t batch_size = ntohl(header_net[1]);
     if (batch_size == 0) {
       printf("No more instructions\n");
       break;
@@ -97,7 +103,7 @@ int main() {
       free(instructions);
       break;
     }
-    printf("Got %u instructions\n", batch_size);
+    printf("Got %u instructions (batch %u)\n", batch_size, batch_id);
 
     // convert each network-order word instruction with ntohl
     for (uint32_t i = 0; i < batch_size; i++) {
@@ -110,15 +116,19 @@ int main() {
     printf("Running sandbox 1...\n");
     fflush(stdout);
     log_append("sandbox ptr: %p\n", sandbox_ptr);
+    results_reset();
     run_client(instructions, batch_size);
-    send_log();  // send results back
+    send_results(batch_id, false);  // send results back
+    results_keep_reference();
 
     // run sandbox 2
     printf("Running sandbox 2..\n");
     fflush(stdout);
     log_append("sandbox ptr: %p\n", sandbox_ptr);
+    results_reset();
     run_client(instructions, batch_size);
-    send_log();  // send results back
+    // per-case digests, plus full records only where run 2 differs from run 1
+    send_results(batch_id, true);
 
     free(instructions);
     memset(g_regions, 0, MAX_MAPPED_PAGES * sizeof(*g_regions));
@@ -199,12 +209,12 @@ void log_append(const char *fmt, ...) {
   }
 }
 
-int send_log() {
-  if (log_len == 0) return 0;
-
-  // Send length prefix (network byte order)
-  uint32_t len_net = htonl((uint32_t)log_len);
-  if (write_n(sock, &len_net, sizeof(len_net)) != sizeof(len_net)) return -1;
+int send_log(uint32_t batch_id) {
+  // Send batch id and length prefix (network byte order); an empty log is
+  // still sent so the server gets exactly two results per batch
+  uint32_t header_net[2] = {htonl(batch_id), htonl((uint32_t)log_len)};
+  if (write_n(sock, header_net, sizeof(header_net)) != sizeof(header_net))
+    return -1;
   // Send the buffer itself
   if (write_n(sock, log_buffer, log_len) != (ssize_t)log_len) return -1;
 
@@ -216,7 +226,30 @@ int send_log() {
   fflush(stdout);
   return 0;
   // example usage
-  // send_log(sock);  // send accumulated logs to server
+  // send_log(batch_id);  // send accumulated logs to server
+}
+
+// Sends the results of one sandbox run: the binary records if BINARY_RESULTS
+// is defined, the text log otherwise. only_changed: leave out the records
+// whose digest matches the run before results_keep_reference()
+int send_results(uint32_t batch_id, bool only_changed) {
+#ifdef BINARY_RESULTS
+  size_t len;
+  const uint8_t *data = results_data(only_changed, &len);
+
+  // same framing as send_log: batch id, length, payload
+  uint32_t header_net[2] = {htonl(batch_id), htonl((uint32_t)len)};
+  if (write_n(sock, header_net, sizeof(header_net)) != sizeof(header_net))
+    return -1;
+  if (write_n(sock, data, len) != (ssize_t)len) return -1;
+
+  // the text log is only kept for DEBUG_MODE output here
+  memset(log_buffer, 0, LOG_BUF_SIZE);
+  log_len = 0;
+  return 0;
+#else
+  return send_log(batch_id);
+#endif
 }
 
 void set_up_tcp() {
@@ -14,4 +14,4 @@
 #include <stdarg.h>
 
 void log_append(const char *fmt, ...);
-int send_log();
+int send_log(uint32_t batch_id);
@@ -26,23 +26,23 @@ ENDIAN_PROBABILITY = 0.5
 
 # "vfmadd.s", "vfmsub.s", "vfnmsub.s", "vfnmadd.s", "vfmadd.d", "vfmsub.d", "vfnmsub.d", "vfnmadd.d"
 
-"vfcvt.s.d", "vfcvt.d.s", "vfcvt.s.l", "vfcvt.s.lu", "vfcvt.s.w",
-    "vfcvt.s.wu", "vfcvt.d.l", "vfcvt.d.lu", "vfcvt.d.w", "vfcvt.d.wu", "vfcvt.l.s",
-    "vfcvt.lu.s", "vfcvt.w.s", "vfcvt.wu.s", "vfcvt.l.d", "vfcvt.lu.d",
-    "vfcvt.w.d", "vfcvt.wu.d"
-"vlsb", "vlsh", "vlsw", "vlsd", "vlsbu", "vlshu", "vlswu", "vssb", "vssh", "vssw", "vssd",
-    "vlab", "vlah", "vlaw", "vlad", "vlabu", "vlahu", "vlawu", "vsab", "vsah", "vsaw", "vsad"
-"vlb", "vlh", "vlw", "vld", "vlbu", "vlhu", "vlwu", "vsb", "vsh", "vsw", "vsd",
-  "vlsegb", "vlsegh", "vlsegw", "vlsegd", "vlsegbu", "vlseghu", "vlsegwu", "vssegb", "vssegh", "vssegw", "vssegd",
-  "vlstb", "vlsth", "vlstw", "vlstd", "vlstbu", "vlsthu", "vlstwu", "vsstb", "vssth", "vsstw", "vsstd",
-  "vlsegstb", "vlsegsth", "vlsegstw", "vlsegstd", "vlsegstbu", "vlsegsthu", "vlsegstwu", "vssegstb", "vssegsth", "vssegstw", "vssegstd",
-    "vlxb", "vlxh", "vlxw", "vlxd", "vlxbu", "vlxhu", "vlxwu", "vsxb", "vsxh", "vsxw", "vsxd",
-    "vlsegxb", "vlsegxh", "vlsegxw", "vlsegxd", "vlsegxbu", "vlsegxhu", "vlsegxwu", "vssegxb", "vssegxh", "vssegxw", "vssegxd"
-"vamoadd.w", "vamoswap.w", "vamoand.w", "vamoor.w", "vamomin.w", "vamominu.w",
-    "vamomax.w", "vamomaxu.w", "vamoxor.w", "vamoadd.d", "vamoswap.d", "vamoand.d", "vamoor.d",
-    "vamomin.d", "vamominu.d", "vamomax.d", "vamomaxu.d", "vamoxor.d"
-"vsetcfg", "vstop", "vsetvl", "veidx", "vf",
-    "vmcs", "vmca", "fence"
+# "vfcvt.s.d", "vfcvt.d.s", "vfcvt.s.l", "vfcvt.s.lu", "vfcvt.s.w",
+#     "vfcvt.s.wu", "vfcvt.d.l", "vfcvt.d.lu", "vfcvt.d.w", "vfcvt.d.wu", "vfcvt.l.s",
+#     "vfcvt.lu.s", "vfcvt.w.s", "vfcvt.wu.s", "vfcvt.l.d", "vfcvt.lu.d",
+#     "vfcvt.w.d", "vfcvt.wu.d"
+# "vlsb", "vlsh", "vlsw", "vlsd", "vlsbu", "vlshu", "vlswu", "vssb", "vssh", "vssw", "vssd",
+#     "vlab", "vlah", "vlaw", "vlad", "vlabu", "vlahu", "vlawu", "vsab", "vsah", "vsaw", "vsad"
+# "vlb", "vlh", "vlw", "vld", "vlbu", "vlhu", "vlwu", "vsb", "vsh", "vsw", "vsd",
+#   "vlsegb", "vlsegh", "vlsegw", "vlsegd", "vlsegbu", "vlseghu", "vlsegwu", "vssegb", "vssegh", "vssegw", "vssegd",
+#   "vlstb", "vlsth", "vlstw", "vlstd", "vlstbu", "vlsthu", "vlstwu", "vsstb", "vssth", "vsstw", "vsstd",
+#   "vlsegstb", "vlsegsth", "vlsegstw", "vlsegstd", "vlsegstbu", "vlsegsthu", "vlsegstwu", "vssegstb", "vssegsth", "vssegstw", "vssegstd",
+#     "vlxb", "vlxh", "vlxw", "vlxd", "vlxbu", "vlxhu", "vlxwu", "vsxb", "vsxh", "vsxw", "vsxd",
+#     "vlsegxb", "vlsegxh", "vlsegxw", "vlsegxd", "vlsegxbu", "vlsegxhu", "vlsegxwu", "vssegxb", "vssegxh", "vssegxw", "vssegxd"
+# "vamoadd.w", "vamoswap.w", "vamoand.w", "vamoor.w", "vamomin.w", "vamominu.w",
+#     "vamomax.w", "vamomaxu.w", "vamoxor.w", "vamoadd.d", "vamoswap.d", "vamoand.d", "vamoor.d",
+#     "vamomin.d", "vamominu.d", "vamomax.d", "vamomaxu.d", "vamoxor.d"
+# "vsetcfg", "vstop", "vsetvl", "veidx", "vf",
+#     "vmcs", "vmca", "fence"
 # vse128.v, vse1024.v
 # rvv-bench
 
@@ -188,17 +188,22 @@ AMO_TEMPLATES = [
     ("AMOMAXU.D", "AMO", {"opcode": OP_AMO, "funct3": 0x3, "funct5": 0x1C}),
 ]
 
+# Floating-point rounding modes (rne, rtz, rdn, rup, rmm, dyn)
+FP_ROUNDING_MODES = [0b000, 0b001, 0b010, 0b011, 0b100, 0b111]
+
 FLOATING_TEMPLATES = [
     # Floating-point operations (F and D precision) (opcode 0x53)
-    ("FADD.S", "F", {"opcode": OP_FPU, "funct3": 0x0, "funct7": 0x00}),
-    ("FSUB.S", "F", {"opcode": OP_FPU, "funct3": 0x0, "funct7": 0x08}),
-    ("FMUL.S", "F", {"opcode": OP_FPU, "funct3": 0x0, "funct7": 0x10}),
-    ("FDIV.S", "F", {"opcode": OP_FPU, "funct3": 0x0, "funct7": 0x18}),
-
-    ("FADD.D", "F", {"opcode": OP_FPU, "funct3": 0x1, "funct7": 0x00}),
-    ("FSUB.D", "F", {"opcode": OP_FPU, "funct3": 0x1, "funct7": 0x08}),
-    ("FMUL.D", "F", {"opcode": OP_FPU, "funct3": 0x1, "funct7": 0x10}),
-    ("FDIV.D", "F", {"opcode": OP_FPU, "funct3": 0x1, "funct7": 0x18}),
+    # funct7 = funct5 << 2 | fmt (fmt: 0 = S, 1 = D)
+    # entries without "funct3" take a random rounding mode in funct3
+    ("FADD.S", "F", {"opcode": OP_FPU, "funct7": 0x00}),
+    ("FSUB.S", "F", {"opcode": OP_FPU, "funct7": 0x04}),
+    ("FMUL.S", "F", {"opcode": OP_FPU, "funct7": 0x08}),
+    ("FDIV.S", "F", {"opcode": OP_FPU, "funct7": 0x0C}),
+
+    ("FADD.D", "F", {"opcode": OP_FPU, "funct7": 0x01}),
+    ("FSUB.D", "F", {"opcode": OP_FPU, "funct7": 0x05}),
+    ("FMUL.D", "F", {"opcode": OP_FPU, "funct7": 0x09}),
+    ("FDIV.D", "F", {"opcode": OP_FPU, "funct7": 0x0D}),
     
     # Floating-point loads (FLOAD) (opcode 0x07)
     ("FLW", "FLOAD", {"opcode": OP_LOAD_FP, "funct3": 0x2}),
@@ -207,20 +212,21 @@ FLOATING_TEMPLATES = [
     ("FSW", "FSTORE", {"opcode": OP_STORE_FP, "funct3": 0x2}),
     ("FSD", "FSTORE", {"opcode": OP_STORE_FP, "funct3": 0x3}),
 
-    ("FSQRT.S",  "R", {"opcode": OP_FPU, "funct7": 0x2A, "funct3":0x00}),
-    ("FMIN.S",   "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x01}),
-    ("FMAX.S",   "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x01}),
-    ("FSGNJ.S",  "R", {"opcode": OP_FPU, "funct7": 0x00, "funct3":0x00}),
-    ("FSGNJN.S", "R", {"opcode": OP_FPU, "funct7": 0x00, "funct3":0x01}),
-    ("FSGNJX.S", "R", {"opcode": OP_FPU, "funct7": 0x00, "funct3":0x02}),
+    # "rs2" fixes the rs2 field for single-operand instructions
+    ("FSQRT.S",  "F", {"opcode": OP_FPU, "funct7": 0x2C, "rs2": 0x00}),
+    ("FMIN.S",   "F", {"opcode": OP_FPU, "funct7": 0x14, "funct3": 0x00}),
+    ("FMAX.S",   "F", {"opcode": OP_FPU, "funct7": 0x14, "funct3": 0x01}),
+    ("FSGNJ.S",  "F", {"opcode": OP_FPU, "funct7": 0x10, "funct3": 0x00}),
+    ("FSGNJN.S", "F", {"opcode": OP_FPU, "funct7": 0x10, "funct3": 0x01}),
+    ("FSGNJX.S", "F", {"opcode": OP_FPU, "funct7": 0x10, "funct3": 0x02}),
 
     # Double-precision
-    ("FSQRT.D",  "R", {"opcode": OP_FPU, "funct7": 0x2B, "funct3":0x00}),
-    ("FMIN.D",   "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x01}),
-    ("FMAX.D",   "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x01}),
-    ("FSGNJ.D",  "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x00}),
-    ("FSGNJN.D", "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x01}),
-    ("FSGNJX.D", "R", {"opcode": OP_FPU, "funct7": 0x01, "funct3":0x02}),
+    ("FSQRT.D",  "F", {"opcode": OP_FPU, "funct7": 0x2D, "rs2": 0x00}),
+    ("FMIN.D",   "F", {"opcode": OP_FPU, "funct7": 0x15, "funct3": 0x00}),
+    ("FMAX.D",   "F", {"opcode": OP_FPU, "funct7": 0x15, "funct3": 0x01}),
+    ("FSGNJ.D",  "F", {"opcode": OP_FPU, "funct7": 0x11, "funct3": 0x00}),
+    ("FSGNJN.D", "F", {"opcode": OP_FPU, "funct7": 0x11, "funct3": 0x01}),
+    ("FSGNJX.D", "F", {"opcode": OP_FPU, "funct7": 0x11, "funct3": 0x02}),
 
 ]
 
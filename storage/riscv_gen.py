@@ -11,7 +11,11 @@ Features:
 """
 
 from config import *
-import random, argparse, time
+import random, argparse, struct, time
+try:
+    import numpy as np  # only needed for generate_batch
+except ImportError:
+    np = None
 fence_called = False
 
 # random signed immediate generator
@@ -258,10 +262,11 @@ def emit_fp(entry, xlen):
     # For F entries (requires FP regs)
     rd = pick_fpr()
     rs1 = pick_fpr()
-    rs2 = pick_fpr()
 
     name, instr_type, fields = entry
-    f3 = fields["funct3"]
+    rs2 = fields["rs2"] if "rs2" in fields else pick_fpr()
+    # no fixed funct3 -> funct3 holds the rounding mode
+    f3 = fields["funct3"] if "funct3" in fields else random.choice(FP_ROUNDING_MODES)
     f7 = fields["funct7"]
     opcode = fields["opcode"]
 
@@ -290,10 +295,7 @@ def emit_fstore(entry, xlen):
     f3 = fields["funct3"]
     opcode = fields["opcode"]
 
-    imm11_5 = (imm >> 5) & 0x7f
-    imm4_0 = imm & 0x1f
-
-    return encode_s(imm11_5, rs2, rs1, f3, imm4_0, opcode)
+    return encode_s(imm, rs2, rs1, f3, opcode)
 
 def emit_fence(entry, xlen):
     rd=0
@@ -335,9 +337,9 @@ def emit_vector(entry, xlen):
     f3 = fields.get("funct3")
     f6 = fields.get("funct6")
 
-    if instr_type == "M":
+    if instr_type == "VM":
         vm = 0
-    elif instr_type == "RV":
+    else:
         vm = random.randint(0,1)
 
     # place bits:
@@ -479,7 +481,7 @@ def generate(count=200, xlen=64, enable_m=False, enable_amo=False, enable_f=Fals
         name, instr_type, fields = random.choice(pool)
         if instr_type == "R":
             w = emit_r_ins((name, instr_type, fields), xlen)
-        elif instr_type == ("I", "JALR"):
+        elif instr_type in ("I", "JALR"):
             w = emit_i_ins((name, instr_type, fields), xlen)
         elif instr_type == "SHIFT":
             w = emit_shift_ins((name, instr_type, fields), xlen)
@@ -526,6 +528,179 @@ def generate(count=200, xlen=64, enable_m=False, enable_amo=False, enable_f=Fals
 
     return out_words
 
+# ---------------------------------------------------------------------------
+# Bulk generation: same templates and *_SPECIAL biases as generate(), but every
+# field is drawn for a whole batch at once with NumPy and assembled with the same
+# encode_* helpers (they only use shifts and masks, so they work on arrays too).
+
+TEMPLATE_FIELDS = ("opcode", "funct3", "funct7", "funct5", "funct6", "imm", "rs2")
+BRANCH_OFFSETS = [4, 8, 12, 16, -4, -8, -12, -16]
+
+def np_pick(rng, n, special_prob, specials, normal):
+    out = np.asarray(normal)[rng.integers(len(normal), size=n)]
+    use = rng.random(n) < special_prob
+    out[use] = np.asarray(specials)[rng.integers(len(specials), size=int(use.sum()))]
+    return out
+
+def np_gpr(rng, n, avoid_zero=False):
+    # x9 is always excluded, like pick_gpr
+    candidates = [r for r in range(32) if r != 9 and not (avoid_zero and r == 0)]
+    return np_pick(rng, n, GPR_SPECIAL, SPECIAL_GPRS, candidates)
+
+def np_fpr(rng, n):
+    return np_pick(rng, n, FPR_SPECIAL, SPECIAL_FPRS, FREGS)
+
+def np_vreg(rng, n):
+    return np_pick(rng, n, VREG_SPECIAL, SPECIAL_VREGS, VREGS)
+
+def np_simm(rng, n, bits):
+    out = rng.integers(-(1 << (bits-1)), 1 << (bits-1), size=n)
+    use = rng.random(n) < IMM_SPECIAL
+    out[use] = np.asarray(SPECIAL_SIMMS)[rng.integers(len(SPECIAL_SIMMS), size=int(use.sum()))]
+    return out
+
+def np_emit(instr_type, rng, f, n, xlen):
+    # f: template field arrays (one entry per word, -1 where the template has no such field)
+    global fence_called
+    opcode, f3, f7 = f["opcode"], f["funct3"], f["funct7"]
+
+    if instr_type == "R":
+        rd, rs1, rs2 = np_gpr(rng, n, avoid_zero=True), np_gpr(rng, n), np_gpr(rng, n)
+        return encode_r(f7, rs2, rs1, f3, rd, opcode)
+    if instr_type in ("I", "JALR"):
+        rd, rs1 = np_gpr(rng, n, avoid_zero=True), np_gpr(rng, n)
+        return encode_i(np_simm(rng, n, 12), rs1, f3, rd, opcode)
+    if instr_type == "SHIFT":
+        rd, rs1 = np_gpr(rng, n, avoid_zero=True), np_gpr(rng, n)
+        shamt_max = 31 if xlen == 32 else 63
+        shamt = rng.integers(0, shamt_max + 1, size=n)
+        return encode_i((f7 << 5) | (shamt & shamt_max), rs1, f3, rd, opcode)
+    if instr_type == "S":
+        rs2, rs1 = np_gpr(rng, n), np_gpr(rng, n)
+        return encode_s(np_simm(rng, n, 12), rs2, rs1, f3, opcode)
+    if instr_type == "B":
+        rs1, rs2 = np_gpr(rng, n), np_gpr(rng, n)
+        # one of the 8 short offsets or one random offset, each equally likely
+        k = rng.integers(0, 9, size=n)
+        imm = np.where(k < 8, np.asarray(BRANCH_OFFSETS)[np.minimum(k, 7)], rng.integers(-2048, 2049, size=n))
+        return encode_b(imm, rs2, rs1, f3, opcode)
+    if instr_type == "JAL":
+        rd = np_gpr(rng, n, avoid_zero=True)
+        return encode_j(rng.integers(-(1<<20), 1<<20, size=n), rd, OP_JAL)
+    if instr_type == "U":
+        rd = np_gpr(rng, n, avoid_zero=True)
+        return encode_u(np_simm(rng, n, 20), rd, opcode)
+    if instr_type == "F":
+        rd, rs1 = np_fpr(rng, n), np_fpr(rng, n)
+        rs2 = np.where(f["rs2"] >= 0, f["rs2"], np_fpr(rng, n))
+        funct3 = np.where(f3 >= 0, f3, np.asarray(FP_ROUNDING_MODES)[rng.integers(len(FP_ROUNDING_MODES), size=n)])
+        return encode_r(f7, rs2, rs1, funct3, rd, opcode)
+    if instr_type == "FLOAD":
+        rd, rs1 = np_fpr(rng, n), np_gpr(rng, n)
+        return encode_i(np_simm(rng, n, 12) & 0xfff, rs1, f3, rd, opcode)
+    if instr_type == "FSTORE":
+        rs2, rs1 = np_fpr(rng, n), np_gpr(rng, n)
+        return encode_s(np_simm(rng, n, 12), rs2, rs1, f3, opcode)
+    if instr_type == "FENCE":
+        imm = (rng.integers(0, 0x10, size=n) << 4) | rng.integers(0, 0x10, size=n)
+        if not fence_called:
+            # first FENCE is FENCE.I, same as emit_fence
+            imm[0] = 1
+            fence_called = True
+        return encode_i(imm, 0, 0, 0, OP_MISC)
+    if instr_type == "SYS":
+        return encode_i(f["imm"], 0, 0, 0, opcode)
+    if instr_type == "AMO":
+        rd, rs1, rs2 = np_gpr(rng, n, avoid_zero=True), np_gpr(rng, n), np_gpr(rng, n)
+        aq, rl = rng.integers(0, 2, size=n), rng.integers(0, 2, size=n)
+        base = np.where(f7 >= 0, f7, f["funct5"]) & 0x1F
+        return encode_r((rl << 6) | (aq << 5) | base, rs2, rs1, f3, rd, opcode)
+
+    f6 = f["funct6"]
+    vm = rng.integers(0, 2, size=n)
+    if instr_type in ("VR", "VM"):
+        vd, vs1, vs2 = np_vreg(rng, n), np_vreg(rng, n), np_vreg(rng, n)
+        if instr_type == "VM":
+            vm = 0
+        return ((f6 & 0x3f) << 26) | ((vm & 0x1) << 25) | ((vs2 & 0x1f) << 20) | ((vs1 & 0x1f) << 15) | ((f3 & 0x7) << 12) | ((vd & 0x1f) << 7) | (opcode & 0x7f)
+    if instr_type == "VR4":
+        vd, vs1, vs2, vs3 = np_vreg(rng, n), np_vreg(rng, n), np_vreg(rng, n), np_vreg(rng, n)
+        return ((f6 & 0x3f) << 26) | ((vm & 0x1) << 25) | ((vs3 & 0x1f) << 20) | ((vs2 & 0x1f) << 15) | ((vs1 & 0x1f) << 10) | ((f3 & 0x7) << 12) | ((vd & 0x1f) << 7) | (opcode & 0x7f)
+    if instr_type == "VI":
+        vd, vs2 = np_vreg(rng, n), np_vreg(rng, n)
+        shamt_max = 31 if xlen == 32 else 63
+        simm5 = rng.integers(0, shamt_max + 1, size=n) & 0x1f
+        return ((f6 & 0x3f) << 26) | ((vm & 0x1) << 25) | ((vs2 & 0x1f) << 20) | ((simm5 & 0x1f) << 15) | ((f3 & 0x7) << 12) | ((vd & 0x1f) << 7) | (opcode & 0x7f)
+    if instr_type == "VX":
+        vd, rs1, vs2 = np_vreg(rng, n), np_gpr(rng, n), np_vreg(rng, n)
+        f3, f6 = np.maximum(f3, 0), np.maximum(f6, 0)
+        return ((f6 & 0x3f) << 26) | ((vm & 0x1) << 25) | ((vs2 & 0x1f) << 20) | ((rs1 & 0x1f) << 15) | ((f3 & 0x7) << 12) | ((vd & 0x1f) << 7) | (opcode & 0x7f)
+
+    return np.full(n, 0x00000013)  # nop (addi x0,x0,0)
+
+def np_flip_bits(rng, words, max_flips=3, flip_prob=0.5):
+    # flip_bits for a whole array: 1..max_flips distinct bit positions per flipped word
+    n = words.size
+    num_flips = rng.integers(1, max_flips + 1, size=n)
+    mask = np.zeros(n, dtype=np.int64)
+    taken = []
+    for k in range(max_flips):
+        # draw from the 32-k positions still free, then step over the taken ones in ascending order
+        bit = rng.integers(0, 32 - k, size=n)
+        for col in (np.sort(np.stack(taken), axis=0) if taken else []):
+            bit += bit >= col
+        mask |= np.where(num_flips > k, np.int64(1) << bit, 0)
+        taken.append(bit)
+    flipped = rng.random(n) <= flip_prob
+    return np.where(flipped, words ^ mask, words)
+
+def generate_batch(count=200, xlen=64, enable_m=False, enable_amo=False, enable_f=False, enable_vector=False, seed=None, chunk=1 << 20):
+    # Same output as generate() in distribution, returned as a numpy.uint32 array.
+    # Work is done in chunks of `chunk` base words to bound memory on huge counts.
+    if np is None:
+        raise RuntimeError("generate_batch requires numpy")
+    if seed is None:
+        seed = int(time.time())
+    rng = np.random.default_rng(seed)
+    pool = build_pool(xlen, enable_m, enable_amo, enable_f, enable_vector)
+    type_names = sorted({instr_type for _, instr_type, _ in pool})
+    pool_type = np.array([type_names.index(instr_type) for _, instr_type, _ in pool], dtype=np.uint8)
+    table = {k: np.array([fields.get(k, -1) for _, _, fields in pool], dtype=np.int64) for k in TEMPLATE_FIELDS}
+
+    out = []
+    for start in range(0, count, chunk):
+        n = min(chunk, count - start)
+        picks = rng.integers(len(pool), size=n)
+
+        # group the picks by template type, then emit each group in one go
+        pick_type = pool_type[picks]
+        order = np.argsort(pick_type, kind="stable")
+        bounds = np.searchsorted(pick_type[order], np.arange(len(type_names) + 1))
+        words = np.empty(n, dtype=np.int64)
+        for t, name in enumerate(type_names):
+            rows = order[bounds[t]:bounds[t + 1]]
+            if rows.size == 0:
+                continue
+            f = {k: v[picks[rows]] for k, v in table.items()}
+            words[rows] = np_emit(name, rng, f, rows.size, xlen)
+        words &= 0xffffffff
+
+        # extra flipped / endian-swapped words follow their source word, like generate()
+        keep_flip = rng.random(n) < FLIP_PROBABILITY
+        keep_endian = rng.random(n) < ENDIAN_PROBABILITY
+        last = words.copy()
+        last[keep_flip] = np_flip_bits(rng, words[keep_flip])
+
+        per_word = 1 + keep_flip.astype(np.int64) + keep_endian
+        pos = np.cumsum(per_word) - per_word
+        chunk_out = np.empty(int(per_word.sum()), dtype=np.uint32)
+        chunk_out[pos] = words
+        chunk_out[pos[keep_flip] + 1] = last[keep_flip]
+        chunk_out[(pos + 1 + keep_flip)[keep_endian]] = flip_endian_32(last[keep_endian])
+        out.append(chunk_out)
+
+    return np.concatenate(out) if out else np.empty(0, dtype=np.uint32)
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--count", type=int, default=200)
@@ -535,16 +710,27 @@ def main():
     p.add_argument("--enable-amo", action="store_true")
     p.add_argument("--enable-f", action="store_true")
     p.add_argument("--enable-vector", action="store_true")
+    p.add_argument("--batch", action="store_true", help="vectorized generation with numpy (generate_batch)")
+    p.add_argument("--bin", default=None, help="write raw little-endian uint32 words to this file instead of output.c")
     args = p.parse_args()
 
-    words = generate(count=args.count,
-                     xlen=args.xlen,
-                     enable_m=args.enable_m,
-                     enable_amo=args.enable_amo,
-                     enable_f=args.enable_f,
-                     enable_vector=args.enable_vector,
-                     seed=args.seed)
-    
+    gen = generate_batch if args.batch else generate
+    words = gen(count=args.count,
+                xlen=args.xlen,
+                enable_m=args.enable_m,
+                enable_amo=args.enable_amo,
+                enable_f=args.enable_f,
+                enable_vector=args.enable_vector,
+                seed=args.seed)
+
+    if args.bin:
+        with open(args.bin, "wb") as f:
+            if args.batch:
+                words.astype("<u4").tofile(f)
+            else:
+                f.write(struct.pack(f"<{len(words)}I", *words))
+        return
+
     # write ISA instructions to output.c
     with open("output.c", "w") as f:
         f.write("// Auto-generated instructions\n\n")
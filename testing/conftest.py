@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# Shared setup for the tests in testing/ (run with: python3 -m pytest testing).
+# The server modules are importable by name, storage/ is searched last (for
+# riscv_gen; its config.py must not shadow anything), and tests that need a
+# config get `cfg`, a small in-memory one, instead of reading config.cfg, so
+# local edits to config.cfg do not change what the tests run.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "Server"))
+sys.path.append(os.path.join(ROOT, "storage"))
+
+# the generator settings of config.cfg, as read_cfg returns them, with the
+# in-process encoders and no optional features turned on
+CFG = {
+    "TOTAL_INSTRUCTIONS": 1000,
+    "CAMPAIGN_SECONDS": 0,
+    "GEN_CHUNK_SIZE": 1024,
+    "SCHEDULE_MODE": "differential",
+    "BATCH_SIZE": 1,
+    "BATCH_WINDOW": 4,
+    "BASE_ENCODER": "native",
+    "VECTOR_ENCODER": "table",
+    "GPRs": [0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26,
+             27, 28, 29, 30, 31],
+    "FREGs": list(range(32)),
+    "VREGs": list(range(32)),
+    "SPECIAL_GPRS": [0, 1, 2, 31],
+    "SPECIAL_FPRS": [0, 1, 31],
+    "SPECIAL_VREGS": [0, 1, 31],
+    "SPECIAL_SIMMS": [0, 1, -1, 2047, -2048],
+    "SPECIAL_UIMMS": [0, 1, 4095, 4096, 1024],
+    "GPR_SPECIAL": 0.2,
+    "FPR_SPECIAL": 0.2,
+    "VREG_SPECIAL": 0.3,
+    "IMM_SPECIAL": 0.875,
+    "ENDIAN_PROBABILITY": 0.5,
+    "FLIP_PROBABILITY": 0.5,
+    "MAX_FLIPS": 3,
+    "ZIMM10_BIAS": 0.7,
+    "VLMUL_PROBABILITIES.Mf8": 0.21,
+    "VLMUL_PROBABILITIES.Mf4": 0.20,
+    "VLMUL_PROBABILITIES.M8": 0.20,
+    "VLMUL_PROBABILITIES.Mf2": 0.15,
+    "VLMUL_PROBABILITIES.M2": 0.10,
+    "VLMUL_PROBABILITIES.M4": 0.08,
+    "VLMUL_PROBABILITIES.M1": 0.06,
+}
+
+@pytest.fixture
+def cfg():
+    return {key: list(value) if isinstance(value, list) else value for key, value in CFG.items()}
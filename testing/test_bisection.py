@@ -0,0 +1,85 @@
+import asyncio
+
+# Crash bisection in Server/instruction_source.py: a board that dies on one
+# word of a batch gets the batch back in halves until the word is isolated and
+# quarantined; every other word still runs, and the batch counts as done.
+
+from instruction_source import InstructionSource
+
+BAD = 1000 + 37
+WORDS = list(range(1000, 1000 + 256))
+
+async def board(source, name, ran, crashes):
+    # runs batches one at a time; reconnects after "crashing" on BAD
+    source.subscribe(name)
+    while True:
+        leased = await source.get(name)
+        if leased is None:
+            await source.unsubscribe(name)
+            return
+        seq, batch = leased
+        if BAD in batch:
+            crashes.append(len(batch))
+            await source.unsubscribe(name, [(seq, batch)])
+            source.subscribe(name)
+            continue
+        ran.extend(batch)
+        await source.complete(name, seq)
+
+async def campaign(mode, names):
+    done = []
+    quarantined = []
+    source = InstructionSource(iter([WORDS]), 64, 8, mode, on_done=done.append,
+                               on_quarantine=lambda w, n: quarantined.append(w))
+    producer = asyncio.create_task(source.run())
+    ran, crashes = {n: [] for n in names}, {n: [] for n in names}
+    await asyncio.gather(*(board(source, n, ran[n], crashes[n]) for n in names))
+    await producer
+    return source, done, quarantined, ran, crashes
+
+def test_differential_bisects_per_board():
+    source, done, quarantined, ran, crashes = asyncio.run(campaign("differential", ["beagle", "lichee"]))
+    for name in ("beagle", "lichee"):
+        assert sorted(ran[name]) == [w for w in WORDS if w != BAD]
+        assert crashes[name] == [64, 32, 16, 8, 4, 2, 1]
+    assert quarantined == [BAD, BAD]
+    assert sorted(done) == [0, 1, 2, 3] and source.finished_all()
+    # reported through the event log, one record per board
+    events = [(event, fields) for _, _, event, fields in source.log.ring if event == "quarantined"]
+    assert sorted(fields["board"] for _, fields in events) == ["beagle", "lichee"]
+    assert all(fields["word"] == f"0x{BAD:08x}" for _, fields in events)
+
+def test_shard_bisects_once():
+    source, done, quarantined, ran, crashes = asyncio.run(campaign("shard", ["beagle", "lichee"]))
+    assert sorted(ran["beagle"] + ran["lichee"]) == [w for w in WORDS if w != BAD]
+    assert sorted(crashes["beagle"] + crashes["lichee"]) == [1, 2, 4, 8, 16, 32, 64]
+    assert quarantined == [BAD]
+    assert sorted(done) == [0, 1, 2, 3] and source.finished_all()
+    assert not source.leases and not source.open_parts
+
+async def board_leaves(source, name, ran):
+    # dies on the batch holding BAD and never comes back
+    source.subscribe(name)
+    while (leased := await source.get(name)) is not None:
+        seq, batch = leased
+        if BAD in batch:
+            await source.unsubscribe(name, [(seq, batch)])
+            return
+        ran.extend(batch)
+        await source.complete(name, seq)
+    await source.unsubscribe(name)
+
+def test_departed_board_does_not_stall_the_rest():
+    async def campaign():
+        source = InstructionSource(iter([WORDS]), 16, 2, "differential")
+        producer = asyncio.create_task(source.run())
+        ran = {"beagle": [], "lichee": []}
+        await asyncio.wait_for(asyncio.gather(board_leaves(source, "beagle", ran["beagle"]),
+                                              board(source, "lichee", ran["lichee"], [])), 10)
+        await producer
+        return source, ran
+    source, ran = asyncio.run(campaign())
+    assert ran["lichee"] == [w for w in WORDS if w != BAD]
+    assert max(ran["beagle"]) < BAD
+    assert source.finished_all() and not source.departed and not source.open_parts and not source.parts
+    assert "beagle" not in source.finished
@@ -0,0 +1,85 @@
+import asyncio
+import struct
+
+# Server/board_control.py: batch sizes follow each board's speed, and a board
+# that hangs on a batch is dropped by the watchdog, after which the batch is
+# split up like one lost to a disconnect.
+
+import server
+from board_control import BoardControl
+from instruction_source import InstructionSource, SPLIT_BASE
+
+def test_batch_size_follows_speed():
+    fast = BoardControl(unit=16, target=1.0, max_units=64)
+    slow = BoardControl(unit=16, target=1.0, max_units=64)
+    for _ in range(20):
+        fast.observe(fast.units * 16, fast.units * 16 * 0.0005)  # 0.5 ms per word
+        slow.observe(slow.units * 16, slow.units * 16 * 0.02)    # 20 ms per word
+    assert fast.units == 64 and slow.units == 3
+    assert fast.deadline(1024) == fast.min_seconds
+    assert slow.deadline(1000) == 4.0 * 20.0
+
+    # a loss halves the size, which stays capped until the board recovers
+    fast.lost(timed_out=True)
+    assert fast.units == fast.limit == 32 and fast.timeouts == 1
+    for _ in range(15):
+        fast.observe(fast.units * 16, fast.units * 16 * 0.0005)
+    assert fast.units == 32
+    fast.observe(fast.units * 16, fast.units * 16 * 0.0005)
+    fast.observe(fast.units * 16, fast.units * 16 * 0.0005)
+    assert fast.units == 64
+
+def test_get_many_joins_ready_batches():
+    async def run():
+        source = InstructionSource.from_list(range(40), 4, 16, "shard")
+        producer = asyncio.create_task(source.run())
+        await producer
+        source.subscribe("beagle")
+        first = await source.get_many("beagle", 3)
+        wire = [bytes(source.wire[seq]) for seq, _ in first]
+        rest = await source.get_many("beagle", 100)
+        return first, wire, rest
+    first, wire, rest = asyncio.run(run())
+    assert [seq for seq, _ in first] == [0, 1, 2]
+    # packed once, in network order, as write_batch sends it
+    assert wire == [struct.pack("!4I", *batch) for _, batch in first]
+    assert [w for _, b in first + rest for w in b] == list(range(40))
+
+async def hung_board(port, answered):
+    # answers the first batch, then never answers again
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(struct.pack("!I", 6) + b"beagle")
+    while True:
+        batch_id, count = struct.unpack("!II", await reader.readexactly(8))
+        await reader.readexactly(4 * count)
+        if answered:
+            break
+        answered.append(batch_id)
+        for _ in range(2):
+            writer.write(struct.pack("!II", batch_id, 2) + b"ok")
+        await writer.drain()
+    await reader.read()  # until the server drops us
+    writer.close()
+
+def test_watchdog_drops_hung_board():
+    cfg = {"BATCH_SIZE": 4, "BATCH_WINDOW": 1, "WATCHDOG_FIRST_SECONDS": 5.0,
+           "WATCHDOG_MIN_SECONDS": 0.2, "WATCHDOG_FACTOR": 4.0}
+
+    async def run():
+        source = InstructionSource.from_list(range(16), 4, 8, "differential")
+        producer = asyncio.create_task(source.run())
+        srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        await asyncio.wait_for(hung_board(port, []), 10)
+        await asyncio.sleep(0.1)
+        srv.close()
+        await producer
+        return source
+
+    server.controls.clear()
+    source = asyncio.run(run())
+    control = server.controls["beagle"]
+    assert control.timeouts == 1 and control.batches == 1
+    # batch 1 hung: it is now being retried in halves
+    assert source.open_parts == {("beagle", 1): 2}
+    assert sorted(source.part_queues["beagle"]) == [SPLIT_BASE, SPLIT_BASE + 1]
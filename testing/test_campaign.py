@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# Server/campaign.py: a campaign interrupted after a checkpoint resumes with the
+# same batches, word for word, as an uninterrupted run with the same seed
+# (in-process encoders), and per-board progress and coverage counts carry over.
+
+from campaign import Campaign
+from coverage_weights import Coverage
+from generate import generate_stream
+from instruction_source import InstructionSource
+from test_results import build_message
+
+BATCH_SIZE = 16
+MAX_BATCHES = 8
+
+async def run(campaign, stop_after=None):
+    # one board runs batches in order; returns {seq: batch} it completed
+    source = InstructionSource(campaign.stream(), BATCH_SIZE, MAX_BATCHES, "differential")
+    campaign.restore(source)
+    producer = asyncio.create_task(source.run())
+    source.subscribe("beagle")
+    done = {}
+    while stop_after is None or len(done) < stop_after:
+        leased = await source.get("beagle")
+        if leased is None:
+            break
+        seq, batch = leased
+        done[seq] = batch
+        await source.complete("beagle", seq)
+    if stop_after is not None:
+        # let the producer fill the buffer, so the generator thread is idle
+        while len(source.batches) < MAX_BATCHES:
+            await asyncio.sleep(0.01)
+    campaign.save(source)
+    producer.cancel()
+    return done, source
+
+def test_resume_matches_uninterrupted_run(cfg):
+    cfg.update(TOTAL_INSTRUCTIONS=2000, GEN_CHUNK_SIZE=100)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "campaign.json")
+        first, _ = asyncio.run(run(Campaign.load_or_new(path, cfg), stop_after=10))
+        with open(path) as f:
+            state = json.load(f)
+        assert state["source"]["completed"] == {"beagle": 10}
+
+        resumed = Campaign.load_or_new(path, cfg)
+        rest, source = asyncio.run(run(resumed))
+        assert source.completed == {"beagle": 2000 // BATCH_SIZE}
+        assert not os.path.exists(path)  # finished campaigns leave no checkpoint
+
+    reference = [w for chunk in generate_stream(cfg, seed=state["seed"]) for w in chunk]
+    words = [w for seq in sorted({**first, **rest}) for w in {**first, **rest}[seq]]
+    assert set(first) & set(rest) == set()
+    assert words == reference
+
+def test_board_that_never_reconnects_does_not_stall_resume():
+    async def resume():
+        # checkpointed before anything ran, with lichee in it; only beagle comes back
+        snap = {"mode": "differential", "next_seq": 0, "chunks_read": 0, "batches": {}, "pending": [],
+                "finished": {"beagle": 0, "lichee": 0}, "completed": {}}
+        source = InstructionSource(iter([list(range(256))]), BATCH_SIZE, 2, "differential")
+        source.restore(snap)
+        producer = asyncio.create_task(source.run())
+        source.subscribe("beagle")
+        done = []
+        while (leased := await asyncio.wait_for(source.get("beagle"), 10)) is not None:
+            done.append(leased[0])
+            await source.complete("beagle", leased[0])
+        await producer
+        return source, done
+    source, done = asyncio.run(resume())
+    assert done == list(range(256 // BATCH_SIZE)) and source.finished_all()
+    assert list(source.finished) == ["beagle"]
+
+def test_coverage_counts_survive_resume(cfg):
+    cov = Coverage(["boring", "novel"], rebuild=1)
+    for i in range(20):
+        cov.origin(0x00000013 + (i << 20), "boring")
+        cov.origin(0x00000073 | (i << 7), "novel")
+    recs = [(i, 0x00000013 + (i << 20), 0, 0, 0, {5: 1}, {}, []) for i in range(20)]
+    recs += [(20 + i, 0x00000073 | (i << 7), 0, 0, 0, {i + 1: 1}, {}, []) for i in range(20)]
+    cov.observe("beagle", 0, build_message(recs, list(range(len(recs)))), changed=[3, 25])
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "campaign.json")
+        # a source that has not read anything yet is not finished, so save() writes
+        source = InstructionSource(iter([]), BATCH_SIZE, MAX_BATCHES, "differential")
+        Campaign.load_or_new(path, cfg).save(source, cov)
+
+        resumed = Coverage(["novel", "boring", "added"], rebuild=1)
+        Campaign.load_or_new(path, cfg).restore(InstructionSource(iter([]), BATCH_SIZE, MAX_BATCHES,
+                                                                  "differential"), resumed)
+    assert resumed.seen == cov.seen
+    assert (resumed.tests, resumed.new, resumed.anomalies) == ([20, 20, 0], [cov.new[1], cov.new[0], 0],
+                                                               [1, 1, 0])
+    assert resumed.weights()[:2] == cov.weights()[::-1]
@@ -0,0 +1,38 @@
+import random
+
+# Server/coverage_weights.py: alias table draws follow the weights, and mnemonics whose
+# words turn up new outcome signatures gain weight over ones that repeat.
+
+from coverage_weights import AliasTable, Coverage
+from test_results import build_message
+
+def test_alias_table_matches_weights():
+    weights = [1, 2, 3, 10, 0.5]
+    table = AliasTable(weights)
+    rng = random.Random(1)
+    n = 200000
+    counts = [0] * len(weights)
+    for _ in range(n):
+        counts[table.draw(rng)] += 1
+    for c, w in zip(counts, weights):
+        assert abs(c / n - w / sum(weights)) < 0.01
+
+def test_new_signatures_gain_weight():
+    cov = Coverage(["boring", "novel"], rebuild=1)
+    words = {"boring": [0x00000013 + (i << 20) for i in range(50)],        # addi, same outcome each time
+             "novel": [0x00000073 | (i << 7) | (i % 8) << 12 for i in range(50)]}
+    recs = []
+    for m, ws in words.items():
+        for w in ws:
+            cov.origin(w, m)
+    for i, w in enumerate(words["boring"]):
+        recs.append((len(recs), w, 0, 0, 0, {5: 1}, {}, []))
+    for i, w in enumerate(words["novel"]):
+        # a different changed-register set per case
+        recs.append((len(recs), w, 0, 0, 0, {i % 31 + 1: 1}, {}, []))
+    cov.observe("beagle", 0, build_message(recs, list(range(len(recs)))))
+    boring, novel = cov.weights()
+    assert cov.tests == [50, 50]
+    assert novel > 5 * boring
+    # the rebuilt table now draws the novel mnemonic most of the time
+    assert cov.sample(1000, random.Random(2)).count("novel") > 800
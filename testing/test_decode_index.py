@@ -0,0 +1,39 @@
+import random
+
+# Server/decode_index.py: words from the in-process encoders decode back to
+# their mnemonic, and the NumPy batch path agrees with the per-word one.
+
+from decode_index import load_decode_index, np
+from native_encoder import build_encoders
+from vector_table import build_vector_encoders
+
+SAMPLES = 300  # per mnemonic
+
+# Encoder.js draws the whole 12-bit immediate of immediate shifts, so some words
+# have shamt bits that are reserved on RV64 and decode to nothing
+SHIFTS = {"SLLI", "SRLI", "SRAI", "SLLIW", "SRLIW", "SRAIW"}
+
+def test_encoded_words_decode_to_their_mnemonic(cfg):
+    random.seed(0)
+    index = load_decode_index()
+    mismatches = []
+    for encoders in (build_encoders(cfg), build_vector_encoders(cfg)):
+        for mne, encode in encoders.items():
+            for _ in range(SAMPLES):
+                word = encode() & 0xffffffff
+                name = index.name(word)
+                if name is None and mne in SHIFTS:
+                    continue
+                if name != mne.lower():
+                    mismatches.append((mne, name, hex(word)))
+                    break
+    assert not mismatches, mismatches
+
+def test_batch_matches_single():
+    if np is None:
+        return
+    index = load_decode_index()
+    rng = random.Random(1)
+    words = [rng.getrandbits(32) for _ in range(100000)]
+    batch = index.decode_many(np.array(words, dtype=np.uint32))
+    assert batch.tolist() == [index.decode(w) for w in words]
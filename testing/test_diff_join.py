@@ -0,0 +1,63 @@
+import asyncio
+import tempfile
+
+# Server/diff_join.py: cases pair up by instruction word whichever board is
+# ahead, only differing pairs come out, the window bounds what is held, and
+# divergences land in the result store.
+
+from diff_join import DiffJoin
+from result_store import ResultStore, divergences
+from test_results import build_message
+
+SIGSEGV = 11
+
+def batch(words, segv=(), xregs=None, fault_addr=0, diffs=None):
+    recs = [(i, w, 2 if w in segv else 0, SIGSEGV if w in segv else 0, fault_addr, (xregs or {}).get(w, {}), {},
+             (diffs or {}).get(w, [])) for i, w in enumerate(words)]
+    return build_message(recs, list(range(len(words))))
+
+def test_pairs_across_boards():
+    out = []
+    join = DiffJoin(["beagle", "lichee"])
+    out.extend(join.add("beagle", 0, batch([1, 2, 3])))
+    out.extend(join.add("beagle", 1, batch([4, 5, 6], segv={5})))
+    assert join.n_pending == 6 and not out
+    out.extend(join.add("lichee", 0, batch([1, 2, 3], xregs={2: {5: 7}})))
+    out.extend(join.add("lichee", 1, batch([4, 5, 6])))
+    join.add("other", 0, batch([1]))  # not a DIFF_BOARDS board
+    assert join.n_pending == 0 and join.pairs == 6
+    assert [(row[0], row[4], row[8]) for row in out] == [(2, "ok", "ok"), (5, "sigsegv", "ok")]
+
+def test_only_sandbox_addresses_are_ignored():
+    out = []
+    join = DiffJoin(["beagle", "lichee"])
+    # sp, fault addresses and memory addresses depend on where each sandbox lives
+    out.extend(join.add("beagle", 0, batch([1, 2, 3], segv={3}, xregs={2: {1: 5, 2: 0x7000, 5: 7}},
+                                           fault_addr=0x1000, diffs={2: [(0x7010, 0, 1)]})))
+    out.extend(join.add("lichee", 0, batch([1, 2, 3], segv={3}, xregs={2: {1: 5, 2: 0x9000, 5: 7}},
+                                           fault_addr=0x2000, diffs={2: [(0x9010, 0, 1)]})))
+    assert join.pairs == 3 and not out
+    # a computed value, which registers changed, or a stored byte differ
+    out.extend(join.add("beagle", 1, batch([4, 5, 6], xregs={4: {5: 7}, 5: {5: 7}}, diffs={6: [(0x7010, 0, 1)]})))
+    out.extend(join.add("lichee", 1, batch([4, 5, 6], xregs={4: {5: 8}, 5: {6: 7}}, diffs={6: [(0x9010, 0, 2)]})))
+    assert [row[0] for row in out] == [4, 5, 6]
+
+def test_window_drops_oldest():
+    out = []
+    join = DiffJoin(["beagle", "lichee"], window=4)
+    out.extend(join.add("beagle", 0, batch([1, 2, 3])))
+    out.extend(join.add("beagle", 1, batch([4, 5, 6])))
+    assert join.n_pending == 4 and join.unpaired == 2
+    assert not out  # unpaired cases are counted, not recorded as divergences
+    out.extend(join.add("lichee", 0, batch([3, 4, 5, 6])))
+    assert join.n_pending == 0 and join.divergences == 0
+
+def test_divergences_stored():
+    with tempfile.TemporaryDirectory() as d:
+        store = ResultStore(d)
+        join = DiffJoin(["beagle", "lichee"])
+        join.add("beagle", 0, batch([7, 8], segv={8}))
+        asyncio.run(store.append_divergences(join.add("lichee", 0, batch([7, 8]))))
+        store.close()
+        rows = list(divergences(d))
+        assert [(r[0], r[1], r[4], r[5], r[8]) for r in rows] == [(8, "beagle", "sigsegv", "lichee", "ok")]
@@ -0,0 +1,57 @@
+import asyncio
+import os
+import tempfile
+
+# Server/enumerate_space.py: a sweep covers every word of the subspace once,
+# and a sweep stopped half way resumes from its checkpoint without losing
+# shards (shards that were in flight run again).
+
+from enumerate_space import Enumeration
+from instruction_source import InstructionSource
+
+MATCH, MASK = 0x00005057, 0xfff0707f  # 2^10 words
+
+async def sweep(enum, stop_after=None):
+    # two boards in shard mode; returns the words whose batches completed
+    source = InstructionSource(enum.stream(), 8, 4, "shard", enum.batch_done)
+    producer = asyncio.create_task(source.run())
+    words = []
+
+    async def board(name):
+        source.subscribe(name)
+        while stop_after is None or len(words) < stop_after:
+            leased = await source.get(name)
+            if leased is None:
+                break
+            seq, batch = leased
+            await asyncio.sleep(0)
+            words.extend(batch)
+            await source.complete(name, seq)
+
+    await asyncio.gather(board("beagle"), board("lichee"))
+    producer.cancel()
+    return words
+
+def test_sweep_covers_subspace():
+    enum = Enumeration(MATCH, MASK, shard_size=100, batch_size=8)
+    assert enum.shard_size == 104
+    words = asyncio.run(sweep(enum))
+    assert sorted(words) == sorted({w for w in words}) and len(words) == 1024
+    assert all(w & MASK == MATCH for w in words)
+    assert enum.watermark == enum.n_shards
+
+def test_resume_from_checkpoint():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "enum.json")
+        first = Enumeration(MATCH, MASK, shard_size=64, batch_size=8, checkpoint=path)
+        done_before = asyncio.run(sweep(first, stop_after=300))
+        resumed = Enumeration(MATCH, MASK, shard_size=64, batch_size=8, checkpoint=path)
+        assert resumed.watermark + len(resumed.done) == first.watermark + len(first.done) > 0
+        rest = asyncio.run(sweep(resumed))
+        assert set(done_before) | set(rest) == {resumed.word(i) for i in range(1024)}
+        assert len(rest) < 1024
+        try:
+            Enumeration(MATCH, MASK | 1 << 19, shard_size=64, batch_size=8, checkpoint=path)
+        except ValueError:
+            return
+        assert False, "expected ValueError for another sweep's checkpoint"
@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import threading
+
+# Server/event_log.py: levels and sampling are applied when a record is
+# emitted, callable fields are only evaluated by the writer, a full buffer
+# drops the oldest records instead of blocking, and the file rotates.
+
+from event_log import EventLog
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_levels_sampling_and_lazy_fields():
+    calls = []
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "log.jsonl")
+        log = EventLog(path, level="info", console_level="error", sample={"batch_done": 0.25, "muted": 0})
+        log.debug("batch_sent", batch=0)
+        for seq in range(8):
+            log.info("batch_done", batch=seq)
+        log.info("muted")
+        log.error("responses_differ", batch=3, detail=lambda: calls.append(1) or "dump")
+        assert not calls  # nothing is formatted on the emitting side
+        log.start()
+        log.close()
+        records = read_lines(path)
+    assert calls == [1]
+    assert [(r["event"], r.get("batch")) for r in records] == [
+        ("batch_done", 0), ("batch_done", 4), ("responses_differ", 3)]
+    assert records[-1]["level"] == "error" and records[-1]["detail"] == "dump"
+
+def test_full_buffer_drops_oldest():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "log.jsonl")
+        log = EventLog(path, console_level="error", capacity=4)
+        for i in range(10):
+            log.info("tick", i=i)
+        log.close()
+        records = read_lines(path)
+    assert records[0]["event"] == "log_dropped" and records[0]["records"] == 6
+    assert [r["i"] for r in records[1:]] == [6, 7, 8, 9]
+
+def test_concurrent_emit_loses_nothing_uncounted():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "log.jsonl")
+        log = EventLog(path, console_level="error", capacity=64, flush_seconds=0.001)
+        log.start()
+        threads = [threading.Thread(target=lambda: [log.info("tick") for _ in range(5000)]) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        log.close()
+        records = read_lines(path)
+    ticks = sum(r["event"] == "tick" for r in records)
+    dropped = sum(r["records"] for r in records if r["event"] == "log_dropped")
+    assert ticks + dropped == 4 * 5000
+
+def test_rotation():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "log.jsonl")
+        log = EventLog(path, console_level="error", max_bytes=200, backups=2)
+        for i in range(31):
+            log.info("tick", i=i, pad="x" * 40)
+            log.flush()
+        log.close()
+        assert sorted(os.listdir(d)) == ["log.jsonl", "log.jsonl.1", "log.jsonl.2"]
+        files = [read_lines(p) for p in (path + ".2", path + ".1", path)]
+    # newest records in the current file, older ones in .1 and .2, the rest gone
+    assert [r["i"] for rows in files for r in rows] == list(range(31 - sum(map(len, files)), 31))
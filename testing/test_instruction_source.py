@@ -0,0 +1,39 @@
+import asyncio
+
+# Shard mode in Server/instruction_source.py: batches a board had leased when
+# it went away go back to the front of the queue, and every batch is completed
+# exactly once.
+
+from instruction_source import InstructionSource
+
+BATCH_SIZE = 16
+WORDS = list(range(128))
+
+def test_leases_are_requeued_when_a_board_leaves():
+    async def run():
+        source = InstructionSource.from_list(WORDS, BATCH_SIZE, 8, "shard")
+        producer = asyncio.create_task(source.run())
+        for name in ("beagle", "lichee"):
+            source.subscribe(name)
+        held = [await source.get("beagle") for _ in range(3)]
+        other = await source.get("lichee")
+        assert [seq for seq, _ in held] == [0, 1, 2] and other[0] == 3
+        assert source.leases == {0: "beagle", 1: "beagle", 2: "beagle", 3: "lichee"}
+
+        # beagle goes away cleanly with three batches leased
+        await source.unsubscribe("beagle")
+        assert source.leases == {3: "lichee"}
+        assert list(source.queue)[:3] == [0, 1, 2]
+
+        done = [other]
+        await source.complete("lichee", other[0])
+        while (leased := await asyncio.wait_for(source.get("lichee"), 10)) is not None:
+            done.append(leased)
+            await source.complete("lichee", leased[0])
+        await producer
+        return source, done
+
+    source, done = asyncio.run(run())
+    assert [seq for seq, _ in done] == [3, 0, 1, 2, 4, 5, 6, 7]
+    assert sorted(w for _, batch in done for w in batch) == WORDS
+    assert source.finished_all() and not source.leases
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tempfile
+
+# Server/metrics.py: counters and histograms kept by handle_client while
+# simulated boards run a campaign, read back over the HTTP endpoint (JSON and
+# Prometheus text) and from the metrics file.
+
+import server
+from instruction_source import InstructionSource
+from metrics import Histogram, Metrics
+from sim_board import SimBoard, run_boards
+
+WORDS = list(range(2048))
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.0\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.0 200")
+    return body.decode()
+
+async def campaign():
+    cfg = {"BATCH_SIZE": 64, "BATCH_WINDOW": 2}
+    server.metrics = Metrics()
+    server.controls.clear()
+    source = InstructionSource.from_list(WORDS, 64, 8, "differential")
+    server.metrics.source = source
+    producer = asyncio.create_task(source.run())
+    srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+    http = await server.metrics.serve(0)
+    boards = [SimBoard(name, latency=0.002, per_word=0) for name in ("beagle", "lichee")]
+    await asyncio.wait_for(run_boards(boards, "127.0.0.1", srv.sockets[0].getsockname()[1]), 30)
+    await producer
+    port = http.sockets[0].getsockname()[1]
+    snap = json.loads(await get(port, "/metrics.json"))
+    text = await get(port, "/metrics")
+    srv.close()
+    http.close()
+    return snap, text
+
+def test_counters_during_campaign():
+    snap, text = asyncio.run(campaign())
+    for name in ("beagle", "lichee"):
+        board = snap["boards"][name]
+        assert board["words"] == len(WORDS) and board["batches"] == len(WORDS) // 64
+        assert board["connects"] == 1 and not board["connected"] and board["inflight"] == 0
+        assert 0.002 <= board["rtt_p50_s"] <= board["rtt_p99_s"]
+    assert snap["queue"]["produced"] == len(WORDS) // 64 and snap["queue"]["buffered"] == 0
+    assert set(snap["stage_seconds"]) == {"generation", "send", "board", "compare"}
+
+    assert f'riscvuzz_words_total{{board="beagle"}} {len(WORDS)}' in text
+    assert f'riscvuzz_batch_rtt_seconds_count{{board="lichee"}} {len(WORDS) // 64}' in text
+    assert f'riscvuzz_batch_rtt_seconds_bucket{{board="lichee",le="+Inf"}} {len(WORDS) // 64}' in text
+    assert 'riscvuzz_stage_seconds_count{stage="compare"} 64' in text
+
+def test_histogram_and_file():
+    h = Histogram((0.01, 0.1, 1))
+    for value in (0.005, 0.05, 0.05, 0.5, 5):
+        h.observe(value)
+    assert list(h.cumulative()) == [(0.01, 1), (0.1, 3), (1, 4), (float("inf"), 5)]
+    assert h.quantile(0.5) == 0.1 and h.quantile(0.99) == float("inf")
+
+    metrics = Metrics()
+    metrics.board("beagle").words = 7
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "metrics.prom")
+        metrics.write_file(path)
+        with open(path) as f:
+            assert 'riscvuzz_words_total{board="beagle"} 7' in f.read()
+
+def test_rate_does_not_depend_on_readers():
+    metrics = Metrics()
+    board = metrics.board("beagle")
+    board.created -= 10  # seen for 10 s already
+    board.completed(500)
+    board.completed(500)
+    first = metrics.snapshot()["boards"]["beagle"]["words_per_s"]
+    second = metrics.snapshot()["boards"]["beagle"]["words_per_s"]
+    assert abs(first - second) < 0.01 and 99 <= first <= 101
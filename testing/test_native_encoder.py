@@ -0,0 +1,44 @@
+import random
+
+# Equivalence check between Server/native_encoder.py and Server/generator/Encoder.js.
+# Both encoders pick random operands, so the words themselves differ; what must match
+# is the field layout: for every mnemonic, the bits that never change (opcode, funct
+# fields, fixed registers) and their values, over a large random sample from each.
+# Needs node.
+
+from generate import BASE_INSTRUCTIONS, start_node_batch, call_instruction_batch
+from native_encoder import build_encoders, call_native_batch
+
+SAMPLES = 2000  # per mnemonic
+
+def fixed_bits(words):
+    # returns (mask of bits that are constant across words, their value)
+    ones, zeros = 0, 0
+    for w in words:
+        ones |= w
+        zeros |= ~w & 0xffffffff
+    mask = ~(ones & zeros) & 0xffffffff
+    return mask, words[0] & mask
+
+def test_field_layouts_match_encoder_js(cfg):
+    random.seed(0)
+    encoders = build_encoders(cfg)
+
+    node_proc = start_node_batch()
+    try:
+        mismatches = []
+        for mne in BASE_INSTRUCTIONS:
+            node_words = call_instruction_batch([mne] * SAMPLES, node_proc)
+            native_words = call_native_batch([mne] * SAMPLES, encoders)
+            assert not any(isinstance(w, RuntimeError) for w in node_words), mne
+            assert not any(isinstance(w, RuntimeError) for w in native_words), mne
+
+            node_mask, node_value = fixed_bits(node_words)
+            native_mask, native_value = fixed_bits(native_words)
+            if (node_mask, node_value) != (native_mask, native_value):
+                mismatches.append(f"{mne}: Encoder.js mask=0x{node_mask:08x} value=0x{node_value:08x}, "
+                                  f"native mask=0x{native_mask:08x} value=0x{native_value:08x}")
+        assert not mismatches, "\n".join(mismatches)
+    finally:
+        node_proc.stdin.close()
+        node_proc.wait()
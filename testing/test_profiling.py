@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import tracemalloc
+
+# Server/profiling.py: with the hooks installed, a short campaign (in-process
+# encoders, simulated boards) fills in the per-stage breakdown and the
+# cProfile / tracemalloc extras; uninstall() puts the original functions back.
+# A function is timed wherever it was imported by name.
+
+import server
+import results
+import generate
+import native_encoder
+from generate import generate_stream
+from instruction_source import InstructionSource
+from profiling import Profiler
+from sim_board import SimBoard, run_boards
+
+async def campaign(profiler, cfg):
+    source = InstructionSource(profiler.chunks(generate_stream(cfg, seed=1)), cfg["BATCH_SIZE"], 8, "differential")
+    producer = asyncio.create_task(source.run())
+    srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+    boards = [SimBoard(name, latency=0.001, per_word=0) for name in ("beagle", "lichee")]
+    await asyncio.wait_for(run_boards(boards, "127.0.0.1", srv.sockets[0].getsockname()[1]), 30)
+    await producer
+    srv.close()
+
+def run(generation, cfg):
+    cfg.update(TOTAL_INSTRUCTIONS=2048, GEN_CHUNK_SIZE=256, BATCH_SIZE=64, BATCH_WINDOW=2)
+    server.controls.clear()
+    profiler = Profiler(generation).install({"server": server})
+    try:
+        asyncio.run(campaign(profiler, cfg))
+    finally:
+        profiler.uninstall()
+    return profiler
+
+def test_stage_breakdown_with_cprofile(cfg):
+    profiler = run("cprofile", cfg)
+    stats = profiler.stats
+    assert stats["generate chunk"][0] == 2048 // 256 + 1  # the last call finds the iterator empty
+    for stage in ("native encode", "vector table encode"):
+        assert stats[stage][0] == 2048 // 256
+    n_batches = stats["send"][0]
+    assert n_batches >= 2 * 2048 // 64
+    assert stats["compare"][0] == stats["socket wait"][0] == n_batches
+    for count, total, longest in stats.values():
+        assert count and 0 <= longest <= total
+    report = profiler.report()
+    assert "socket wait" in report and "cProfile of generation" in report and "generate_stream" in report
+
+    # nothing stays wrapped
+    assert server.changed_cases is results.changed_cases
+    assert not hasattr(server.write_batch, "__wrapped__")
+
+def test_imported_names_are_timed_too(cfg):
+    encoders = native_encoder.build_encoders(cfg)
+    profiler = Profiler().install({"server": server})
+    try:
+        # listed as generate.call_native_batch, defined in native_encoder
+        assert native_encoder.call_native_batch is generate.call_native_batch
+        native_encoder.call_native_batch(["add", "addi"], encoders)
+        generate.call_native_batch(["sub"], encoders)
+    finally:
+        profiler.uninstall()
+    assert profiler.stats["native encode"][0] == 2
+    assert not hasattr(native_encoder.call_native_batch, "__wrapped__")
+    assert native_encoder.call_native_batch is generate.call_native_batch
+
+def test_record_from_many_threads():
+    profiler = Profiler()
+    threads = [threading.Thread(target=lambda: [profiler.record("stage", 0.001) for _ in range(10000)])
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    count, total, longest = profiler.stats["stage"]
+    assert count == 40000 and abs(total - 40.0) < 1e-6 and longest == 0.001
+
+def test_tracemalloc_peaks(cfg):
+    try:
+        profiler = run("tracemalloc", cfg)
+        assert len(profiler.peaks) == 2048 // 256 + 1 and max(profiler.peaks) > 0
+        assert "largest live allocation sites" in profiler.report()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import tempfile
+
+# Server/result_store.py: rows land in segments, segments roll over, and the
+# cross-board query finds words that faulted on one board but not the other.
+
+from result_store import ResultStore, query, stats, segment_paths
+from test_results import build_message
+
+SIGSEGV = 11
+
+def batch(words, segv):
+    # one record per word, SIGSEGV for the words in `segv`
+    recs = [(i, w, 2 if w in segv else 0, SIGSEGV if w in segv else 0, 0x1000, {}, {}, [])
+            for i, w in enumerate(words)]
+    return build_message(recs, list(range(len(recs))))
+
+def test_store_and_query():
+    with tempfile.TemporaryDirectory() as d:
+        store = ResultStore(d, segment_cases=8)
+        words = list(range(0x100, 0x120))
+
+        async def append_all():
+            for seq in range(0, len(words), 4):
+                chunk = words[seq:seq + 4]
+                await store.append("beagle", seq, batch(chunk, segv={0x101, 0x105, 0x111}))
+                await store.append("lichee", seq, batch(chunk, segv={0x105}), changed=[1])
+        asyncio.run(append_all())
+        store.close()
+
+        assert len(segment_paths(d)) > 1
+        counts = stats(d)
+        assert counts[("beagle", "sigsegv")] == 3 and counts[("lichee", "sigsegv")] == 1
+        assert sum(counts.values()) == 2 * len(words)
+
+        assert list(query(d, board="beagle", cls="sigsegv", not_board="lichee", not_class="sigsegv")) == [0x101, 0x111]
+        assert sorted(query(d, board="lichee", nondet=True)) == words[1::4]
+
+        # reopening appends to the last segment instead of rewriting anything
+        sizes = {p: os.path.getsize(p) for p in segment_paths(d)[:-1]}
+        store = ResultStore(d, segment_cases=8)
+        asyncio.run(store.append("beagle", 99, batch([0x200], segv={0x200})))
+        store.close()
+        assert {p: os.path.getsize(p) for p in sizes} == sizes
+        assert 0x200 in query(d, board="beagle", cls="sigsegv")
+
+def test_full_queue_waits_and_loses_nothing():
+    with tempfile.TemporaryDirectory() as d:
+        store = ResultStore(d, max_pending=2)
+        message = batch([0x300], segv=set())
+        ticks = 0
+
+        async def ticker():
+            # the event loop keeps running while appends wait for the writer
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        async def append_all():
+            task = asyncio.create_task(ticker())
+            await asyncio.gather(*(store.append(f"sim{i % 4}", seq, message) for i, seq in enumerate(range(500))))
+            task.cancel()
+        asyncio.run(append_all())
+        store.close()
+        assert store.waits > 0 and ticks > 0
+        assert sum(stats(d).values()) == 500
@@ -0,0 +1,85 @@
+import struct
+
+# Round trip for Server/results.py: builds a message the way client/results.c
+# lays it out and checks the decoded columns and records.
+
+from results import (HEADER, RECORD, MEMDIFF, MAGIC, VERSION, decode_results, is_binary, iter_records, result_count,
+                     changed_cases, format_changed)
+
+def build_record(index, instruction, outcome, signo, fault_addr, xregs, fregs, diffs):
+    xmask = sum(1 << r for r in xregs)
+    fmask = sum(1 << r for r in fregs)
+    tail = b"".join(struct.pack("<Q", xregs[r]) for r in sorted(xregs))
+    tail += b"".join(struct.pack("<Q", fregs[r]) for r in sorted(fregs))
+    tail += b"".join(MEMDIFF.pack(*d) for d in diffs)
+    return RECORD.pack(RECORD.size + len(tail), index, instruction, outcome, signo,
+                       len(diffs), xmask, fmask, fault_addr) + tail
+
+def build_message(records, digests, only=None):
+    # only: indexes of the records to include (all by default), digests are always complete
+    included = [r for r in records if only is None or r[0] in only]
+    payload = HEADER.pack(MAGIC, VERSION, RECORD.size, len(included), len(digests))
+    payload += struct.pack(f"<{len(digests)}Q", *digests)
+    return payload + b"".join(build_record(*r) for r in included)
+
+RECORDS = [
+    (0, 0x00dd31af, 2, 11, 0x1000, {3: 0xdeadbeef, 31: 1}, {0: 0x3ff0000000000000}, [(0x1000, 0x00, 0x12)]),
+    (1, 0x00000013, 0, 0, 0, {}, {}, []),
+    (2, 0xffffffff, 1, 4, 0x2000, {}, {}, [(0x3000, 0xff, 0x00), (0x3001, 0xff, 0x01)]),
+]
+
+def test_decode_round_trip():
+    records = RECORDS
+    payload = build_message(records, [11, 22, 33])
+
+    assert is_binary(payload) and not is_binary(b"=== Running fuzz")
+    assert result_count(payload) == 3
+
+    res = decode_results(payload)
+    assert len(res) == 3
+    assert list(res.digests) == [11, 22, 33]
+    assert list(res.outcome) == [2, 0, 1]
+    assert list(res.x_start) == [0, 2, 2, 2]
+    for rec, expected in zip(res, records):
+        index, instruction, outcome, signo, fault_addr, xregs, fregs, diffs = expected
+        assert rec == (index, instruction, outcome, signo, fault_addr, xregs, fregs, diffs)
+
+def test_changed_cases_by_digest():
+    run1 = build_message(RECORDS, [11, 22, 33])
+    # second run only carries the record of the case that changed
+    changed_record = (1, 0x00000013, 0, 0, 0, {5: 7}, {}, [])
+    run2 = build_message(RECORDS[:1] + [changed_record] + RECORDS[2:], [11, 99, 33], only={1})
+    assert len(decode_results(run2)) == 1
+    assert changed_cases(run1, run1) == []
+    assert changed_cases(run1, run2) == [1]
+    # a run that stopped early differs for the cases it is missing
+    assert changed_cases(run1, build_message(RECORDS[:1], [11], only=set())) == [1, 2]
+
+    text = format_changed(run1, run2, [1])
+    assert "case 1 run 1" in text and "x5" in text
+
+def test_rejects_other_versions():
+    payload = HEADER.pack(MAGIC, VERSION + 1, RECORD.size, 0, 0)
+    try:
+        decode_results(payload)
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+def rejects(decode, payload):
+    try:
+        decode(payload)
+    except ValueError:
+        return True
+    return False
+
+def test_rejects_truncated_records():
+    payload = build_message(RECORDS, [11, 22, 33])
+    end_of_digests = HEADER.size + 8 * 3
+    for decode in (decode_results, lambda p: list(iter_records(p))):
+        assert rejects(decode, payload[:end_of_digests + 10])  # inside the fixed part
+        assert rejects(decode, payload[:-3])                   # inside the last record's tail
+    # a record whose length does not cover the registers its masks announce
+    short = bytearray(build_message(RECORDS[:1], [11]))
+    struct.pack_into("<I", short, end_of_digests, RECORD.size)
+    assert rejects(decode_results, bytes(short[:end_of_digests + RECORD.size]))
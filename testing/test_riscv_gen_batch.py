@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+
+# Statistical equivalence between storage/riscv_gen.generate (one word at a time)
+# and storage/riscv_gen.generate_batch (numpy). The words are random, so what must
+# match is their distribution: how often each bit is set, how often each register
+# field value appears, and how many extra flipped / endian-swapped words come out.
+
+import riscv_gen
+
+COUNT = 100000
+TOLERANCE = 0.01  # absolute difference in frequency, ~6 sigma at this sample size
+FLAGS = dict(xlen=64, enable_m=False, enable_amo=True, enable_f=True, enable_vector=True)
+
+def bit_frequencies(words):
+    words = np.asarray(words, dtype=np.uint32)
+    return np.array([((words >> b) & 1).mean() for b in range(32)])
+
+def field_frequencies(words, shift, width=5):
+    values = (np.asarray(words, dtype=np.uint32) >> shift) & ((1 << width) - 1)
+    return np.bincount(values, minlength=1 << width) / len(values)
+
+def sample_both():
+    riscv_gen.fence_called = False
+    scalar = riscv_gen.generate(count=COUNT, seed=1, **FLAGS)
+    riscv_gen.fence_called = False
+    batch = riscv_gen.generate_batch(count=COUNT, seed=1, **FLAGS)
+    return scalar, batch
+
+def test_batch_matches_scalar_distribution():
+    scalar, batch = sample_both()
+    assert batch.dtype == np.uint32
+
+    # ~1 + FLIP_PROBABILITY + ENDIAN_PROBABILITY words per generated instruction
+    assert abs(len(scalar) - len(batch)) / COUNT < 0.02, (len(scalar), len(batch))
+
+    diff = np.abs(bit_frequencies(scalar) - bit_frequencies(batch))
+    assert diff.max() < TOLERANCE, f"bit {diff.argmax()} differs by {diff.max():.4f}"
+
+    for name, shift in (("rd", 7), ("rs1", 15), ("rs2", 20)):
+        diff = np.abs(field_frequencies(scalar, shift) - field_frequencies(batch, shift))
+        assert diff.max() < TOLERANCE, f"{name}={diff.argmax()} differs by {diff.max():.4f}"
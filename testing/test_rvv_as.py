@@ -0,0 +1,42 @@
+import os
+import random
+
+import pytest
+
+# rvv-as --stream against one-shot rvv-as: every pipelined answer lines up with
+# its request, decodes back to the requested mnemonic (w & MASK == MATCH in
+# opcodes.rs) like the one-shot answer does, and a bad line answers "error: ..."
+# without shifting the rest. Needs the rvv-as binary (cargo build --release in
+# Server/vector_generator, copied to generate.RUST_ASM_BIN).
+
+import generate
+from vector_table import load_vector_table
+
+pytestmark = pytest.mark.skipif(not os.access(generate.RUST_ASM_BIN, os.X_OK),
+                                reason=f"rvv-as not built at {generate.RUST_ASM_BIN}")
+
+def decodes_to(word, mne, table):
+    names, matches, masks = table[:3]
+    i = names.index(mne)
+    return word & masks[i] == matches[i]
+
+def test_stream_matches_oneshot():
+    table = load_vector_table()
+    random.seed(0)
+    picks = random.sample(generate.VECTOR_INSTRUCTIONS, 32)
+    lines = picks[:16] + ["not.an.instruction"] + picks[16:]
+
+    proc = generate.start_rust_asm()
+    try:
+        streamed = generate.call_rust_asm_batch(lines, proc)
+    finally:
+        proc.stdin.close()
+        proc.wait()
+
+    assert len(streamed) == len(lines)
+    assert isinstance(streamed[16], RuntimeError)
+    del streamed[16]
+    for mne, answer in zip(picks, streamed):
+        assert decodes_to(int(answer, 16), mne, table), f"stream: {mne} -> {answer}"
+        oneshot = generate.call_rust_asm_oneshot(mne)
+        assert decodes_to(int(oneshot, 16), mne, table), f"one-shot: {mne} -> {oneshot}"
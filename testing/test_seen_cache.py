@@ -0,0 +1,78 @@
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Server/seen_cache.py: words are skipped once every board (any board in shard
+# mode) has tested them, across cache reopens, and the numpy path agrees with
+# the per-word one. The server closes the cache only once the generator thread
+# is out of it.
+
+from instruction_source import InstructionSource
+from seen_cache import SeenCache
+
+def test_persists_across_runs():
+    with tempfile.TemporaryDirectory() as d:
+        cache = SeenCache(d, ["beagle", "lichee"], "h")
+        assert cache.filter([1, 2, 2, 3]) == [1, 2, 3]
+        cache.mark("beagle", [1, 2])
+        cache.mark("lichee", [2])
+        cache.close()
+
+        cache = SeenCache(d, ["beagle", "lichee"], "h")
+        assert cache.filter([1, 2, 5]) == [1, 5]
+        assert (cache.hits, cache.misses) == (1, 2)
+        cache.close()
+
+        cache = SeenCache(d, ["beagle", "lichee"], "h", mode="shard")
+        assert cache.filter([1, 2, 5]) == [5]
+        # boards outside DEDUP_BOARDS neither get a bitmap nor count as tested
+        cache.mark("sim0", [7])
+        assert set(cache.bitmaps) == {"beagle", "lichee"} and cache.filter([7]) == [7]
+        cache.close()
+
+        # another config hash starts from nothing
+        cache = SeenCache(d, ["beagle", "lichee"], "other")
+        assert cache.filter([1, 2, 5]) == [1, 2, 5]
+        cache.close()
+
+def test_chunked_matches_per_word():
+    rng = random.Random(1)
+    words = [rng.getrandbits(12) for _ in range(5000)]
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        for chunk in (5000, 50):  # numpy path for big chunks, per-word path for small ones
+            cache = SeenCache(os.path.join(d, str(chunk)), ["a", "b"], "h")
+            cache.mark("a", words[:3000])
+            cache.mark("b", words[1000:4000])
+            fresh = [w for i in range(0, len(words), chunk) for w in cache.filter(words[i:i + chunk])]
+            results.append((fresh, cache.hits, cache.misses))
+            cache.close()
+    assert results[0] == results[1]
+
+def test_stop_waits_for_the_generator_thread():
+    inside = threading.Event()
+    def chunks(cache):
+        while True:
+            inside.set()
+            time.sleep(0.2)  # a slow chunk, as if filtering a large one
+            yield cache.filter([random.getrandbits(32) for _ in range(64)])
+
+    async def run(cache):
+        source = InstructionSource(chunks(cache), 16, 1, "differential")
+        producer = asyncio.create_task(source.run())
+        await asyncio.get_running_loop().run_in_executor(None, inside.wait)
+        await source.stop(producer)
+        # SeenCache.close() used to run here while filter() was still going
+        return producer
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = SeenCache(d, ["beagle"], "h")
+        producer = asyncio.run(run(cache))
+        calls = cache.hits + cache.misses
+        cache.close()
+        time.sleep(0.3)
+        assert producer.cancelled() and calls == 64
+        assert cache.hits + cache.misses == calls
@@ -0,0 +1,86 @@
+import asyncio
+import struct
+import sys
+from array import array
+from collections import deque
+
+# Server/server.py handle_client: a board that does not answer has at most
+# BATCH_WINDOW batches sent to it, and each answer releases exactly one more.
+# write_batch frames packed batches exactly as the per-word struct.pack did.
+
+import server
+from instruction_source import InstructionSource, pack
+from sim_board import SimBoard
+
+WORDS = list(range(0x1000, 0x1000 + 256))
+
+async def slow_board(port, quiet=0.2):
+    # reads everything the server sends until it has been quiet for `quiet`
+    # seconds, then answers the oldest batch; returns (most batches outstanding
+    # at once, words answered)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(struct.pack("!I", 6) + b"beagle")
+    board = SimBoard("beagle")
+    outstanding = deque()
+    most, answered = 0, []
+    while True:
+        try:
+            while True:
+                batch_id, count = struct.unpack("!II", await asyncio.wait_for(reader.readexactly(8), quiet))
+                batch = array("I", await reader.readexactly(4 * count))
+                if sys.byteorder == "little":
+                    batch.byteswap()
+                outstanding.append((batch_id, list(batch)))
+                most = max(most, len(outstanding))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.IncompleteReadError:
+            break  # the server is done with this board
+        batch_id, batch = outstanding.popleft()
+        for second in (False, True):
+            payload = board.message(batch, second)
+            writer.write(struct.pack("!II", batch_id, len(payload)) + payload)
+        await writer.drain()
+        answered += batch
+    writer.close()
+    return most, answered
+
+def test_window_never_exceeds_batch_window():
+    async def run():
+        cfg = {"BATCH_SIZE": 16, "BATCH_WINDOW": 3, "WATCHDOG_FACTOR": 0}
+        source = InstructionSource.from_list(WORDS, cfg["BATCH_SIZE"], 64, "differential")
+        producer = asyncio.create_task(source.run())
+        srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+        result = await asyncio.wait_for(slow_board(srv.sockets[0].getsockname()[1]), 30)
+        srv.close()
+        await producer
+        return result
+
+    server.controls.clear()
+    most, answered = asyncio.run(run())
+    assert most == 3
+    assert answered == WORDS
+
+class Capture:
+    # the writelines side of an asyncio.StreamWriter
+    def __init__(self):
+        self.data = bytearray()
+
+    def writelines(self, chunks):
+        for chunk in chunks:
+            self.data += chunk
+
+def test_write_batch_matches_struct_framing():
+    words = [0, 1, 0x7fffffff, 0x80000000, 0xffffffff, 0x00000013, 0x12345678] + WORDS
+    packed = pack(words)
+    # (batch id, word ranges of the source batches sent as one)
+    for batch_id, ranges in [(0, [(0, len(words))]),
+                             (7, [(0, 3), (3, 10), (10, len(words))]),
+                             ((1 << 31) + 5, [(2, 3)]),
+                             (9, [])]:
+        views = [packed[4 * start:4 * end] for start, end in ranges]
+        batch = [w for start, end in ranges for w in words[start:end]]
+        old = struct.pack("!II", batch_id, len(batch)) + b"".join(struct.pack("!I", w) for w in batch)
+        out = Capture()
+        server.write_batch(out, batch_id, views)
+        assert bytes(out.data) == old
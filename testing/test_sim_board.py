@@ -0,0 +1,57 @@
+import asyncio
+
+# Server/sim_board.py against the real handle_client: many simulated boards
+# share out a campaign, and the words that crash or hang a board are found by
+# crash bisection and the watchdog while every other word still runs.
+
+import server
+from instruction_source import InstructionSource
+from results import decode_results
+from sim_board import SimBoard, run_boards
+
+WORDS = list(range(0x1000, 0x1000 + 4096))
+
+async def campaign(boards, mode, cfg):
+    quarantined = []
+    source = InstructionSource.from_list(WORDS, cfg["BATCH_SIZE"], 32, mode)
+    source.on_quarantine = lambda word, name: quarantined.append(word)
+    producer = asyncio.create_task(source.run())
+    srv = await asyncio.start_server(lambda r, w: server.handle_client(r, w, source, cfg), "127.0.0.1", 0)
+    await asyncio.wait_for(run_boards(boards, "127.0.0.1", srv.sockets[0].getsockname()[1]), 60)
+    srv.close()
+    await producer
+    return source, quarantined
+
+def test_many_boards_share_a_campaign():
+    boards = [SimBoard(f"sim{i}", latency=0.001, per_word=0, nondet=0.01, reboot=0) for i in range(100)]
+    cfg = {"BATCH_SIZE": 16, "BATCH_WINDOW": 2}
+    server.controls.clear()
+    source, _ = asyncio.run(campaign(boards, "shard", cfg))
+    assert source.finished_all()
+    assert sum(b.stats["words"] for b in boards) == len(WORDS)
+    assert sum(b.stats["batches"] > 0 for b in boards) > 50
+
+def test_crashes_and_hangs_are_isolated():
+    probe = SimBoard("beagle", crash=0.001, hang=0.0005, seed=3)
+    bad = {w: probe.fate(w) for w in WORDS if probe.fate(w)}
+    assert "crash" in bad.values() and "hang" in bad.values()
+
+    boards = [SimBoard(name, latency=0.001, per_word=0, crash=0.001, hang=0.0005, reboot=0, seed=3)
+              for name in ("beagle", "lichee")]
+    cfg = {"BATCH_SIZE": 64, "BATCH_WINDOW": 4, "WATCHDOG_FACTOR": 4.0, "WATCHDOG_MIN_SECONDS": 0.2,
+           "WATCHDOG_FIRST_SECONDS": 0.5}
+    server.controls.clear()
+    source, quarantined = asyncio.run(campaign(boards, "differential", cfg))
+    assert source.finished_all()
+    assert sorted(quarantined) == sorted(list(bad) * 2)
+    for board in boards:
+        assert board.stats["words"] == len(WORDS) - len(bad)
+        assert board.stats["hangs"] > 0 and board.stats["crashes"] > 0
+        assert server.controls[board.name].timeouts == board.stats["hangs"]
+
+def test_results_decode():
+    board = SimBoard("beagle", regs=5, nondet=1.0)
+    first = decode_results(board.message(WORDS[:8]))
+    second = decode_results(board.message(WORDS[:8], second=True))
+    assert list(first.instruction) == WORDS[:8] and len(first.record(0).xregs) == 5
+    assert len(second) == 8 and all(a != b for a, b in zip(first.digests, second.digests))